@@ -1,11 +1,16 @@
 #routes.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Union
 from modules.organizer.categorizer import process_all_drive_files
 from modules.organizer.upload_file import upload_file
 from modules.organizer.folder_utils import merge_and_cleanup_folders, get_existing_folders, remove_empty_folders
 from modules.organizer.drive_files import list_drive_files
 from modules.ai_agent.agentv2 import RAGAgent
+from shared.executor import ExecutorSaturated
+from shared.metrics import metrics_payload
+import json
 import logging
 import os
 import shutil
@@ -17,6 +22,9 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 agent = RAGAgent()
 
+BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "500"))
+RETRY_AFTER_S = os.getenv("RETRIEVAL_RETRY_AFTER_S", "1")  # Retry-After sent with 503 when retrieval is saturated
+
 
 class APIResponse(BaseModel):
     status: str
@@ -24,31 +32,109 @@ class APIResponse(BaseModel):
 
 class APIRequest(BaseModel):
     question: str
+    # Optional filters applied inside the vector search; a list matches any of its values
+    category: Optional[Union[str, List[str]]] = None
+    source: Optional[Union[str, List[str]]] = None      # file name
+    source_id: Optional[Union[str, List[str]]] = None   # Drive file id or path
+    # Time the answer model may take; the router drops to the fast model rather than miss it
+    latency_budget_ms: Optional[float] = None
+
+    def filters(self) -> Optional[Dict[str, Any]]:
+        filters = {key: getattr(self, key) for key in ("category", "source", "source_id") if getattr(self, key)}
+        return filters or None
+
+class ChunksRequest(APIRequest):
+    k: int = 4
+
+class BatchQueryRequest(APIRequest):
+    question: Optional[str] = None
+    questions: List[str]
+    ordered: bool = True               # False streams each answer as soon as it is ready
+    concurrency: Optional[int] = None  # generation calls in flight; defaults to RAG_BATCH_CONCURRENCY
+
+def overloaded(e: ExecutorSaturated) -> HTTPException:
+    logger.warning(str(e))
+    return HTTPException(status_code=503, detail={"status": "error", "message": "Server busy, retry shortly"},
+                         headers={"Retry-After": RETRY_AFTER_S})
 
 @router.get("/", response_model=APIResponse)
 async def root():
     return APIResponse(status="ok", message="API is running")
 
+@router.get("/metrics")
+async def metrics():
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
 @router.post("/query", response_model=APIResponse)
 async def rag_query(request: APIRequest):
     try:
-        agent = RAGAgent()
-        pdf_dir = "tests/testPdfs/"  # or wherever your documents live
-        for root, _, files in os.walk(pdf_dir):
-            for file in files:
-                if file.endswith(".pdf"):
-                    file_path = os.path.join(root, file)
-                    agent.process_documents(file_path)
-        result = await agent.answer_question(request.question)
+        result = await agent.answer_question(request.question, filters=request.filters(),
+                                             latency_budget_ms=request.latency_budget_ms)
         return APIResponse(
             status="success",
             message=result["answer"]
         )
+    except ExecutorSaturated as e:
+        raise overloaded(e)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail={"status": "error", "message": f"RAG query failed: {e}"})
 
+@router.post("/query/chunks")
+async def rag_chunks(request: ChunksRequest):
+    """Returns the top-k chunks for a question without generating an answer."""
+    if request.k < 1:
+        raise HTTPException(status_code=400, detail="k must be at least 1")
+    try:
+        return {"chunks": await agent.aget_relevant_chunks(request.question, k=request.k, filters=request.filters())}
+    except ExecutorSaturated as e:
+        raise overloaded(e)
+    except Exception as e:
+        logger.error(f"Chunk retrieval error: {str(e)}")
+        raise HTTPException(status_code=500, detail={"status": "error", "message": str(e)})
+
+@router.post("/query/batch")
+async def rag_query_batch(request: BatchQueryRequest):
+    """
+    Answers many questions over the existing index and streams one JSON line per question:
+    {"index", "question", "status", "answer" | "message", "model", "sources"}.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    if request.concurrency is not None and request.concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+    # Retrieve before streaming starts, so an overloaded server can still answer 503
+    try:
+        hits = await agent.aretrieve_batch(request.questions, filters=request.filters())
+    except ExecutorSaturated as e:
+        raise overloaded(e)
+    except Exception as e:
+        logger.error(f"Batch retrieval error: {str(e)}")
+        raise HTTPException(status_code=500, detail={"status": "error", "message": str(e)})
+
+    async def stream():
+        try:
+            async for index, result in agent.answer_questions(
+                    request.questions, filters=request.filters(),
+                    ordered=request.ordered, concurrency=request.concurrency,
+                    latency_budget_ms=request.latency_budget_ms, hits=hits):
+                line = {"index": index, "question": request.questions[index]}
+                if "error" in result:
+                    line.update(status="error", message=result["error"])
+                else:
+                    line.update(status="success", answer=result["answer"], model=result["model"], sources=[
+                        doc["metadata"] for doc in result["source_documents"]])
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            logger.error(f"Batch query error: {str(e)}")
+            yield json.dumps({"status": "error", "message": f"RAG batch query failed: {e}"}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @router.get("/files", response_model=list)
 async def list_files():
     try:
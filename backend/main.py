@@ -1,15 +1,42 @@
 # main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from api.routes import router as api_router
 from modules.ai_agent.agentv2 import RAGAgent
+from shared.metrics import HTTP_LATENCY, start_trace, end_trace, server_timing_header
+import logging
 import os
+import time
+
+logger = logging.getLogger(__name__)
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "false").lower() == "true"  # or send an X-Trace header per request
 
 app = FastAPI()
 app.include_router(api_router, prefix="/api")       # Existing API routes
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Records request latency per route and, when tracing, returns stage spans as Server-Timing."""
+    tracing = TRACE_REQUESTS or "x-trace" in request.headers
+    token = start_trace() if tracing else None
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = request.scope.get("route")
+        HTTP_LATENCY.labels(request.method, getattr(route, "path", "unmatched"), str(status)).observe(time.perf_counter() - start)
+        spans = end_trace(token) if tracing else []
+    if spans:
+        response.headers["Server-Timing"] = server_timing_header(spans)
+        logger.info(f"Trace {request.method} {request.url.path}: " + ", ".join(
+            f"{s['name']}={s['duration_ms']:.1f}ms" for s in spans))
+    return response
+
+
 # CORS config: allow React dev and any OAuth callbacks
 app.add_middleware(
     CORSMiddleware,
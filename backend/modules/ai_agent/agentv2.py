@@ -1,46 +1,28 @@
 import os
-from typing import List, Dict, Any
+import asyncio
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
 
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import RetrievalQA
 
 from modules.vector_store.embedder import load_embedding_model
-from modules.vector_store.chunker import chunk_text
-from modules.vector_store.chroma_store import ChromaVectorStore
-
-from markitdown import MarkItDown
+from modules.vector_store.chunker import get_chunker
+from modules.vector_store.vector_pipeline import ingest_if_empty, iter_chunk_records, load_pdf_text_with_markitdown
+from modules.vector_store.store import load_vector_store
+from modules.vector_store.snapshot import restore_if_empty
+from modules.ai_agent.metrics_callback import PipelineMetricsCallback
+from modules.ai_agent.model_router import ModelRouter, RAG_LATENCY_BUDGET_MS, build_router
+from shared.executor import BoundedExecutor, get_retrieval_executor
+from shared.metrics import timed, record_items
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+RAG_BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "4"))  # generation calls in flight per batch
 
-class RAGAgent:
-    """
-    RAG Agent using Google Gemini via LangChain and ChromaDB for vector search.
-    """
-
-    def __init__(self):
-        self.embedder = load_embedding_model()
-        self.vector_store = ChromaVectorStore(self.embedder)
-        self.vector_store.load_index()
-
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-pro",
-            google_api_key=GOOGLE_API_KEY,
-            temperature=0.3,
-            convert_system_message_to_human=True
-        )
-
-        self.qa_chain = None
-
-    def _setup_qa_chain(self):
-        """Set up the RAG chain with prompt and document retriever."""
-        prompt_template = """
+QA_PROMPT = PromptTemplate(
+    template="""
         You are an AI assistant for Heritage Square Foundation.
         Use the following context to answer the user's question.
         If unsure, say you don't know and avoid guessing.
@@ -49,61 +31,147 @@ class RAGAgent:
 
         Question: {question}
 
-        Answer:"""
-
-        PROMPT = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
-        )
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 4}
-            ),
-            chain_type_kwargs={
-                "prompt": PROMPT
-            },
-            return_source_documents=True
-        )
+        Answer:""",
+    input_variables=["context", "question"]
+)
+
+class RAGAgent:
+    """
+    RAG Agent using Google Gemini via LangChain and ChromaDB for vector search.
+    """
+
+    def __init__(self, router: Optional[ModelRouter] = None, executor: Optional[BoundedExecutor] = None,
+                 embedder=None, vector_store=None):
+        self.embedder = embedder or load_embedding_model()
+        if vector_store is None:
+            vector_store = load_vector_store(self.embedder)
+            vector_store.load_index()
+            # A new replica starts from VECTOR_SNAPSHOT_PATH instead of re-embedding the corpus;
+            # without a snapshot, a fresh deployment indexes the PDFs in VECTOR_INGEST_DIR once
+            restore_if_empty(vector_store)
+            ingest_if_empty(vector_store)
+        self.vector_store = vector_store
+
+        # Fast and large Gemini tiers; answers go to the large one only when the question needs it
+        self.router = router or build_router(GOOGLE_API_KEY)
+        # Query embedding and vector search run here, never on the event loop
+        self.executor = executor or get_retrieval_executor()
+
+        self.metrics_callback = PipelineMetricsCallback()
 
     def load_pdf_text_with_markitdown(self,file_path: str) -> List[str]:
-        md = MarkItDown()
-        result = md.convert(file_path)
-        text_blocks = result.text_content
+        # Served from the extracted-text store when this file was converted before
+        with timed("rag_agent", "markitdown"):
+            text_blocks = load_pdf_text_with_markitdown(file_path)
         return [text_blocks]
 
-    def process_documents(self, documents: List[str]):
-        """Splits and indexes documents in Chroma, then builds QA chain."""
+    def process_documents(self, documents: str, source_id: str = None, category: str = None):
+        """
+        Splits and indexes a document in the vector store.
+        Chunks are tagged with the source id and name, page, category and offset.
+        """
         file_text_blocks = self.load_pdf_text_with_markitdown(documents)
-        all_chunks = []
-        for block in file_text_blocks:
-            chunks = chunk_text(block)
-            all_chunks.extend(chunks)
+        chunker = get_chunker(mode="markdown")
+        all_chunks, metadatas = [], []
+        with timed("rag_agent", "chunk"):
+            for block in file_text_blocks:
+                for chunk, metadata in iter_chunk_records(
+                        block, source_id or documents, os.path.basename(documents), category, chunker):
+                    all_chunks.append(chunk)
+                    metadatas.append(metadata)
+        record_items("rag_agent", "chunks", len(all_chunks))
 
-        metadatas = [{"source": f"doc_{i}"} for i in range(len(all_chunks))]
         self.vector_store.create_index(texts=all_chunks, metadatas=metadatas)
-        self._setup_qa_chain()
-
-    async def answer_question(self, question: str) -> Dict[str, Any]:
-        """Runs RAG pipeline to get an answer with sources."""
-        if not self.qa_chain:
-            raise ValueError("QA chain not initialized. Run process_documents first.")
-        
-        response = self.qa_chain.invoke({"query": question})
+
+    async def answer_question(self, question: str, filters: Optional[Dict[str, Any]] = None,
+                              latency_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Runs RAG pipeline to get an answer with sources.
+        filters (e.g. {"category": "Interviews"}) restrict the vector search to matching chunks.
+        latency_budget_ms (default RAG_LATENCY_BUDGET_MS) caps how long the model tier may take.
+        """
+        # Retrieval happens before generation so its scores can pick the model
+        hits = await self.aretrieve_with_scores(question, 4, filters)
+        return await self._generate_answer(question, hits, latency_budget_ms)
+
+    async def aretrieve_with_scores(self, question: str, k: int = 4,
+                                    filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, dict, float]]:
+        """retrieve_with_scores on the retrieval executor; raises ExecutorSaturated when it is full."""
+        return await self.executor.run(self.retrieve_with_scores, question, k, filters)
+
+    async def aretrieve_batch(self, questions: List[str], k: int = 4,
+                              filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, dict, float]]]:
+        """retrieve_batch on the retrieval executor; raises ExecutorSaturated when it is full."""
+        return await self.executor.run(self.retrieve_batch, questions, k, filters)
+
+    def retrieve_with_scores(self, question: str, k: int = 4,
+                             filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, dict, float]]:
+        with timed("rag_agent", "retrieve"):
+            return self.vector_store.search_with_scores(self.embedder.generate_single(question), k=k, filter=filters)
+
+    def retrieve_batch(self, questions: List[str], k: int = 4,
+                       filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, dict, float]]]:
+        """Embeds every question in one call and runs all the vector searches together."""
+        with timed("rag_agent", "batch_embed"):
+            query_vectors = self.embedder.generate(questions)
+        with timed("rag_agent", "batch_search"):
+            return self.vector_store.search_batch(query_vectors, k=k, filter=filters)
+
+    async def _generate_answer(self, question: str, hits: List[Tuple[str, dict, float]],
+                               latency_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Answers one question from already retrieved chunks, as the "stuff" chain would, on the routed model."""
+        prompt = QA_PROMPT.format(context="\n\n".join(text for text, _, _ in hits), question=question)
+        budget_s = (latency_budget_ms or RAG_LATENCY_BUDGET_MS) / 1000 or None
+        route = self.router.route(question, [score for _, _, score in hits], budget_s)
+        with timed("rag_agent", "answer_question"):
+            response, tier = await self.router.generate(
+                prompt, route, budget_s, config={"callbacks": [self.metrics_callback]})
         return {
-            "answer": response['result'],
-            "source_documents": [
-                {"content": doc.page_content, "metadata": doc.metadata}
-                for doc in response["source_documents"]
-            ]
+            "answer": response.content,
+            "model": tier.name,
+            "source_documents": [{"content": text, "metadata": metadata} for text, metadata, _ in hits]
         }
 
-    def get_relevant_chunks(self, query: str, k: int = 4) -> List[Dict[str, Any]]:
+    async def answer_questions(self, questions: List[str], filters: Optional[Dict[str, Any]] = None,
+                               ordered: bool = True, concurrency: int = None, k: int = 4,
+                               latency_budget_ms: Optional[float] = None,
+                               hits: Optional[List[List[Tuple[str, dict, float]]]] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Answers many questions, yielding (index, result) in input order or, with ordered=False,
+        as each finishes. Retrieval is batched; at most `concurrency` generation calls run at once.
+        A failed question yields {"error": ...} instead of stopping the batch.
+        Pass hits from aretrieve_batch to retrieve up front (e.g. to reject an overloaded request early).
+        """
+        if hits is None:
+            hits = await self.aretrieve_batch(questions, k, filters)
+        record_items("rag_agent", "batch_questions", len(questions))
+        semaphore = asyncio.Semaphore(concurrency or RAG_BATCH_CONCURRENCY)
+
+        async def answer(index: int) -> Tuple[int, Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return index, await self._generate_answer(questions[index], hits[index], latency_budget_ms)
+                except Exception as e:
+                    return index, {"error": str(e)}
+
+        tasks = [asyncio.ensure_future(answer(i)) for i in range(len(questions))]
+        try:
+            for next_result in (tasks if ordered else asyncio.as_completed(tasks)):
+                yield await next_result
+        finally:
+            # Stop outstanding generation calls if the caller goes away mid-stream
+            for task in tasks:
+                task.cancel()
+
+    def get_relevant_chunks(self, query: str, k: int = 4, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Returns top-k relevant chunks from vector DB without generating an answer."""
         if not self.vector_store:
             raise ValueError("Vector store not initialized.")
-        
-        chunks = self.vector_store.retrieve(query, k=k)
-        return [{"content": type(doc), "metadata": doc} for doc in chunks]
+
+        chunks = self.vector_store.retrieve(query, k=k, filter=filters)
+        return [{"content": content, "metadata": metadata} for content, metadata in chunks]
+
+    async def aget_relevant_chunks(self, query: str, k: int = 4,
+                                   filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """get_relevant_chunks on the retrieval executor; raises ExecutorSaturated when it is full."""
+        return await self.executor.run(self.get_relevant_chunks, query, k, filters)
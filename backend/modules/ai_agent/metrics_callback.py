@@ -0,0 +1,63 @@
+import time
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from shared.metrics import observe, record_api_call, record_items, record_tokens
+
+
+class PipelineMetricsCallback(BaseCallbackHandler):
+    """
+    Times the retriever and LLM steps inside a LangChain chain run and counts Gemini tokens.
+    Pass it through the invoke config so it reaches every child run.
+    """
+
+    def __init__(self, component: str = "rag_agent"):
+        self.component = component
+        self._starts: Dict[UUID, float] = {}
+        self._models: Dict[UUID, str] = {}
+
+    def on_retriever_start(self, serialized, query, *, run_id: UUID, **kwargs: Any) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            observe(self.component, "retrieve", start)
+        record_items(self.component, "retrieved_chunks", len(documents))
+
+    def on_retriever_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            observe(self.component, "retrieve", start, error=True)
+
+    def _llm_start(self, serialized, run_id: UUID, kwargs: dict) -> None:
+        self._starts[run_id] = time.perf_counter()
+        params = kwargs.get("invocation_params") or {}
+        self._models[run_id] = params.get("model") or params.get("model_name") or "llm"
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._llm_start(serialized, run_id, kwargs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._llm_start(serialized, run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._starts.pop(run_id, None)
+        model = self._models.pop(run_id, "llm")
+        if start is not None:
+            observe(self.component, "generate", start)
+        record_api_call("gemini", model)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                record_tokens(self.component, "generate", "input", usage.get("input_tokens", 0))
+                record_tokens(self.component, "generate", "output", usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._starts.pop(run_id, None)
+        model = self._models.pop(run_id, "llm")
+        if start is not None:
+            observe(self.component, "generate", start, error=True)
+        record_api_call("gemini", model, "quota" if "RESOURCE_EXHAUSTED" in str(error) else "error")
@@ -0,0 +1,132 @@
+#model_router.py
+# Picks the answer model per question: the fast tier by default, the large tier only when the question needs it.
+import asyncio
+import math
+import os
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from shared.metrics import timed, record_items
+from shared.rate_limiter import acall_with_retry
+
+RAG_ROUTING = os.getenv("RAG_ROUTING", "true").lower() == "true"  # false sends everything to the large tier
+RAG_FAST_MODEL = os.getenv("RAG_FAST_MODEL", "gemini-2.5-flash")
+RAG_LARGE_MODEL = os.getenv("RAG_LARGE_MODEL", "gemini-2.5-pro")
+RAG_FAST_LATENCY_S = float(os.getenv("RAG_FAST_LATENCY_S", "2"))  # starting latency estimates, refined by observation
+RAG_LARGE_LATENCY_S = float(os.getenv("RAG_LARGE_LATENCY_S", "10"))
+RAG_ROUTER_MIN_MARGIN = float(os.getenv("RAG_ROUTER_MIN_MARGIN", "0.05"))  # top-1 minus top-2 cosine similarity
+RAG_ROUTER_LONG_QUESTION = int(os.getenv("RAG_ROUTER_LONG_QUESTION", "25"))  # words
+RAG_LATENCY_BUDGET_MS = float(os.getenv("RAG_LATENCY_BUDGET_MS", "0"))  # default per-request budget; 0 is none
+
+
+class LatencyEstimate:
+    """
+    Smoothed latency and mean deviation per tier, updated like a TCP round-trip estimate.
+    high() (mean + 4 deviations) is what a slow but normal call takes.
+    """
+
+    def __init__(self, initial_s: float, alpha: float = 0.125, beta: float = 0.25):
+        self.mean = initial_s
+        self.deviation = initial_s / 2
+        self.alpha = alpha
+        self.beta = beta
+
+    def observe(self, seconds: float) -> None:
+        self.deviation += self.beta * (abs(seconds - self.mean) - self.deviation)
+        self.mean += self.alpha * (seconds - self.mean)
+
+    def high(self) -> float:
+        return self.mean + 4 * self.deviation
+
+
+class ModelTier:
+    """
+    One model the router can send a prompt to: any object with an async ainvoke(prompt, config=...).
+    rate_limited=False skips the shared Gemini limiter, e.g. for a local stand-in.
+    """
+
+    def __init__(self, name: str, llm, initial_latency_s: float, rate_limited: bool = True):
+        self.name = name
+        self.llm = llm
+        self.latency = LatencyEstimate(initial_latency_s)
+        self.rate_limited = rate_limited
+
+
+class Route(NamedTuple):
+    tier: ModelTier
+    reason: str  # "simple", "long_question", "low_margin", "budget" or "fixed"
+
+
+class ModelRouter:
+    """
+    Chooses between a fast and a large tier from cheap signals: a long question or a small gap
+    between the top two retrieval scores (several passages compete) escalates to the large tier,
+    unless the large tier's typical latency does not fit the request's budget. Scores are cosine
+    similarities, as every vector store returns them. During generation a large-tier call that
+    runs into the time the fast tier would need is abandoned for the fast tier.
+    """
+
+    def __init__(self, fast: ModelTier, large: ModelTier, min_margin: float = RAG_ROUTER_MIN_MARGIN,
+                 long_question: int = RAG_ROUTER_LONG_QUESTION):
+        self.fast = fast
+        self.large = large
+        self.min_margin = min_margin
+        self.long_question = long_question
+
+    def route(self, question: str, scores: List[float], budget_s: Optional[float] = None) -> Route:
+        if self.fast is self.large:
+            return Route(self.large, "fixed")
+        margin = scores[0] - scores[1] if len(scores) > 1 else math.inf
+        if len(question.split()) > self.long_question:
+            reason = "long_question"
+        elif margin < self.min_margin:
+            reason = "low_margin"
+        else:
+            return Route(self.fast, "simple")
+        # Escalate only if a typical large call ends while a fast retry would still make the deadline
+        if budget_s and self.large.latency.mean > budget_s - self.fast.latency.high():
+            return Route(self.fast, "budget")
+        return Route(self.large, reason)
+
+    async def _call(self, tier: ModelTier, prompt: str, config: dict = None):
+        start = time.perf_counter()
+        with timed("rag_router", tier.name):
+            if tier.rate_limited:
+                response = await acall_with_retry(tier.llm.ainvoke, prompt, config=config, method=tier.name)
+            else:
+                response = await tier.llm.ainvoke(prompt, config=config)
+        tier.latency.observe(time.perf_counter() - start)
+        return response
+
+    async def generate(self, prompt: str, route: Route, budget_s: Optional[float] = None,
+                       config: dict = None) -> Tuple[object, ModelTier]:
+        """Returns (response, tier that produced it)."""
+        record_items("rag_router", route.reason)
+        if route.tier is self.large and budget_s and self.fast is not self.large:
+            # Keep back the time a slow fast-tier call needs, so a late large call can still be rescued
+            timeout = budget_s - self.fast.latency.high()
+            if timeout > 0:
+                start = time.perf_counter()
+                try:
+                    return await asyncio.wait_for(self._call(self.large, prompt, config), timeout), self.large
+                except asyncio.TimeoutError:
+                    # The abandoned call still tells us the large tier is at least this slow
+                    self.large.latency.observe(time.perf_counter() - start)
+            record_items("rag_router", "deadline_fallback")
+            return await self._call(self.fast, prompt, config), self.fast
+        return await self._call(route.tier, prompt, config), route.tier
+
+
+def build_router(google_api_key: str, temperature: float = 0.3) -> ModelRouter:
+    """The Gemini tiers from RAG_FAST_MODEL and RAG_LARGE_MODEL; with RAG_ROUTING=false only the large one."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    def tier(model: str, latency_s: float) -> ModelTier:
+        # acall_with_retry owns retries, pacing and the deadline; the client's own retries would stack on them
+        llm = ChatGoogleGenerativeAI(model=model, google_api_key=google_api_key, temperature=temperature,
+                                     convert_system_message_to_human=True, max_retries=0)
+        return ModelTier(model, llm, latency_s)
+
+    large = tier(RAG_LARGE_MODEL, RAG_LARGE_LATENCY_S)
+    fast = tier(RAG_FAST_MODEL, RAG_FAST_LATENCY_S) if RAG_ROUTING else large
+    return ModelRouter(fast, large)
@@ -1,71 +1,109 @@
 from modules.organizer.genai_client import genai_client
 from modules.organizer.file_utils import download_file_content, extract_text_from_image
 from modules.organizer.folder_utils import get_existing_folders
+from modules.organizer.image_prep import prepare_image
+import os
 import re
-from PIL import Image
-from google import genai
+import time
+from functools import lru_cache
+from shared.metrics import timed, observe, record_api_call, record_bytes, record_cache, record_items, record_tokens
+from shared.rate_limiter import call_with_retry, RetriesExhaustedError
+from shared.dedup import DEDUP_MODE, NearDuplicateIndex, get_dedup_index, image_hash, perceptual_hash, text_signature
 
 client = genai_client()
 
+# Also chunk and embed the text extracted for categorization, so RAG never re-parses the file
+INDEX_ON_CATEGORIZE = os.getenv("INDEX_ON_CATEGORIZE", "false").lower() == "true"
+
+VISION_MODEL = "gemini-1.5-flash"
+# Vision results keyed by perceptual hash, so repeated or near-identical images skip the API; empty disables
+VISION_CACHE_PATH = os.getenv("VISION_CACHE_PATH", "vision_cache.sqlite3")
+VISION_CACHE_DISTANCE = int(os.getenv("VISION_CACHE_DISTANCE", "4"))  # max differing bits of the 64-bit hash
+VISION_CACHE_SCOPE = f"vision:{VISION_MODEL}"  # a different model starts a fresh cache
+
 ALLOWED_CATEGORIES = {
     "Curation", "Employee Resources", "Images", "Interviews", "Research", "Restoration"
 }
 
+def _record_usage(model, stage, response):
+    record_api_call("gemini", model)
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        record_tokens("categorization", stage, "input", getattr(usage, "prompt_token_count", 0) or 0)
+        record_tokens("categorization", stage, "output", getattr(usage, "candidates_token_count", 0) or 0)
+
+@lru_cache(maxsize=None)
+def get_vision_cache():
+    """Categories of already classified images by perceptual hash, or None when VISION_CACHE_PATH is empty."""
+    if not VISION_CACHE_PATH:
+        return None
+    return NearDuplicateIndex(VISION_CACHE_PATH, image_distance=VISION_CACHE_DISTANCE)
+
 def categorize_image_with_genai_vision(file_data):
     try:
-        file_data.seek(0)
         try:
-            img = Image.open(file_data)
-            img.verify()
-        except Exception as imgae:
-            print(f"Image verification failed: {imgae}")
+            # Decoding the image to shrink it also validates it, so there is no separate verify() pass
+            prepared = prepare_image(file_data)
+        except Exception as e:
+            print(f"Image preparation failed: {e}")
             return "Uncategorized"
-        file_data.seek(0)
+        cache = get_vision_cache()
+        phash = perceptual_hash(prepared.image) if cache is not None else None
+        if cache is not None:
+            cached = cache.find(VISION_CACHE_SCOPE, "image", phash)
+            record_cache("vision", cached is not None)
+            if cached is not None:
+                print(f"Reusing category of a near-identical image: {cached.category}")
+                return cached.category
+        record_bytes("categorization", "vision_original", prepared.original_bytes)
+        record_bytes("categorization", "vision_payload", len(prepared.data))
         prompt = (
             "Categorize the image based on its content. Choose only from the following:\n"
             "Curation, Employee Resources, Images, Interviews, Research, Restoration.\n"
             "Reply in the format:\n**Category:** <category>"
         )
-        try:
-            response = client.models.generate_content(
-                model="gemini-1.5-flash",
+        with timed("categorization", "classify_image"):
+            response = call_with_retry(
+                client.models.generate_content,
+                method=VISION_MODEL,
+                model=VISION_MODEL,
                 contents=[
                     {"role": "user", "parts": [
                         {"text": prompt},
-                        {"inline_data": {"mime_type": "image/jpeg", "data": file_data.getvalue()}}
+                        {"inline_data": {"mime_type": prepared.mime_type, "data": prepared.data}}
                     ]}
                 ]
             )
-            return extract_category_from_response(response)
-        except genai.errors.ClientError as e:
-            if "RESOURCE_EXHAUSTED" in str(e):
-                print("Gemini API quota exceeded. Please wait or upgrade your plan.")
-                return "Uncategorized"
-            else:
-                raise
+        _record_usage(VISION_MODEL, "classify_image", response)
+        category = extract_category_from_response(response)
+        # Uncategorized may be a malformed reply, so only real categories are remembered
+        if cache is not None and category != "Uncategorized":
+            cache.add(VISION_CACHE_SCOPE, f"{phash:016x}", None, "image", phash, category=category)
+        return category
+    except RetriesExhaustedError:
+        # Quota or outage: the caller defers the file instead of filing it as Uncategorized
+        raise
     except Exception as e:
         print(f"Vision categorization failed: {e}")
         return "Uncategorized"
 
 def categorize_and_tag_geminiai(text):
-    try:
-        prompt = (
-            "Categorize the following document into one of the following categories only:\n"
-            "Curation, Employee Resources, Images, Interviews, Research, Restoration.\n\n"
-            "Reply in the format:\n**Category:** <category>\n\n"
-            f"Text:\n{text}"
-        )
-        response = client.models.generate_content(
+    """Classifies text with Gemini. Raises RetriesExhaustedError if the quota wall never clears."""
+    prompt = (
+        "Categorize the following document into one of the following categories only:\n"
+        "Curation, Employee Resources, Images, Interviews, Research, Restoration.\n\n"
+        "Reply in the format:\n**Category:** <category>\n\n"
+        f"Text:\n{text}"
+    )
+    with timed("categorization", "classify_text"):
+        response = call_with_retry(
+            client.models.generate_content,
+            method="gemini-2.0-flash",
             model="gemini-2.0-flash",
             contents=[prompt]
         )
-        return response
-    except genai.errors.ClientError as e:
-        if "RESOURCE_EXHAUSTED" in str(e):
-            print("Gemini API quota exceeded. Please wait or upgrade your plan.")
-            return None
-        else:
-            raise
+    _record_usage("gemini-2.0-flash", "classify_text", response)
+    return response
 
 def extract_category_from_response(response):
     try:
@@ -98,27 +136,96 @@ def extract_category_from_response(response):
         print(f"Error extracting category: {e}")
     return "Uncategorized"
 
-def batch_categorize_files(files):
+def download_for_classification(file_id, mime_type):
+    """Downloads one file, returning (extracted text, image bytes or None)."""
+    if mime_type.startswith("image/"):
+        content, file_data = download_file_content(file_id, mime_type)
+        return content or "", file_data
+    return download_file_content(file_id, mime_type), None
+
+def classify_content(content, file_data=None):
+    """Classifies downloaded content; images without OCR text go to the vision model."""
+    if file_data is not None and not content.strip():
+        return categorize_image_with_genai_vision(file_data)
+    if not content.strip():
+        return "Uncategorized"
+    response = categorize_and_tag_geminiai(content)
+    return extract_category_from_response(response)
+
+def content_signature(content, file_data=None):
+    """Returns (kind, signature) for near-duplicate lookup: a perceptual hash for images, MinHash for text."""
+    if file_data is not None:
+        phash = image_hash(file_data)
+        if phash is not None:
+            return "image", phash
+    return "text", text_signature(content)
+
+def index_categorized_file(file, text, category):
+    """Hands the already extracted text and its category to chunking and embedding. Returns the chunk count."""
+    if not text or not text.strip():
+        return 0
+    # Imported lazily: the embedding model is only needed when indexing is switched on
+    from modules.vector_store.vector_pipeline import index_text
+    try:
+        with timed("categorization", "index"):
+            count = index_text(text, file['id'], file['name'], category=category)
+    except Exception as e:
+        # The file is still filed but stays out of the index: once moved it is not listed again,
+        # so re-index it with process_and_store_documents (indexing a source again replaces its chunks)
+        print(f"Indexing failed for {file['name']}: {e}")
+        return 0
+    print(f"Indexed {count} chunks")
+    record_items("categorization", "indexed")
+    return count
+
+def batch_categorize_files(files, index=None, dedup_mode=None):
+    """
+    Classifies files and groups their ids by category. With index=True (default INDEX_ON_CATEGORIZE)
+    each file's extracted text is also added to the vector index, so it is downloaded and parsed once.
+    With dedup_mode (default DEDUP_MODE) "link", a near-duplicate of a file already classified takes
+    the original's category without a Gemini call and is not indexed again; with "skip" it is left in place.
+    """
+    if index is None:
+        index = INDEX_ON_CATEGORIZE
+    dedup_mode = dedup_mode or DEDUP_MODE
+    dedup = get_dedup_index() if dedup_mode != "off" else None
     existing_folders = get_existing_folders()
     category_to_files = {}
+    deferred = []
     for file in files:
         file_id, file_name, mime_type = file['id'], file['name'], file['mimeType']
+        file_start = time.perf_counter()
         print(f"\nProcessing: {file_name}")
-        if mime_type.startswith("image/"):
-            content, file_data = download_file_content(file_id, mime_type)
-            if not content or not content.strip():
-                category = categorize_image_with_genai_vision(file_data)
-            else:
-                response = categorize_and_tag_geminiai(content)
-                category = extract_category_from_response(response)
-        else:
-            content = download_file_content(file_id, mime_type)
-            if not content.strip():
-                category = "Uncategorized"
-            else:
-                response = categorize_and_tag_geminiai(content)
-                category = extract_category_from_response(response)
+        try:
+            content, file_data = download_for_classification(file_id, mime_type)
+            if dedup is not None:
+                kind, signature = content_signature(content, file_data)
+                duplicate = dedup.find("organizer", kind, signature, exclude=file_id)
+                if duplicate is not None and (dedup_mode == "skip" or duplicate.category):
+                    print(f"Near-duplicate of {duplicate.name} (similarity {duplicate.similarity})")
+                    dedup.add("organizer", file_id, file_name, kind, signature,
+                              canonical_id=duplicate.doc_id, category=duplicate.category)
+                    if dedup_mode == "link":
+                        category_to_files.setdefault(duplicate.category, []).append(file_id)
+                    observe("categorization", "file", file_start)
+                    continue
+            category = classify_content(content, file_data)
+        except RetriesExhaustedError as e:
+            # Leave the file where it is so the next run classifies it, rather than misfiling it
+            print(f"Deferred {file_name}: {e}")
+            record_items("categorization", "deferred")
+            deferred.append(file_id)
+            continue
         category = category.strip()
         print(f"Classified as: {category}")
+        record_items("categorization", "uncategorized" if category == "Uncategorized" else "classified")
         category_to_files.setdefault(category, []).append(file_id)
+        # Uncategorized may be a malformed reply, so copies are classified themselves rather than linked to it
+        if dedup is not None and category != "Uncategorized":
+            dedup.add("organizer", file_id, file_name, kind, signature, category=category)
+        if index:
+            index_categorized_file(file, content, category)
+        observe("categorization", "file", file_start)
+    if deferred:
+        print(f"Deferred {len(deferred)} file(s) because Gemini was unavailable; they stay in place for the next run.")
     return category_to_files, existing_folders
@@ -2,21 +2,36 @@
 # This module provides functionality to list files in Google Drive using the authenticated service.
 from modules.organizer.drive_auth import drive_auth
 
+PAGE_SIZE = 1000  # Drive v3 maximum
+
+def list_all_files(drive_service, q, fields="id, name, mimeType", page_size=PAGE_SIZE):
+    """
+    Run a files().list query and follow nextPageToken until every page is read.
+    Returns a list of file metadata dictionaries.
+    """
+    files = []
+    page_token = None
+    while True:
+        results = drive_service.files().list(
+            q=q,
+            fields=f"nextPageToken, files({fields})",
+            pageSize=page_size,
+            pageToken=page_token
+        ).execute()
+        files.extend(results.get('files', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return files
+
 def list_drive_files():
     """
     List all files in Google Drive.
     Returns a list of file metadata dictionaries.
     """
     drive_service = drive_auth()
-    results = drive_service.files().list(
-        q="trashed=false",
-        fields="files(id, name, mimeType)"
-    ).execute()
-    results.get('files', [])
+    files = list_all_files(drive_service, q="trashed=false")
 
     # calculate total number of files
-    total_files = len(results.get('files', []))
-    print(f"Total files in Drive: {total_files}")
+    print(f"Total files in Drive: {len(files)}")
 
-    #return files
-    return results.get('files', [])
\ No newline at end of file
+    return files
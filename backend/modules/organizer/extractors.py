@@ -0,0 +1,78 @@
+# extractors.py
+# Text extraction for PDF, DOCX and image files, independent of where the bytes came from.
+import os
+from functools import lru_cache
+from importlib.metadata import version, PackageNotFoundError
+import pdfplumber
+import docx
+from PIL import Image
+import pytesseract
+
+from shared.metrics import timed, record_bytes
+
+pytesseract.pytesseract.tesseract_cmd = os.getenv("TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PAGE_BREAK = "\f"  # same page separator MarkItDown emits, so the vector pipeline can recover page numbers
+EXTRACTOR_REVISION = 1  # bump when the extraction code below changes, so stored text is re-extracted
+
+def extract_pdf_text(file_data):
+    with pdfplumber.open(file_data) as pdf:
+        return PAGE_BREAK.join(page.extract_text() or '' for page in pdf.pages)
+
+def extract_docx_text(file_data):
+    doc = docx.Document(file_data)
+    return "\n".join(p.text for p in doc.paragraphs)
+
+def extract_text_from_image(file_data):
+    try:
+        file_data.seek(0)
+        image = Image.open(file_data)
+        text = pytesseract.image_to_string(image)
+        return text
+    except Exception as e:
+        print(f"OCR failed: {e}")
+        return ""
+
+@lru_cache(maxsize=None)
+def _library_version(name):
+    try:
+        if name == "tesseract":
+            return str(pytesseract.get_tesseract_version())
+        return version(name)
+    except (PackageNotFoundError, pytesseract.TesseractNotFoundError, OSError):
+        return None
+
+def extractor_version(mime_type):
+    """Identifies the extractor extract_text would use, for the extracted-text store. None if unsupported."""
+    if mime_type == PDF_MIME:
+        library = "pdfplumber"
+    elif mime_type == DOCX_MIME:
+        library = "python-docx"
+    elif mime_type.startswith("image/"):
+        library = "tesseract"
+    else:
+        return None
+    library_version = _library_version(library)
+    if library_version is None:
+        return None
+    return f"{library}-{library_version}-r{EXTRACTOR_REVISION}"
+
+def extract_text(file_data, mime_type):
+    """Extracts text from an in-memory file. Returns "" for unsupported types."""
+    file_data.seek(0)
+    if mime_type == PDF_MIME:
+        with timed("extractors", "pdfplumber"):
+            text = extract_pdf_text(file_data)
+    elif mime_type == DOCX_MIME:
+        with timed("extractors", "docx"):
+            text = extract_docx_text(file_data)
+    elif mime_type.startswith("image/"):
+        print("Image file detected, extracting text with OCR...")
+        with timed("extractors", "ocr"):
+            text = extract_text_from_image(file_data)
+    else:
+        return ""
+    record_bytes("extractors", "text", len(text.encode("utf-8")))
+    return text
@@ -1,15 +1,17 @@
 from modules.organizer.drive_auth import drive_auth
+from modules.organizer.drive_files import list_all_files
 import difflib
 
 drive_service = drive_auth()
 
 def get_existing_folders():
     """Return a dict of {folder_name_lower: folder_id} for all folders in the Drive."""
-    results = drive_service.files().list(
+    folders = list_all_files(
+        drive_service,
         q="mimeType='application/vnd.google-apps.folder' and trashed=false",
-        fields="files(id, name)"
-    ).execute()
-    return {folder['name'].strip().lower(): folder['id'] for folder in results.get('files', [])}
+        fields="id, name"
+    )
+    return {folder['name'].strip().lower(): folder['id'] for folder in folders}
 
 def find_best_folder_match(category, existing_folders, cutoff=0.4):
     """
@@ -93,10 +95,11 @@ def merge_and_cleanup_folders(existing_folders, cutoff=0.3):
                 print(f"Duplicate folder '{dup_name}' no longer exists. Skipping.")
                 continue
             dup_id = existing_folders[dup_name]
-            children = drive_service.files().list(
+            children = list_all_files(
+                drive_service,
                 q=f"'{dup_id}' in parents and trashed=false",
-                fields="files(id, name)"
-            ).execute().get('files', [])
+                fields="id, name"
+            )
             for child in children:
                 drive_service.files().update(
                     fileId=child['id'],
@@ -111,16 +114,18 @@ def merge_and_cleanup_folders(existing_folders, cutoff=0.3):
 
 def remove_empty_folders():
     """Delete all empty folders in the Drive (not trashed)."""
-    results = drive_service.files().list(
+    folders = list_all_files(
+        drive_service,
         q="mimeType='application/vnd.google-apps.folder' and trashed=false",
-        fields="files(id, name)"
-    ).execute()
-    folders = results.get('files', [])
+        fields="id, name"
+    )
     print(f"Checking {len(folders)} folders for emptiness...")
     for folder in folders:
+        # One child is enough to know the folder is not empty
         children = drive_service.files().list(
             q=f"'{folder['id']}' in parents and trashed=false",
-            fields="files(id)"
+            fields="files(id)",
+            pageSize=1
         ).execute()
         if not children.get('files'):
             print(f"Deleting empty folder: {folder['name']}")
@@ -0,0 +1,77 @@
+# image_prep.py
+# Shrinks and re-encodes images before they are sent to the vision model.
+import io
+import os
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Gemini tiles images at 768x768, so larger uploads cost bandwidth without adding detail
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "768"))
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+VISION_IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+
+# Formats the vision API accepts as-is; anything else (TIFF, BMP, GIF) is always re-encoded
+SUPPORTED_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+# 16-bit, 32-bit and float grayscale, e.g. archival TIFF scans; convert() clips these to white
+HIGH_BIT_DEPTH_MODES = {"I;16", "I;16L", "I;16B", "I;16N", "I", "F"}
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    image: Image.Image  # the downsized image, e.g. for perceptual hashing
+    original_bytes: int
+
+
+def _flatten(img: Image.Image, fmt: str) -> Image.Image:
+    """
+    Converts to a mode the target encoder supports; transparency goes onto white for JPEG.
+    High bit depth grayscale is stretched from its darkest to its lightest value onto 8 bits.
+    """
+    if img.mode in HIGH_BIT_DEPTH_MODES:
+        pixels = np.asarray(img, dtype=np.float32)
+        low, high = float(pixels.min()), float(pixels.max())
+        scaled = (pixels - low) * (255 / (high - low)) if high > low else np.zeros_like(pixels)
+        return Image.fromarray(scaled.round().astype(np.uint8))
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    if has_alpha and fmt == "JPEG":
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    if has_alpha:
+        return img.convert("RGBA")
+    return img if img.mode in ("RGB", "L") else img.convert("RGB")
+
+
+def prepare_image(file_data, max_side: int = VISION_MAX_SIDE, fmt: str = VISION_IMAGE_FORMAT,
+                  quality: int = VISION_IMAGE_QUALITY) -> PreparedImage:
+    """
+    Decodes an in-memory image once, at reduced scale where the codec allows it (JPEG),
+    fits it within max_side and encodes it as JPEG or WebP. The original bytes are kept
+    instead when they are already in a supported format, small enough and not larger.
+    Raises if the image cannot be decoded.
+    """
+    file_data.seek(0)
+    original = file_data.getvalue()
+    img = Image.open(file_data)
+    source_format, source_size = img.format, img.size
+    img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    img = _flatten(img, fmt)
+
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        fmt = "JPEG"
+        img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    data, mime_type = buffer.getvalue(), SUPPORTED_MIME_TYPES[fmt]
+
+    if (source_format in SUPPORTED_MIME_TYPES and max(source_size) <= max_side and len(original) <= len(data)):
+        data, mime_type = original, SUPPORTED_MIME_TYPES[source_format]
+    file_data.seek(0)
+    return PreparedImage(data, mime_type, img, len(original))
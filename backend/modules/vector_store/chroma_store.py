@@ -1,45 +1,259 @@
 import os
-from typing import List, Tuple
+import uuid
+import logging
+from typing import List, Optional, Tuple
 # from langchain_community.embeddings import HuggingFaceEmbeddings
+import numpy as np
+from chromadb.errors import ChromaError
 from langchain_community.vectorstores import Chroma
 from langchain.embeddings.base import Embeddings
 from langchain.docstore.document import Document
 from dotenv import load_dotenv
 
+from shared.metrics import timed, track, record_items
+
 # Load .env for CHROMA persistence config if needed
 load_dotenv()
 
+DEFAULT_COLLECTION = "langchain"  # LangChain's default, so existing chroma_db directories keep working
+
+# Constructor argument -> Chroma collection metadata key. Chroma stores these with the collection.
+HNSW_METADATA_KEYS = {
+    "space": "hnsw:space",                      # "l2" (Chroma's default), "cosine" or "ip"
+    "hnsw_m": "hnsw:M",                         # graph degree: memory and build time vs recall
+    "ef_construction": "hnsw:construction_ef",  # build-time beam width
+    "ef_search": "hnsw:search_ef",              # query-time beam width: latency vs recall
+}
+# Names Chroma >= 1.0 uses in collection.configuration["hnsw"]
+HNSW_CONFIGURATION_KEYS = {"space": "space", "hnsw_m": "max_neighbors",
+                           "ef_construction": "ef_construction", "ef_search": "ef_search"}
+
+BULK_BATCH_SIZE = 5000  # below Chroma's max batch size on every supported version
+
+# Chroma returns distances; these turn them into cosine similarity, the score every other store returns.
+# "l2" is the squared distance, which for unit vectors (what both embedding backends produce) is 2 - 2 * cosine.
+DISTANCE_TO_SIMILARITY = {
+    "l2": lambda distance: 1 - distance / 2,
+    "cosine": lambda distance: 1 - distance,
+    "ip": lambda distance: 1 - distance,
+}
+
+logger = logging.getLogger(__name__)
+
+def to_chroma_where(filters: dict = None):
+    """Translates {key: value or [values]} into a Chroma where clause."""
+    if not filters:
+        return None
+    clauses = [
+        {key: {"$in": list(value)} if isinstance(value, (list, tuple, set)) else {"$eq": value}}
+        for key, value in filters.items()
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def hnsw_params(collection) -> dict:
+    """Returns the HNSW settings a Chroma collection is actually using."""
+    configuration = (getattr(collection, "configuration", None) or {}).get("hnsw") or {}
+    metadata = collection.metadata or {}
+    params = {}
+    for name, key in HNSW_METADATA_KEYS.items():
+        value = configuration.get(HNSW_CONFIGURATION_KEYS[name], metadata.get(key))
+        if value is not None:
+            params[name] = value
+    return params
+
 class ChromaVectorStore:
-    def __init__(self, embedding_model: Embeddings, persist_directory: str = "chroma_db"):
+    """
+    Chroma-backed vector store. The HNSW arguments only apply when the collection is
+    created; they are then persisted with it. ef_search can also be changed on an existing
+    collection when it is loaded, while space, hnsw_m and ef_construction need a reset()
+    and rebuild.
+    """
+
+    def __init__(self, embedding_model: Embeddings, persist_directory: str = "chroma_db",
+                 collection_name: str = DEFAULT_COLLECTION, space: Optional[str] = None,
+                 hnsw_m: Optional[int] = None, ef_construction: Optional[int] = None,
+                 ef_search: Optional[int] = None):
         self.embedding_model = embedding_model.embedding_model
         self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.hnsw = {name: value for name, value in (
+            ("space", space), ("hnsw_m", hnsw_m), ("ef_construction", ef_construction), ("ef_search", ef_search)
+        ) if value is not None}
         self.vectorstore = None
+        self.space = "l2"  # the collection's distance function, read when it is opened
+
+    def _collection_metadata(self) -> Optional[dict]:
+        return {HNSW_METADATA_KEYS[name]: value for name, value in self.hnsw.items()} or None
 
+    def _apply_hnsw(self) -> None:
+        """
+        Persists a changed ef_search on an existing collection and warns about build settings that differ.
+        Chroma reads ef_search when it first loads the index, so this runs before any search.
+        """
+        if not self.hnsw:
+            return
+        collection = self.vectorstore._collection
+        persisted = hnsw_params(collection)
+        for name in ("space", "hnsw_m", "ef_construction"):
+            if name in self.hnsw and name in persisted and persisted[name] != self.hnsw[name]:
+                logger.warning(f"Collection {self.collection_name} was built with {name}={persisted[name]}; "
+                               f"reset and rebuild it to use {self.hnsw[name]}")
+        if "ef_search" in self.hnsw and persisted.get("ef_search") != self.hnsw["ef_search"]:
+            try:
+                collection.modify(configuration={"hnsw": {"ef_search": self.hnsw["ef_search"]}})
+            except (TypeError, ValueError, ChromaError) as e:
+                # Chroma < 1.0 has no configuration argument (TypeError); newer versions reject
+                # fields they cannot change (InvalidArgumentError) or a non-HNSW index (ValueError)
+                logger.warning(f"Chroma could not change ef_search on collection {self.collection_name}, "
+                               f"which keeps {persisted.get('ef_search')}: {e}")
+
+    def get_hnsw_params(self) -> dict:
+        """The HNSW settings persisted with this collection."""
+        if self.vectorstore is None:
+            self.load_index()
+        return hnsw_params(self.vectorstore._collection)
+
+    @track("chroma", "create_index")
     def create_index(self, texts: List[str], metadatas: List[dict] = None) -> None:
         """Creates a Chroma index from the given texts and metadata."""
         documents = [Document(page_content=texts[i], metadata=metadatas[i] if metadatas else {}) for i in range(len(texts))]
         self.vectorstore = Chroma.from_documents(
             documents=documents,
             embedding=self.embedding_model,
-            persist_directory=self.persist_directory
+            persist_directory=self.persist_directory,
+            collection_name=self.collection_name,
+            collection_metadata=self._collection_metadata()
         )
+        self._apply_hnsw()
+        self.space = hnsw_params(self.vectorstore._collection).get("space", "l2")
         self.vectorstore.persist()
+        record_items("chroma", "indexed_chunks", len(texts))
+
+    @track("chroma", "add_texts")
+    def add_texts(self, texts: List[str], metadatas: List[dict] = None) -> None:
+        """Appends a batch of texts to the index, loading it first if needed."""
+        if self.vectorstore is None:
+            self.load_index()
+        self.vectorstore.add_texts(texts=texts, metadatas=metadatas)
+        record_items("chroma", "indexed_chunks", len(texts))
 
+    @track("chroma", "load_index")
     def load_index(self) -> None:
         """Loads an existing Chroma index from disk."""
         self.vectorstore = Chroma(
             embedding_function=self.embedding_model,
-            persist_directory=self.persist_directory
+            persist_directory=self.persist_directory,
+            collection_name=self.collection_name,
+            collection_metadata=self._collection_metadata()
         )
+        self._apply_hnsw()
+        self.space = hnsw_params(self.vectorstore._collection).get("space", "l2")
 
-    def retrieve(self, query: str, k: int = 5) -> List[Tuple[str, dict]]:
-        """Retrieves top-k most similar chunks to a given query."""
+    @track("chroma", "reset")
+    def reset(self) -> None:
+        """Drops this collection only; other collections in the same directory are untouched."""
         if self.vectorstore is None:
             self.load_index()
-        results = self.vectorstore.similarity_search(query, k=k)
+        self.vectorstore.delete_collection()
+        self.vectorstore = None
+
+    @track("chroma", "delete")
+    def delete(self, filter: dict) -> int:
+        """Removes the chunks whose metadata matches filter and returns how many were removed."""
+        if not filter:
+            raise ValueError("delete needs a filter; use reset() to clear the collection")
+        if self.vectorstore is None:
+            self.load_index()
+        collection = self.vectorstore._collection
+        ids = collection.get(where=to_chroma_where(filter), include=[])["ids"]
+        for start in range(0, len(ids), BULK_BATCH_SIZE):
+            collection.delete(ids=ids[start:start + BULK_BATCH_SIZE])
+        record_items("chroma", "deleted_chunks", len(ids))
+        return len(ids)
+
+    def count(self) -> int:
+        if self.vectorstore is None:
+            self.load_index()
+        return self.vectorstore._collection.count()
+
+    def export_records(self) -> Tuple[List[str], List[str], List[dict], np.ndarray]:
+        """Returns (ids, texts, metadatas, embeddings) for every stored chunk."""
+        if self.vectorstore is None:
+            self.load_index()
+        collection = self.vectorstore._collection
+        ids, texts, metadatas, embeddings = [], [], [], []
+        for offset in range(0, collection.count(), BULK_BATCH_SIZE):
+            page = collection.get(include=["documents", "metadatas", "embeddings"], limit=BULK_BATCH_SIZE, offset=offset)
+            ids.extend(page["ids"])
+            texts.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            embeddings.append(np.asarray(page["embeddings"], dtype=np.float32))
+        return ids, texts, metadatas, np.concatenate(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+
+    @track("chroma", "add_embeddings")
+    def add_embeddings(self, texts: List[str], embeddings, metadatas: List[dict] = None, ids: List[str] = None) -> None:
+        """Stores precomputed embeddings without calling the embedding model; existing ids are overwritten."""
+        if self.vectorstore is None:
+            self.load_index()
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        for start in range(0, len(texts), BULK_BATCH_SIZE):
+            end = start + BULK_BATCH_SIZE
+            self.vectorstore._collection.upsert(
+                ids=ids[start:end],
+                embeddings=np.asarray(embeddings[start:end], dtype=np.float32).tolist(),
+                documents=list(texts[start:end]),
+                # Chroma rejects empty metadata dicts
+                metadatas=[metadata or None for metadata in metadatas[start:end]] if metadatas else None
+            )
+        record_items("chroma", "indexed_chunks", len(texts))
+
+    def retrieve(self, query: str, k: int = 5, filter: dict = None) -> List[Tuple[str, dict]]:
+        """Retrieves top-k most similar chunks to a given query, optionally within a metadata filter."""
+        if self.vectorstore is None:
+            self.load_index()
+        query_vector = self.embedding_model.embed_query(query)
+        with timed("chroma", "search"):
+            results = self.vectorstore.similarity_search_by_vector(query_vector, k=k, filter=to_chroma_where(filter))
+        record_items("chroma", "results", len(results))
         return [(doc.page_content, doc.metadata) for doc in results]
+
+    def search_with_scores(self, query_vector: List[float], k: int = 5, filter: dict = None) -> List[Tuple[str, dict, float]]:
+        """Returns (text, metadata, score) for the top-k chunks; scores are cosine similarities, higher is better."""
+        if self.vectorstore is None:
+            self.load_index()
+        with timed("chroma", "search"):
+            results = self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                query_vector, k=k, filter=to_chroma_where(filter))
+        record_items("chroma", "results", len(results))
+        similarity = DISTANCE_TO_SIMILARITY[self.space]
+        return [(doc.page_content, doc.metadata, similarity(distance)) for doc, distance in results]
+
+    def search_batch(self, query_vectors: List[List[float]], k: int = 5, filter: dict = None) -> List[List[Tuple[str, dict, float]]]:
+        """search_with_scores for many queries in a single collection query."""
+        if self.vectorstore is None:
+            self.load_index()
+        if not query_vectors:
+            return []
+        with timed("chroma", "search_batch"):
+            # LangChain's wrapper only queries one vector at a time, so go to the collection directly
+            response = self.vectorstore._collection.query(
+                query_embeddings=[list(vector) for vector in query_vectors],
+                n_results=k,
+                where=to_chroma_where(filter),
+                include=["documents", "metadatas", "distances"]
+            )
+        similarity = DISTANCE_TO_SIMILARITY[self.space]
+        results = [
+            [(text, metadata or {}, similarity(distance)) for text, metadata, distance in zip(texts, metadatas, distances)]
+            for texts, metadatas, distances in zip(response["documents"], response["metadatas"], response["distances"])
+        ]
+        record_items("chroma", "results", sum(len(hits) for hits in results))
+        return results
     
     def as_retriever(self, **kwargs):
         if self.vectorstore is None:
             self.load_index()
-        return self.vectorstore.as_retriever(**kwargs)
+        search_kwargs = dict(kwargs.pop("search_kwargs", {}))
+        if search_kwargs.get("filter"):
+            search_kwargs["filter"] = to_chroma_where(search_kwargs["filter"])
+        return self.vectorstore.as_retriever(search_kwargs=search_kwargs, **kwargs)
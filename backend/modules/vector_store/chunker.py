@@ -1,23 +1,225 @@
-from typing import List
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+HEADING_RE = re.compile(r"^#{1,6}\s+\S")
+TABLE_ROW_RE = re.compile(r"^\s*\|")
+TABLE_RULE_RE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    # Only markdown mode counts tokens, so recursive mode works without tiktoken installed
+    import tiktoken
+    return tiktoken.get_encoding(name)
+
+
 class Chunker:
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            separators=["\n\n", "\n", ".", " ", ""]
-        )
+    """
+    Splits text into chunks for embedding.
+
+    mode="recursive" keeps the original character-sized splitting.
+    mode="markdown" splits on the heading and table structure MarkItDown emits
+    and sizes chunks by tokens instead of characters.
+    """
+
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50,
+                 mode: str = "recursive", encoding_name: str = "cl100k_base"):
+        if mode not in ("recursive", "markdown"):
+            raise ValueError(f"Unknown chunking mode: {mode}")
+        self.mode = mode
+        self.chunk_size = chunk_size
+        if mode == "markdown":
+            self.encoding = _encoding(encoding_name)
+            self.splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                encoding_name=encoding_name,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                separators=["\n\n", "\n", ".", " ", ""]
+            )
+        else:
+            self.encoding = None
+            self.splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                separators=["\n\n", "\n", ".", " ", ""]
+            )
+
+    def token_count(self, text: str) -> int:
+        if self.encoding is None:
+            return len(text)
+        return len(self.encoding.encode(text, disallowed_special=()))
 
     def chunk_text(self, text: str) -> List[str]:
-        return self.splitter.split_text(text)
+        return list(self.iter_chunks(text))
 
-    def chunk_documents(self, documents: List[str]) -> List[str]:
-        all_chunks = []
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """Yields chunks one at a time so callers never hold the full list."""
+        for _, chunk in self.iter_chunks_with_offsets(text):
+            yield chunk
+
+    def iter_chunks_with_offsets(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        Yields (character offset in text, chunk). The offset is where the chunk's content starts;
+        for a table chunk that repeats its header, where its first new row starts.
+        """
+        if self.mode == "recursive":
+            yield from self._split_with_offsets(text)
+            return
+
+        buffer, buffer_offset, buffer_tokens = [], -1, 0
+        for line_offsets, block in self._iter_blocks(text):
+            block_tokens = self.token_count(block)
+            if block_tokens > self.chunk_size:
+                if buffer:
+                    yield buffer_offset, "\n\n".join(buffer)
+                    buffer, buffer_tokens = [], 0
+                yield from self._split_large_block(block, line_offsets)
+                continue
+            starts_section = HEADING_RE.match(block) is not None
+            if buffer and (starts_section or buffer_tokens + block_tokens > self.chunk_size):
+                yield buffer_offset, "\n\n".join(buffer)
+                buffer, buffer_tokens = [], 0
+            if not buffer:
+                buffer_offset = line_offsets[0]
+            buffer.append(block)
+            buffer_tokens += block_tokens
+        if buffer:
+            yield buffer_offset, "\n\n".join(buffer)
+
+    def iter_documents(self, documents: Iterable[str]) -> Iterator[str]:
         for doc in documents:
-            chunks = self.chunk_text(doc)
-            all_chunks.extend(chunks)
-        return all_chunks
-    
+            yield from self.iter_chunks(doc)
+
+    def chunk_documents(self, documents: List[str]) -> List[str]:
+        return list(self.iter_documents(documents))
+
+    def _split_with_offsets(self, block: str, line_offsets: List[int] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Runs the splitter over a block and maps each piece back to the source; without
+        line_offsets the block is the source. Pieces are substrings of the block in order, so
+        each is searched for only past the previous piece's start, then located by line and column.
+        """
+        line_starts = [0]
+        for line in block.split("\n")[:-1]:
+            line_starts.append(line_starts[-1] + len(line) + 1)
+        line_offsets = line_offsets or line_starts
+        search_from = 0
+        for piece in self.splitter.split_text(block):
+            index = block.find(piece, search_from)
+            if index < 0:
+                yield -1, piece
+                continue
+            search_from = index + 1
+            line = bisect_right(line_starts, index) - 1
+            yield line_offsets[line] + index - line_starts[line], piece
+
+    def _iter_blocks(self, text: str) -> Iterator[Tuple[List[int], str]]:
+        """
+        Yields (source offset of each line, block) for structural blocks: a heading, a whole
+        table, or a paragraph. Headings stay attached to the paragraph that follows them.
+        """
+        paragraph, table, heading = [], [], None
+
+        def flush():
+            nonlocal heading
+            if table:
+                offsets, lines = [offset for offset, _ in table], [line for _, line in table]
+                table.clear()
+            elif paragraph:
+                offsets, lines = [offset for offset, _ in paragraph], [line for _, line in paragraph]
+                paragraph.clear()
+                # The block is stripped, so its first line starts after any indentation
+                lines[-1] = lines[-1].rstrip()
+                offsets[0] += len(lines[0]) - len(lines[0].lstrip())
+                lines[0] = lines[0].lstrip()
+            else:
+                return None
+            if heading:
+                offsets, lines = [heading[0]] + offsets, [heading[1]] + lines
+                heading = None
+            block = "\n".join(lines)
+            return (offsets, block) if block else None
+
+        position = 0
+        for raw_line in text.splitlines(keepends=True):
+            offset, line = position, (raw_line.splitlines() or [""])[0]
+            position += len(raw_line)
+            if TABLE_ROW_RE.match(line):
+                if paragraph:
+                    block = flush()
+                    if block:
+                        yield block
+                table.append((offset, line.rstrip()))
+                continue
+            if table:
+                block = flush()
+                if block:
+                    yield block
+            if HEADING_RE.match(line):
+                block = flush()
+                if block:
+                    yield block
+                if heading:
+                    yield [heading[0]], heading[1]
+                heading = (offset + len(line) - len(line.lstrip()), line.strip())
+            elif not line.strip():
+                block = flush()
+                if block:
+                    yield block
+            else:
+                paragraph.append((offset, line))
+        block = flush()
+        if block:
+            yield block
+        if heading:
+            yield [heading[0]], heading[1]
+
+    def _split_large_block(self, block: str, line_offsets: List[int]) -> Iterator[Tuple[int, str]]:
+        """Splits an oversized table by rows (repeating its header) or falls back to the splitter."""
+        lines = block.splitlines()
+        heading = None
+        if lines and HEADING_RE.match(lines[0]):
+            heading, lines = lines[0], lines[1:]
+        if not lines or not all(TABLE_ROW_RE.match(line) for line in lines):
+            yield from self._split_with_offsets(block, line_offsets)
+            return
+
+        row_offsets = line_offsets[1:] if heading else line_offsets
+        header = lines[:2] if len(lines) > 1 and TABLE_RULE_RE.match(lines[1]) else lines[:1]
+        prefix = ([heading] if heading else []) + header
+        prefix_tokens = self.token_count("\n".join(prefix))
+        rows, rows_tokens, chunk_offset = [], prefix_tokens, line_offsets[0]
+        for index in range(len(header), len(lines)):
+            row, row_tokens = lines[index], self.token_count(lines[index]) + 1
+            if rows and rows_tokens + row_tokens > self.chunk_size:
+                yield chunk_offset, "\n".join(prefix + rows)
+                rows, rows_tokens, chunk_offset = [], prefix_tokens, row_offsets[index]
+            rows.append(row)
+            rows_tokens += row_tokens
+        if rows:
+            yield chunk_offset, "\n".join(prefix + rows)
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Groups an iterable into lists of at most batch_size items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+@lru_cache(maxsize=None)
+def get_chunker(mode: str = "recursive", chunk_size: int = 500, chunk_overlap: int = 50) -> Chunker:
+    """Returns a shared Chunker so the splitter is not rebuilt on every call."""
+    return Chunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, mode=mode)
+
+
 def chunk_text(text: str) -> List[str]:
-    return Chunker().chunk_text(text)
+    return get_chunker().chunk_text(text)
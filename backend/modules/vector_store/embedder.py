@@ -1,20 +1,71 @@
 import os
-import torch
 
 from typing import List
-from langchain_huggingface import HuggingFaceEmbeddings
 from dotenv import load_dotenv
+from langchain.embeddings.base import Embeddings
+
+from shared.metrics import timed, record_items
 
 
 load_dotenv()
 
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"  # Small and fast
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch", "onnx" or "remote" (shared embedding server)
+# The backends' vectors differ slightly (ONNX runs an int8-quantized copy of the model), so stored vectors
+# are labelled with the variant that produced them
+EMBEDDING_VARIANTS = {"torch": "torch-fp32", "onnx": "onnx-int8"}
+
+def embedding_variant(backend: str = None) -> str:
+    """Names the vectors a backend produces, e.g. "onnx-int8"; for "remote" it asks the embedding server."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "remote":
+        from modules.vector_store.embedding_server import EmbeddingServerClient
+        return EmbeddingServerClient().ping()["embedding"]
+    if backend not in EMBEDDING_VARIANTS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    return EMBEDDING_VARIANTS[backend]
+
+class InstrumentedEmbeddings(Embeddings):
+    """Wraps an Embeddings model so every call, including those made by the vector store, is measured."""
+
+    def __init__(self, model: Embeddings, backend: str):
+        self.model = model
+        self.backend = backend
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with timed("embedder", "embed_documents"):
+            embeddings = self.model.embed_documents(texts)
+        record_items("embedder", "documents", len(texts))
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        with timed("embedder", "embed_query"):
+            embedding = self.model.embed_query(text)
+        record_items("embedder", "queries")
+        return embedding
+
 class EmbeddingGenerator:
-    def __init__(self):
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",  # Small and fast
-            model_kwargs={'device': 'cuda' if torch.cuda.is_available() else 'cpu'},  # Use GPU if available
-            encode_kwargs={'normalize_embeddings': False}
-        )
+    def __init__(self, backend: str = None):
+        self.backend = backend or EMBEDDING_BACKEND
+        if self.backend == "onnx":
+            # Keeps torch out of the process entirely
+            from modules.vector_store.onnx_embedder import OnnxMiniLMEmbeddings
+            model = OnnxMiniLMEmbeddings()
+        elif self.backend == "remote":
+            # One model in the embedding server process, shared by every API worker
+            from modules.vector_store.embedding_server import RemoteEmbeddings
+            model = RemoteEmbeddings()
+        elif self.backend == "torch":
+            import torch
+            from langchain_huggingface import HuggingFaceEmbeddings
+            model = HuggingFaceEmbeddings(
+                model_name=MODEL_NAME,
+                model_kwargs={'device': 'cuda' if torch.cuda.is_available() else 'cpu'},  # Use GPU if available
+                encode_kwargs={'normalize_embeddings': False}
+            )
+        else:
+            raise ValueError(f"Unknown embedding backend: {self.backend}")
+        self.embedding_model = InstrumentedEmbeddings(model, self.backend)
 
     def generate(self, texts: List[str]) -> List[List[float]]:
         return self.embedding_model.embed_documents(texts)
@@ -22,5 +73,5 @@ class EmbeddingGenerator:
     def generate_single(self, text: str) -> List[float]:
         return self.embedding_model.embed_query(text)
 
-def load_embedding_model():
-    return EmbeddingGenerator()
+def load_embedding_model(backend: str = None):
+    return EmbeddingGenerator(backend)
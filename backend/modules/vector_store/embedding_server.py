@@ -0,0 +1,384 @@
+#embedding_server.py
+# One process owns the embedding model and the vector store; API workers reach both over a Unix socket.
+import argparse
+import json
+import os
+import queue
+import select
+import socket
+import socketserver
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.docstore.document import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from shared.metrics import timed, record_items
+
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "/tmp/hsf_embedding.sock")
+EMBEDDING_SERVER_MAX_BATCH = int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "64"))
+EMBEDDING_SERVER_MAX_WAIT_MS = float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS", "5"))
+
+# Store methods workers may call; everything else (reset, export) stays local to the server host
+STORE_METHODS = {"load_index", "count", "create_index", "add_texts", "add_embeddings", "delete",
+                 "retrieve", "search_with_scores", "search_batch"}
+# Calls that are safe to repeat when the reply is lost; writes are not, as the server may have applied them
+READ_ONLY_STORE_METHODS = {"load_index", "count", "retrieve", "search_with_scores", "search_batch"}
+# Calls that change the store in memory or on disk: they run one at a time and never alongside a search
+EXCLUSIVE_STORE_METHODS = {"load_index", "create_index", "add_texts", "add_embeddings", "delete"}
+FRAME = struct.Struct("!II")  # header length, body length
+
+
+class EmbeddingServerError(Exception):
+    """Raised on the client when the server reports a failure."""
+
+
+def _send(sock, header: dict, body: bytes = b"") -> None:
+    head = json.dumps(header).encode("utf-8")
+    sock.sendall(FRAME.pack(len(head), len(body)) + head + body)
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("embedding server connection closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _recv(sock) -> Tuple[dict, bytes]:
+    head_size, body_size = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    header = json.loads(_recv_exact(sock, head_size).decode("utf-8"))
+    return header, _recv_exact(sock, body_size) if body_size else b""
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent requests from every worker into one model call of up to
+    max_batch texts, waiting at most max_wait seconds for the batch to fill.
+    """
+
+    def __init__(self, model: Embeddings, max_batch: int = EMBEDDING_SERVER_MAX_BATCH,
+                 max_wait: float = EMBEDDING_SERVER_MAX_WAIT_MS / 1000):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        item = {"texts": list(texts), "done": threading.Event()}
+        self.queue.put(item)
+        item["done"].wait()
+        if "error" in item:
+            raise item["error"]
+        return item["result"]
+
+    def _run(self) -> None:
+        while True:
+            items = [self.queue.get()]
+            count = len(items[0]["texts"])
+            deadline = time.monotonic() + self.max_wait
+            while count < self.max_batch:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                items.append(item)
+                count += len(item["texts"])
+            try:
+                vectors = np.asarray(self.model.embed_documents([t for item in items for t in item["texts"]]),
+                                     dtype=np.float32)
+            except Exception as e:
+                for item in items:
+                    item["error"] = e
+                    item["done"].set()
+                continue
+            record_items("embedding_server", "batches")
+            record_items("embedding_server", "requests", len(items))
+            offset = 0
+            for item in items:
+                item["result"] = vectors[offset:offset + len(item["texts"])]
+                offset += len(item["texts"])
+                item["done"].set()
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeddings facade over the batcher, so the server's own vector store shares it too."""
+
+    def __init__(self, batcher: EmbeddingBatcher):
+        self.batcher = batcher
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.batcher.embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.embed([text])[0].tolist()
+
+
+class _ServerEmbedder:
+    def __init__(self, embedding_model: Embeddings):
+        self.embedding_model = embedding_model
+
+
+class _ReadWriteLock:
+    """Many readers or one writer. A waiting writer holds back new readers, so searches cannot starve it."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing = False
+        self.writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self.condition:
+            while self.writing or self.writers_waiting:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.condition:
+            self.writers_waiting += 1
+            while self.writing or self.readers:
+                self.condition.wait()
+            self.writers_waiting -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+
+def _jsonable(value):
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves embed requests and whitelisted vector store calls, one thread per worker connection."""
+    daemon_threads = True
+    # socketserver's default backlog of 5 makes connects fail with EAGAIN when many worker threads start at once
+    request_queue_size = 128
+
+    def __init__(self, socket_path: str, batcher: EmbeddingBatcher, vector_store=None, embedding: str = None):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.batcher = batcher
+        self.vector_store = vector_store
+        self.embedding = embedding  # the embedding variant, reported to workers by ping
+        # Connections are served on their own threads, and the stores are not safe for concurrent writes
+        self.store_lock = _ReadWriteLock()
+        super().__init__(socket_path, EmbeddingRequestHandler)
+        os.chmod(socket_path, 0o660)
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    def call_store(self, method: str, args: dict):
+        lock = self.server.store_lock
+        with lock.write() if method in EXCLUSIVE_STORE_METHODS else lock.read():
+            return getattr(self.server.vector_store, method)(**args)
+
+    def handle(self):
+        while True:
+            try:
+                header, body = _recv(self.request)
+            except ConnectionError:
+                return
+            try:
+                op = header.get("op")
+                if op == "embed":
+                    with timed("embedding_server", "embed"):
+                        vectors = self.server.batcher.embed(header["texts"])
+                    _send(self.request, {"ok": True, "shape": list(vectors.shape)}, vectors.tobytes())
+                elif op == "store":
+                    method = header["method"]
+                    if self.server.vector_store is None or method not in STORE_METHODS:
+                        raise ValueError(f"Store method not available: {method}")
+                    with timed("embedding_server", method):
+                        result = self.call_store(method, header.get("args", {}))
+                    _send(self.request, {"ok": True, "result": _jsonable(result)})
+                elif op == "ping":
+                    _send(self.request, {"ok": True, "pid": os.getpid(), "embedding": self.server.embedding})
+                else:
+                    raise ValueError(f"Unknown op: {op}")
+            except BrokenPipeError:
+                return  # the worker closed the connection (e.g. it timed out); there is no one to reply to
+            except Exception as e:
+                _send(self.request, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+class EmbeddingServerClient:
+    """
+    Thread-safe client: each thread keeps its own connection. A connection the server has closed is
+    replaced before use; a request that fails mid-flight is resent once only if it is idempotent.
+    """
+
+    def __init__(self, socket_path: str = EMBEDDING_SERVER_SOCKET, timeout: float = 120.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self.local, "sock", None)
+        # An idle connection has nothing to read, so a readable one was closed by the server
+        # (e.g. it restarted) or holds a stray reply; either way it cannot be reused
+        if sock is not None and select.select([sock], [], [], 0)[0]:
+            sock.close()
+            sock = None
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self.local.sock = sock
+        return sock
+
+    def request(self, header: dict, idempotent: bool = True) -> Tuple[dict, bytes]:
+        for attempt in range(2 if idempotent else 1):
+            sock = self._connection()
+            try:
+                _send(sock, header)
+                response, body = _recv(sock)
+                break
+            except (ConnectionError, BrokenPipeError, socket.timeout):
+                sock.close()
+                self.local.sock = None
+                if attempt or not idempotent:
+                    raise
+        if not response["ok"]:
+            raise EmbeddingServerError(response["error"])
+        return response, body
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response, body = self.request({"op": "embed", "texts": list(texts)})
+        return np.frombuffer(body, dtype=np.float32).reshape(response["shape"])
+
+    def ping(self) -> dict:
+        """The server's pid and embedding variant."""
+        return self.request({"op": "ping"})[0]
+
+    def call_store(self, method: str, **args):
+        return self.request({"op": "store", "method": method, "args": args},
+                            idempotent=method in READ_ONLY_STORE_METHODS)[0]["result"]
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings computed by the shared embedding server instead of a model in this process."""
+
+    def __init__(self, socket_path: str = EMBEDDING_SERVER_SOCKET):
+        self.client = EmbeddingServerClient(socket_path)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed([text])[0].tolist()
+
+
+class RemoteRetriever(BaseRetriever):
+    """LangChain retriever over a RemoteVectorStore."""
+    store: Any
+    k: int = 4
+    filter: Optional[dict] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [Document(page_content=text, metadata=metadata)
+                for text, metadata in self.store.retrieve(query, k=self.k, filter=self.filter)]
+
+
+class RemoteVectorStore:
+    """
+    The embedding server's vector store, used from an API worker. The server is the only
+    process that opens the index, so workers never hold their own Chroma client or matrices.
+    """
+
+    def __init__(self, embedding_model=None, socket_path: str = EMBEDDING_SERVER_SOCKET):
+        self.client = EmbeddingServerClient(socket_path)
+
+    def load_index(self) -> None:
+        self.client.call_store("load_index")
+
+    def count(self) -> int:
+        return self.client.call_store("count")
+
+    def create_index(self, texts: List[str], metadatas: List[dict] = None) -> None:
+        self.client.call_store("create_index", texts=list(texts), metadatas=metadatas)
+
+    def add_texts(self, texts: List[str], metadatas: List[dict] = None) -> None:
+        self.client.call_store("add_texts", texts=list(texts), metadatas=metadatas)
+
+    def add_embeddings(self, texts: List[str], embeddings, metadatas: List[dict] = None, ids: List[str] = None) -> None:
+        self.client.call_store("add_embeddings", texts=list(texts), embeddings=np.asarray(embeddings).tolist(),
+                               metadatas=metadatas, ids=list(ids) if ids is not None else None)
+
+    def delete(self, filter: dict) -> int:
+        return self.client.call_store("delete", filter=filter)
+
+    def retrieve(self, query: str, k: int = 5, filter: dict = None, **kwargs) -> List[Tuple[str, dict]]:
+        return [tuple(hit) for hit in self.client.call_store("retrieve", query=query, k=k, filter=filter, **kwargs)]
+
+    def search_with_scores(self, query_vector, k: int = 5, filter: dict = None, **kwargs) -> List[Tuple[str, dict, float]]:
+        return [tuple(hit) for hit in self.client.call_store(
+            "search_with_scores", query_vector=np.asarray(query_vector).tolist(), k=k, filter=filter, **kwargs)]
+
+    def search_batch(self, query_vectors, k: int = 5, filter: dict = None, **kwargs) -> List[List[Tuple[str, dict, float]]]:
+        results = self.client.call_store("search_batch", query_vectors=np.asarray(query_vectors).tolist(),
+                                         k=k, filter=filter, **kwargs)
+        return [[tuple(hit) for hit in hits] for hits in results]
+
+    def as_retriever(self, **kwargs):
+        search_kwargs = kwargs.get("search_kwargs", {})
+        return RemoteRetriever(store=self, k=search_kwargs.get("k", 4), filter=search_kwargs.get("filter"))
+
+
+def main():
+    from modules.vector_store.embedder import EMBEDDING_BACKEND, EmbeddingGenerator, embedding_variant
+    from modules.vector_store.store import VECTOR_BACKEND, load_vector_store
+
+    parser = argparse.ArgumentParser(description="Serve embeddings and vector search to local API workers.")
+    parser.add_argument("--socket", default=EMBEDDING_SERVER_SOCKET)
+    parser.add_argument("--embedding-backend", default=EMBEDDING_BACKEND if EMBEDDING_BACKEND != "remote" else "torch")
+    parser.add_argument("--vector-backend", default=VECTOR_BACKEND if VECTOR_BACKEND != "remote" else "chroma")
+    parser.add_argument("--no-store", action="store_true", help="serve embeddings only")
+    args = parser.parse_args()
+
+    model = EmbeddingGenerator(args.embedding_backend).embedding_model
+    batched = BatchedEmbeddings(EmbeddingBatcher(model))
+    vector_store = None
+    if not args.no_store:
+        vector_store = load_vector_store(_ServerEmbedder(batched), backend=args.vector_backend)
+        vector_store.load_index()
+    # The store embeds through `batched` too, so its queries join the workers' batches
+    server = EmbeddingServer(args.socket, batched.batcher, vector_store, embedding_variant(args.embedding_backend))
+    print(f"[INFO] Embedding server ({args.embedding_backend}, {args.vector_backend if vector_store else 'no'} store) "
+          f"listening on {args.socket}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
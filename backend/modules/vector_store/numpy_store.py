@@ -0,0 +1,445 @@
+import json
+import os
+import shutil
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.docstore.document import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from shared.metrics import timed, track, record_items
+
+EMBEDDINGS_FILE = "embeddings.npy"
+SCALES_FILE = "scales.npy"
+FULL_FILE = "embeddings_f32.npy"
+DOCUMENTS_FILE = "documents.json"
+MANIFEST_FILE = "index.json"
+SEGMENTS_DIR = "segments"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantizes normalized rows, returning the matrix and per-row scales."""
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _save_atomic(path: str, array: np.ndarray) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class _SegmentedArray:
+    """Read-only row access over several (memory-mapped) arrays as if they were concatenated."""
+
+    def __init__(self, parts: List[np.ndarray]):
+        self.parts = parts
+        self.offsets = np.cumsum([0] + [len(part) for part in parts])
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.parts[0] if len(self.parts) == 1 else np.concatenate(self.parts)
+        return np.asarray(array, dtype=dtype)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(len(self))
+            pieces = [part[max(start - offset, 0):min(stop - offset, len(part))]
+                      for part, offset in zip(self.parts, self.offsets)
+                      if max(start - offset, 0) < min(stop - offset, len(part))]
+            if len(pieces) == 1:
+                return pieces[0]
+            return np.concatenate(pieces) if pieces else self.parts[0][:0]
+        rows = np.asarray(key)
+        segments = np.searchsorted(self.offsets, rows, side="right") - 1
+        out = np.empty((len(rows),) + self.parts[0].shape[1:], dtype=self.parts[0].dtype)
+        for segment in np.unique(segments):
+            mask = segments == segment
+            out[mask] = self.parts[segment][rows[mask] - self.offsets[segment]]
+        return out
+
+
+class NumpyRetriever(BaseRetriever):
+    """LangChain retriever over a NumpyVectorStore."""
+    store: Any
+    k: int = 4
+    filter: Optional[dict] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [Document(page_content=text, metadata=metadata)
+                for text, metadata in self.store.retrieve(query, k=self.k, filter=self.filter)]
+
+
+class NumpyVectorStore:
+    """
+    Exact-search vector store backed by memory-mapped NumPy matrices.
+
+    Embeddings are normalized and stored as int8 (with per-row scales) or
+    float16. Search is a blocked dot product over the whole matrix; the top
+    candidates can optionally be rescored against a float32 copy.
+
+    Each write adds an immutable segment directory; index.json lists the live
+    segments and is swapped with os.replace, so a crash mid-write leaves the
+    previous index intact. Segments of similar size are merged, which keeps
+    their number logarithmic and the total rewrite cost O(N log N).
+    """
+
+    def __init__(self, embedding_model: Embeddings, persist_directory: str = "numpy_index",
+                 dtype: str = "int8", rescore: bool = True, rescore_factor: int = 4,
+                 block_size: int = 32768):
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.embedding_model = embedding_model.embedding_model
+        self.persist_directory = persist_directory
+        self.dtype = dtype
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        self.block_size = block_size
+        self.matrix = None
+        self.scales = None
+        self.full = None
+        self.texts: List[str] = []
+        self.metadatas: List[dict] = []
+        self.segments: List[dict] = []
+        self._arrays: List[tuple] = []  # (matrix, scales, full) per live segment
+        self.next_segment = 1
+        self._posting_cache = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    def create_index(self, texts: List[str], metadatas: List[dict] = None) -> None:
+        """Embeds the given texts and appends them to the on-disk index."""
+        self.add_texts(texts, metadatas)
+
+    @track("numpy_store", "add_texts")
+    def add_texts(self, texts: List[str], metadatas: List[dict] = None) -> None:
+        """Appends a batch of texts to the index as a new segment."""
+        if not texts:
+            return
+        if self.matrix is None:
+            self.load_index()
+        vectors = _normalize(np.asarray(self.embedding_model.embed_documents(texts), dtype=np.float32))
+        self._append(vectors, list(texts), list(metadatas) if metadatas else [{} for _ in texts])
+        record_items("numpy_store", "indexed_chunks", len(texts))
+
+    def _write_segment(self, quantized: np.ndarray, scales: np.ndarray, full: Optional[np.ndarray],
+                       texts: List[str], metadatas: List[dict]) -> dict:
+        """Writes a new segment directory that nothing references until the manifest is swapped."""
+        number, self.next_segment = self.next_segment, self.next_segment + 1
+        path = os.path.join(SEGMENTS_DIR, f"{number:06d}")
+        directory = self._path(path)
+        if os.path.exists(directory):
+            shutil.rmtree(directory)  # left over from a write that crashed before its manifest swap
+        os.makedirs(directory)
+        _save_atomic(os.path.join(directory, EMBEDDINGS_FILE), quantized)
+        _save_atomic(os.path.join(directory, SCALES_FILE), scales)
+        if full is not None:
+            _save_atomic(os.path.join(directory, FULL_FILE), full.astype(np.float32))
+        _write_json_atomic(os.path.join(directory, DOCUMENTS_FILE), {"texts": texts, "metadatas": metadatas})
+        return {"number": number, "path": path, "rows": len(texts), "full": full is not None}
+
+    def _load_arrays(self, segment: dict, mmap_mode: Optional[str] = "r"):
+        """Returns a segment's (matrix, scales, full or None) without reading its documents."""
+        directory = self._path(segment["path"])
+        matrix = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode=mmap_mode)
+        scales = np.load(os.path.join(directory, SCALES_FILE), mmap_mode=mmap_mode)
+        full = np.load(os.path.join(directory, FULL_FILE), mmap_mode=mmap_mode) if segment["full"] else None
+        return matrix, scales, full
+
+    def _read_segment(self, segment: dict, mmap_mode: Optional[str] = "r"):
+        """Returns (matrix, scales, full or None, documents), checking that all of them have the listed rows."""
+        with open(os.path.join(self._path(segment["path"]), DOCUMENTS_FILE), encoding="utf-8") as f:
+            documents = json.load(f)
+        matrix, scales, full = self._load_arrays(segment, mmap_mode)
+        rows = segment["rows"]
+        lengths = [len(matrix), len(scales), len(documents["texts"]), len(documents["metadatas"])]
+        if full is not None:
+            lengths.append(len(full))
+        if any(length != rows for length in lengths):
+            raise ValueError(f"Index at {self.persist_directory} is corrupt: segment {segment['path']} "
+                             f"should have {rows} rows, found {lengths}")
+        return matrix, scales, full, documents
+
+    def _remove_segment(self, segment: dict) -> None:
+        if segment["path"] == ".":  # an index written before segments existed
+            for name in (DOCUMENTS_FILE, EMBEDDINGS_FILE, SCALES_FILE, FULL_FILE):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+        else:
+            shutil.rmtree(self._path(segment["path"]), ignore_errors=True)
+
+    def _swap(self, segments: List[dict], written: List[dict]) -> None:
+        """Makes segments the live index with one os.replace, then removes the segments no longer listed."""
+        _write_json_atomic(self._path(MANIFEST_FILE), {"dtype": self.dtype, "segments": segments})
+        live = {segment["path"] for segment in segments}
+        for segment in self.segments + written:
+            if segment["path"] not in live:
+                self._remove_segment(segment)
+        loaded = {segment["path"]: arrays for segment, arrays in zip(self.segments, self._arrays)}
+        self._arrays = [loaded.get(segment["path"]) or self._load_arrays(segment) for segment in segments]
+        self.segments = segments
+
+    def _commit(self, segments: List[dict], written: List[dict], texts: List[str], metadatas: List[dict]) -> None:
+        """
+        Swaps in the segments after an append. The appended rows always come last, so memory is
+        updated in place and only new segment files are opened.
+        """
+        self._swap(segments, written)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self._posting_cache = {}
+        self._map_arrays()
+
+    def _merge(self, segments: List[dict], texts: List[str], metadatas: List[dict]) -> dict:
+        """Rewrites segments as one; texts and metadatas are their rows, taken from memory."""
+        parts = [self._load_arrays(segment, mmap_mode=None) for segment in segments]
+        full = np.concatenate([part[2] for part in parts]) if all(part[2] is not None for part in parts) else None
+        return self._write_segment(np.concatenate([part[0] for part in parts]),
+                                   np.concatenate([part[1] for part in parts]), full, texts, metadatas)
+
+    def _append(self, vectors: np.ndarray, texts: List[str], metadatas: List[dict]) -> None:
+        os.makedirs(self.persist_directory, exist_ok=True)
+        quantized, scales = _quantize(vectors, self.dtype)
+        # A float32 copy is only useful while every segment has one
+        keep_full = self.rescore and all(segment["full"] for segment in self.segments)
+        written = [self._write_segment(quantized, scales, vectors if keep_full else None, texts, metadatas)]
+        segments = self.segments + written
+        # Merge trailing segments of similar size, like carries in a binary counter
+        while len(segments) > 1 and segments[-2]["rows"] <= segments[-1]["rows"]:
+            start = len(self.texts) + len(texts) - segments[-2]["rows"] - segments[-1]["rows"]
+            written.append(self._merge(segments[-2:], self.texts[start:] + texts, self.metadatas[start:] + metadatas))
+            segments[-2:] = written[-1:]
+        self._commit(segments, written, texts, metadatas)
+
+    @track("numpy_store", "load_index")
+    def load_index(self) -> None:
+        """Memory-maps an existing index from disk, checking every segment's row counts."""
+        if os.path.exists(self._path(MANIFEST_FILE)):
+            with open(self._path(MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+            dtype, segments = manifest["dtype"], manifest["segments"]
+        elif os.path.exists(self._path(DOCUMENTS_FILE)):
+            # A single-file index from before segments; it is read as one segment until the next merge
+            with open(self._path(DOCUMENTS_FILE), encoding="utf-8") as f:
+                documents = json.load(f)
+            dtype, rows = documents["dtype"], len(documents["texts"])
+            full = os.path.exists(self._path(FULL_FILE)) and len(np.load(self._path(FULL_FILE), mmap_mode="r")) == rows
+            segments = [{"number": 0, "path": ".", "rows": rows, "full": full}]
+        else:
+            dtype, segments = self.dtype, []
+        if dtype != self.dtype:
+            raise ValueError(f"Index at {self.persist_directory} was built as {dtype}, not {self.dtype}")
+        parts = [self._read_segment(segment) for segment in segments]
+        self.segments = segments
+        self.next_segment = max([segment["number"] for segment in segments] + [0]) + 1
+        self.texts = [text for part in parts for text in part[3]["texts"]]
+        self.metadatas = [metadata for part in parts for metadata in part[3]["metadatas"]]
+        self._arrays = [part[:3] for part in parts]
+        self._posting_cache = {}
+        self._map_arrays()
+
+    def _map_arrays(self) -> None:
+        """Points matrix, scales and full at the live segments' arrays."""
+        if not self._arrays:
+            self.matrix, self.scales, self.full = None, None, None
+            return
+        self.matrix = _SegmentedArray([arrays[0] for arrays in self._arrays])
+        self.scales = _SegmentedArray([arrays[1] for arrays in self._arrays])
+        has_full = self.rescore and all(arrays[2] is not None for arrays in self._arrays)
+        self.full = _SegmentedArray([arrays[2] for arrays in self._arrays]) if has_full else None
+
+    @track("numpy_store", "add_embeddings")
+    def add_embeddings(self, texts: List[str], embeddings, metadatas: List[dict] = None, ids: List[str] = None) -> None:
+        """Appends precomputed embeddings without calling the embedding model. Rows have no ids, so ids are ignored."""
+        if not len(texts):
+            return
+        if self.matrix is None:
+            self.load_index()
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        self._append(vectors, list(texts), list(metadatas) if metadatas else [{} for _ in texts])
+        record_items("numpy_store", "indexed_chunks", len(texts))
+
+    @track("numpy_store", "delete")
+    def delete(self, filter: dict) -> int:
+        """
+        Removes the rows whose metadata matches filter (as in search) and returns how many were removed.
+        Only the segments holding such rows are rewritten.
+        """
+        if not filter:
+            raise ValueError("delete needs a filter; use reset() to clear the index")
+        if self.matrix is None:
+            self.load_index()
+        if not self.texts:
+            return 0
+        rows = self._matching_rows(filter)
+        if not len(rows):
+            return 0
+        keep = np.ones(len(self.texts), dtype=bool)
+        keep[rows] = False
+        segments, written = [], []
+        for segment, (matrix, scales, full), start in zip(self.segments, self._arrays, self.matrix.offsets):
+            kept = np.flatnonzero(keep[start:start + segment["rows"]])
+            if len(kept) == segment["rows"]:
+                segments.append(segment)
+            elif len(kept):
+                written.append(self._write_segment(
+                    np.asarray(matrix[kept]), np.asarray(scales[kept]), None if full is None else np.asarray(full[kept]),
+                    [self.texts[start + i] for i in kept], [self.metadatas[start + i] for i in kept]))
+                segments.append(written[-1])
+        self._swap(segments, written)
+        self.texts = [text for text, kept in zip(self.texts, keep) if kept]
+        self.metadatas = [metadata for metadata, kept in zip(self.metadatas, keep) if kept]
+        self._posting_cache = {}
+        self._map_arrays()
+        record_items("numpy_store", "deleted_chunks", len(rows))
+        return len(rows)
+
+    def count(self) -> int:
+        if self.matrix is None:
+            self.load_index()
+        return len(self.texts)
+
+    def export_records(self) -> Tuple[List[str], List[str], List[dict], np.ndarray]:
+        """
+        Returns (ids, texts, metadatas, embeddings). Ids are row numbers. Embeddings are the
+        normalized float32 copy when rescoring keeps one, otherwise the dequantized matrix.
+        """
+        if self.matrix is None:
+            self.load_index()
+        if not self.texts:
+            return [], [], [], np.empty((0, 0), dtype=np.float32)
+        if self.full is not None:
+            embeddings = np.asarray(self.full, dtype=np.float32)
+        else:
+            embeddings = np.asarray(self.matrix, dtype=np.float32) * np.asarray(self.scales)[:, None]
+        return [str(row) for row in range(len(self.texts))], list(self.texts), list(self.metadatas), embeddings
+
+    @track("numpy_store", "reset")
+    def reset(self) -> None:
+        """Deletes this index's files and clears it from memory."""
+        self.matrix, self.scales, self.full = None, None, None
+        for name in (MANIFEST_FILE, DOCUMENTS_FILE, EMBEDDINGS_FILE, SCALES_FILE, FULL_FILE):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+        shutil.rmtree(self._path(SEGMENTS_DIR), ignore_errors=True)
+        self.load_index()
+
+    def _postings(self, key: str) -> dict:
+        """Lazily built inverted index {metadata value: row ids} for one metadata key."""
+        if key not in self._posting_cache:
+            index = {}
+            for row, metadata in enumerate(self.metadatas):
+                if key in metadata:
+                    index.setdefault(metadata[key], []).append(row)
+            self._posting_cache[key] = {value: np.array(rows, dtype=np.int64) for value, rows in index.items()}
+        return self._posting_cache[key]
+
+    def _matching_rows(self, filters: dict) -> np.ndarray:
+        """Rows whose metadata matches every key; a list value matches any of its items."""
+        rows = None
+        for key, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            postings = self._postings(key)
+            matched = [postings[v] for v in values if v in postings]
+            matched = np.unique(np.concatenate(matched)) if matched else np.empty(0, dtype=np.int64)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return rows
+
+    def _scores(self, query_vectors: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """Scores every row (or only rows) against each query; returns shape (rows, queries)."""
+        count = len(self.texts) if rows is None else len(rows)
+        scores = np.empty((count, len(query_vectors)), dtype=np.float32)
+        for start in range(0, count, self.block_size):
+            end = start + self.block_size
+            if rows is None:
+                block, scales = self.matrix[start:end], self.scales[start:end]
+            else:
+                block, scales = self.matrix[rows[start:end]], self.scales[rows[start:end]]
+            scores[start:end] = (np.asarray(block, dtype=np.float32) @ query_vectors.T) * scales[:, None]
+        return scores
+
+    def search_by_vector(self, query_vector, k: int = 5, filter: dict = None) -> List[Tuple[int, float]]:
+        """
+        Returns (row, score) pairs for the top-k rows, best first.
+        With a metadata filter only the matching rows are scanned.
+        """
+        return self.search_by_vectors([query_vector], k=k, filter=filter)[0]
+
+    def search_by_vectors(self, query_vectors, k: int = 5, filter: dict = None) -> List[List[Tuple[int, float]]]:
+        """Batched search_by_vector: every block of the matrix is read once for all queries."""
+        if self.matrix is None:
+            self.load_index()
+        if not self.texts or not len(query_vectors):
+            return [[] for _ in query_vectors]
+        candidates = self._matching_rows(filter) if filter else None
+        if candidates is not None and not len(candidates):
+            return [[] for _ in query_vectors]
+        query_vectors = _normalize(np.asarray(query_vectors, dtype=np.float32))
+        scores = self._scores(query_vectors, candidates)
+        k = min(k, len(scores))
+        shortlist_size = min(len(scores), k * self.rescore_factor) if self.full is not None else k
+        shortlists = np.argpartition(-scores, shortlist_size - 1, axis=0)[:shortlist_size]
+        results = []
+        for j, query_vector in enumerate(query_vectors):
+            shortlist = shortlists[:, j]
+            rows = shortlist if candidates is None else candidates[shortlist]
+            if self.full is not None:
+                order = np.argsort(rows)
+                rows = rows[order]
+                shortlist_scores = np.asarray(self.full[rows]) @ query_vector
+            else:
+                shortlist_scores = scores[shortlist, j]
+            best = np.argsort(-shortlist_scores)[:k]
+            results.append([(int(rows[i]), float(shortlist_scores[i])) for i in best])
+        return results
+
+    def search_with_scores(self, query_vector, k: int = 5, filter: dict = None) -> List[Tuple[str, dict, float]]:
+        """Returns (text, metadata, score) for the top-k chunks; scores are cosine similarities, higher is better."""
+        with timed("numpy_store", "search"):
+            hits = self.search_by_vector(query_vector, k=k, filter=filter)
+        record_items("numpy_store", "results", len(hits))
+        return [(self.texts[row], self.metadatas[row], score) for row, score in hits]
+
+    def search_batch(self, query_vectors, k: int = 5, filter: dict = None) -> List[List[Tuple[str, dict, float]]]:
+        """search_with_scores for many queries in one pass over the index."""
+        with timed("numpy_store", "search_batch"):
+            batches = self.search_by_vectors(query_vectors, k=k, filter=filter)
+        record_items("numpy_store", "results", sum(len(hits) for hits in batches))
+        return [[(self.texts[row], self.metadatas[row], score) for row, score in hits] for hits in batches]
+
+    def retrieve(self, query: str, k: int = 5, filter: dict = None) -> List[Tuple[str, dict]]:
+        """Retrieves top-k most similar chunks to a given query, optionally within a metadata filter."""
+        query_vector = self.embedding_model.embed_query(query)
+        with timed("numpy_store", "search"):
+            hits = self.search_by_vector(query_vector, k=k, filter=filter)
+        record_items("numpy_store", "results", len(hits))
+        return [(self.texts[row], self.metadatas[row]) for row, _ in hits]
+
+    def as_retriever(self, **kwargs):
+        if self.matrix is None:
+            self.load_index()
+        search_kwargs = kwargs.get("search_kwargs", {})
+        return NumpyRetriever(store=self, k=search_kwargs.get("k", 4), filter=search_kwargs.get("filter"))
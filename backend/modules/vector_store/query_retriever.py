@@ -1,10 +1,12 @@
 from modules.vector_store.embedder import load_embedding_model
-from modules.vector_store.chroma_store import ChromaVectorStore
+from modules.vector_store.store import load_vector_store
+from shared.executor import get_retrieval_executor
 
 class QueryRetriever:
-    def __init__(self):
-        self.embedding_model = load_embedding_model()
-        self.vector_store = ChromaVectorStore(self.embedding_model)
+    def __init__(self, embedding_model=None, executor=None, **store_kwargs):
+        self.embedding_model = embedding_model or load_embedding_model()
+        self.executor = executor or get_retrieval_executor()
+        self.vector_store = load_vector_store(self.embedding_model, **store_kwargs)
         self.vector_store.load_index()
 
     def retrieve_relevant_chunks(self, query: str, top_k: int = 5):
@@ -14,3 +16,10 @@ class QueryRetriever:
         """
         results = self.vector_store.retrieve(query, k=top_k)
         return results
+
+    async def aretrieve_relevant_chunks(self, query: str, top_k: int = 5):
+        """
+        retrieve_relevant_chunks on the retrieval executor, keeping the event loop free.
+        Raises ExecutorSaturated when the executor's queue is full.
+        """
+        return await self.executor.run(self.retrieve_relevant_chunks, query, top_k)
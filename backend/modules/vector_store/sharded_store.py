@@ -0,0 +1,238 @@
+import heapq
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from langchain.embeddings.base import Embeddings
+from langchain.docstore.document import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from shared.metrics import timed, record_items
+
+MANIFEST_FILE = "shards.json"
+DEFAULT_SHARD = "Uncategorized"
+
+
+def shard_collection_name(shard: str) -> str:
+    """Maps a shard value like "Employee Resources" to a safe collection/directory name."""
+    slug = re.sub(r"[^a-z0-9]+", "_", str(shard).lower()).strip("_") or "default"
+    return f"shard_{slug}"[:63]
+
+
+class ShardedRetriever(BaseRetriever):
+    """LangChain retriever over a ShardedVectorStore."""
+    store: Any
+    k: int = 4
+    filter: Optional[dict] = None
+    shards: Optional[List[str]] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [Document(page_content=text, metadata=metadata)
+                for text, metadata in self.store.retrieve(query, k=self.k, filter=self.filter, shards=self.shards)]
+
+
+class ShardedVectorStore:
+    """
+    Splits the index into one store per value of a metadata key (category by default).
+
+    Writes are routed to the shard named by each chunk's metadata. Queries embed
+    once, search the relevant shards in parallel and merge the top-k by score.
+    A filter on the shard key, or an explicit shards=[...], limits the fan-out.
+    Every shard is its own Chroma collection or NumPy directory, so resetting
+    or rebuilding one never touches the rest.
+    """
+
+    def __init__(self, embedding_model: Embeddings, shard_factory: Callable[[str], Any],
+                 persist_directory: str, shard_key: str = "category",
+                 default_shard: str = DEFAULT_SHARD, max_workers: int = 8):
+        self.embedding_model = embedding_model.embedding_model
+        self.shard_factory = shard_factory
+        self.persist_directory = persist_directory
+        self.shard_key = shard_key
+        self.default_shard = default_shard
+        self.max_workers = max_workers
+        self.executor: Optional[ThreadPoolExecutor] = None  # started on the first multi-shard search
+        self.shards: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self.load_index()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="shard-search")
+            return self.executor
+
+    def close(self) -> None:
+        """Stops the fan-out threads; a later search starts new ones."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.persist_directory, MANIFEST_FILE)
+
+    def _write_manifest(self) -> None:
+        os.makedirs(self.persist_directory, exist_ok=True)
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"shard_key": self.shard_key, "shards": sorted(self.shards)}, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    def load_index(self) -> None:
+        """Reads the shard list from disk; each shard's own index loads lazily on first use."""
+        if not os.path.exists(self._manifest_path()):
+            return
+        with open(self._manifest_path(), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["shard_key"] != self.shard_key:
+            raise ValueError(f"Index at {self.persist_directory} is sharded by {manifest['shard_key']}, not {self.shard_key}")
+        with self.lock:
+            for name in manifest["shards"]:
+                if name not in self.shards:
+                    self.shards[name] = self.shard_factory(name)
+
+    def shard(self, name: str):
+        """Returns the store for one shard, registering it on first use."""
+        with self.lock:
+            if name not in self.shards:
+                self.shards[name] = self.shard_factory(name)
+                self._write_manifest()
+            return self.shards[name]
+
+    def shard_names(self) -> List[str]:
+        return sorted(self.shards)
+
+    def _group(self, texts: List[str], metadatas: List[dict] = None) -> Dict[str, Tuple[List[str], List[dict]]]:
+        groups = {}
+        for i, text in enumerate(texts):
+            metadata = dict(metadatas[i]) if metadatas else {}
+            name = metadata.setdefault(self.shard_key, self.default_shard)
+            group = groups.setdefault(name, ([], []))
+            group[0].append(text)
+            group[1].append(metadata)
+        return groups
+
+    def create_index(self, texts: List[str], metadatas: List[dict] = None) -> None:
+        """Adds the texts to their shards, creating shards as needed."""
+        for name, (shard_texts, shard_metadatas) in self._group(texts, metadatas).items():
+            self.shard(name).create_index(shard_texts, shard_metadatas)
+
+    def add_texts(self, texts: List[str], metadatas: List[dict] = None) -> None:
+        """Appends a batch of texts to their shards."""
+        for name, (shard_texts, shard_metadatas) in self._group(texts, metadatas).items():
+            self.shard(name).add_texts(shard_texts, shard_metadatas)
+
+    def rebuild_shard(self, name: str, texts: Iterable[str] = (), metadatas: List[dict] = None) -> None:
+        """Replaces one shard's contents. Chunks are tagged with this shard regardless of their metadata."""
+        texts = list(texts)
+        store = self.shard(name)
+        store.reset()
+        if texts:
+            metadatas = [dict(m, **{self.shard_key: name}) for m in metadatas] if metadatas \
+                else [{self.shard_key: name} for _ in texts]
+            store.create_index(texts, metadatas)
+
+    def add_embeddings(self, texts: List[str], embeddings, metadatas: List[dict] = None, ids: List[str] = None) -> None:
+        """Stores precomputed embeddings in their shards without calling the embedding model."""
+        rows = {}
+        for i, metadata in enumerate(metadatas or [{} for _ in texts]):
+            rows.setdefault(metadata.get(self.shard_key, self.default_shard), []).append(i)
+        for name, indices in rows.items():
+            self.shard(name).add_embeddings(
+                [texts[i] for i in indices], [embeddings[i] for i in indices],
+                [dict(metadatas[i], **{self.shard_key: name}) if metadatas else {self.shard_key: name} for i in indices],
+                [ids[i] for i in indices] if ids is not None else None)
+
+    def delete(self, filter: dict) -> int:
+        """Removes matching chunks from the routed shards; returns how many were removed."""
+        return sum(self.shards[name].delete(filter) for name in self.route(filter))
+
+    def count(self) -> int:
+        return sum(self.shards[name].count() for name in self.shard_names())
+
+    def export_records(self) -> Tuple[List[str], List[str], List[dict], Any]:
+        """(ids, texts, metadatas, embeddings) across all shards; ids are prefixed with the shard name."""
+        ids, texts, metadatas, embeddings = [], [], [], []
+        for name in self.shard_names():
+            shard_ids, shard_texts, shard_metadatas, shard_embeddings = self.shards[name].export_records()
+            prefix = f"{name}/"
+            ids.extend(shard_id if shard_id.startswith(prefix) else prefix + shard_id for shard_id in shard_ids)
+            texts.extend(shard_texts)
+            metadatas.extend(shard_metadatas)
+            if len(shard_texts):
+                embeddings.append(shard_embeddings)
+        return ids, texts, metadatas, np.concatenate(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+
+    def reset(self) -> None:
+        """Deletes every shard and stops the fan-out threads."""
+        for name in self.shard_names():
+            self.drop_shard(name)
+        self.close()
+
+    def drop_shard(self, name: str) -> None:
+        """Deletes one shard and removes it from the manifest."""
+        with self.lock:
+            store = self.shards.pop(name, None)
+            if store is None:
+                return
+            self._write_manifest()
+        store.reset()
+
+    def route(self, filter: dict = None, shards: List[str] = None) -> List[str]:
+        """Picks the shards a query must search: explicit shards, else those named by the filter, else all."""
+        if shards is None and filter and self.shard_key in filter:
+            value = filter[self.shard_key]
+            shards = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        if shards is None:
+            return self.shard_names()
+        return [name for name in shards if name in self.shards]
+
+    def search_with_scores(self, query_vector, k: int = 5, filter: dict = None,
+                           shards: List[str] = None) -> List[Tuple[str, dict, float]]:
+        """Searches the routed shards in parallel and returns the merged top-k, best first."""
+        names = self.route(filter, shards)
+        if not names:
+            return []
+        with timed("sharded_store", "search"):
+            if len(names) == 1:
+                per_shard = [self.shards[names[0]].search_with_scores(query_vector, k=k, filter=filter)]
+            else:
+                per_shard = list(self._pool().map(
+                    lambda name: self.shards[name].search_with_scores(query_vector, k=k, filter=filter), names))
+            results = heapq.nlargest(k, (hit for hits in per_shard for hit in hits), key=lambda hit: hit[2])
+        record_items("sharded_store", "shards_searched", len(names))
+        return results
+
+    def search_batch(self, query_vectors, k: int = 5, filter: dict = None,
+                     shards: List[str] = None) -> List[List[Tuple[str, dict, float]]]:
+        """search_with_scores for many queries: each shard runs one batched search, then results merge per query."""
+        names = self.route(filter, shards)
+        if not names:
+            return [[] for _ in query_vectors]
+        with timed("sharded_store", "search_batch"):
+            per_shard = list(self._pool().map(
+                lambda name: self.shards[name].search_batch(query_vectors, k=k, filter=filter), names))
+            results = [heapq.nlargest(k, (hit for shard_hits in per_shard for hit in shard_hits[i]), key=lambda hit: hit[2])
+                       for i in range(len(query_vectors))]
+        record_items("sharded_store", "shards_searched", len(names))
+        return results
+
+    def retrieve(self, query: str, k: int = 5, filter: dict = None,
+                 shards: List[str] = None) -> List[Tuple[str, dict]]:
+        """Retrieves top-k most similar chunks across the routed shards."""
+        if not self.route(filter, shards):
+            return []
+        query_vector = self.embedding_model.embed_query(query)
+        return [(text, metadata) for text, metadata, _ in self.search_with_scores(query_vector, k, filter, shards)]
+
+    def as_retriever(self, **kwargs):
+        search_kwargs = kwargs.get("search_kwargs", {})
+        return ShardedRetriever(store=self, k=search_kwargs.get("k", 4), filter=search_kwargs.get("filter"),
+                                shards=search_kwargs.get("shards"))
@@ -0,0 +1,157 @@
+#snapshot.py
+# Portable, versioned vector index snapshots: export once, bulk-load on every replica without re-embedding.
+import argparse
+import hashlib
+import json
+import os
+import time
+import zipfile
+from typing import Optional
+
+import numpy as np
+
+from modules.vector_store.embedder import MODEL_NAME, embedding_variant
+from shared.metrics import timed, record_items
+
+SNAPSHOT_FORMAT_VERSION = 2  # 2 records the embedding variant
+VECTOR_SNAPSHOT_PATH = os.getenv("VECTOR_SNAPSHOT_PATH", "")  # loaded at startup when the index is empty
+IMPORT_BATCH_SIZE = 5000
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is unreadable, corrupt or was built for a different embedding model or variant."""
+
+
+class _NoEmbeddings:
+    """Stands in for the embedding model: snapshots move stored vectors and never embed."""
+    embedding_model = None
+
+
+def _checksum(records: bytes, embeddings: np.ndarray) -> str:
+    digest = hashlib.sha256(records)
+    digest.update(np.ascontiguousarray(embeddings).tobytes())
+    return digest.hexdigest()
+
+
+def export_snapshot(vector_store, path: str, model_name: str = MODEL_NAME, embedding: str = None) -> dict:
+    """
+    Writes every chunk (ids, texts, metadata, embeddings) to a single .npz file and returns its manifest.
+    embedding (default: EMBEDDING_BACKEND's variant, e.g. "onnx-int8") names what produced the vectors.
+    The file is written beside the target and renamed into place, so readers never see a partial snapshot.
+    """
+    embedding = embedding or embedding_variant()
+    with timed("snapshot", "export"):
+        ids, texts, metadatas, embeddings = vector_store.export_records()
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        records = json.dumps({"ids": list(ids), "texts": list(texts), "metadatas": list(metadatas)}).encode("utf-8")
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "model_name": model_name,
+            "embedding": embedding,
+            "dimension": int(embeddings.shape[1]) if embeddings.size else 0,
+            "count": len(ids),
+            "created_at": time.time(),
+            "checksum": _checksum(records, embeddings),
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            # Text and metadata go in as UTF-8 JSON bytes so loading never needs allow_pickle
+            np.savez(f, manifest=np.frombuffer(json.dumps(manifest).encode("utf-8"), dtype=np.uint8),
+                     records=np.frombuffer(records, dtype=np.uint8), embeddings=embeddings)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    record_items("snapshot", "exported_chunks", len(ids))
+    return manifest
+
+
+def read_snapshot(path: str, model_name: Optional[str] = MODEL_NAME, embedding: str = None) -> dict:
+    """
+    Loads and verifies a snapshot, including that it was embedded by model_name with the embedding
+    variant in use (default: EMBEDDING_BACKEND's). Pass model_name=None to skip both checks.
+    Format 1 snapshots did not record the variant, so only their model is checked.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            manifest = json.loads(data["manifest"].tobytes().decode("utf-8"))
+            records_bytes = data["records"].tobytes()
+            embeddings = data["embeddings"]
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile) as e:
+        raise SnapshotError(f"Cannot read snapshot {path}: {e}") from e
+
+    if manifest.get("format_version", 0) > SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot format {manifest['format_version']} is newer than supported ({SNAPSHOT_FORMAT_VERSION})")
+    if model_name and manifest["model_name"] != model_name:
+        raise SnapshotError(f"Snapshot was embedded with {manifest['model_name']}, not {model_name}")
+    if model_name and "embedding" in manifest:
+        embedding = embedding or embedding_variant()
+        if manifest["embedding"] != embedding:
+            raise SnapshotError(f"Snapshot vectors come from {manifest['embedding']}, not {embedding}; "
+                                f"mixing them would skew similarity scores")
+    if _checksum(records_bytes, embeddings) != manifest["checksum"]:
+        raise SnapshotError(f"Snapshot {path} failed its checksum")
+    records = json.loads(records_bytes.decode("utf-8"))
+    if not (len(records["ids"]) == len(records["texts"]) == len(records["metadatas"]) == manifest["count"]
+            and (manifest["count"] == 0 or embeddings.shape == (manifest["count"], manifest["dimension"]))):
+        raise SnapshotError(f"Snapshot {path} has inconsistent sizes")
+    return dict(records, manifest=manifest, embeddings=embeddings)
+
+
+def import_snapshot(vector_store, path: str, model_name: str = MODEL_NAME, replace: bool = True,
+                    embedding: str = None) -> dict:
+    """
+    Bulk-loads a verified snapshot into vector_store without re-embedding. With replace=True the
+    store is emptied first; otherwise the chunks are added (and Chroma ids overwritten).
+    Returns the snapshot manifest.
+    """
+    snapshot = read_snapshot(path, model_name, embedding)
+    manifest = snapshot["manifest"]
+    with timed("snapshot", "import"):
+        if replace:
+            vector_store.reset()
+        for start in range(0, manifest["count"], IMPORT_BATCH_SIZE):
+            end = start + IMPORT_BATCH_SIZE
+            vector_store.add_embeddings(snapshot["texts"][start:end], snapshot["embeddings"][start:end],
+                                        snapshot["metadatas"][start:end], snapshot["ids"][start:end])
+    record_items("snapshot", "imported_chunks", manifest["count"])
+    return manifest
+
+
+def restore_if_empty(vector_store, path: str = VECTOR_SNAPSHOT_PATH, model_name: str = MODEL_NAME,
+                     embedding: str = None) -> Optional[dict]:
+    """Imports the snapshot at path when the store has no chunks yet. Returns the manifest if it did."""
+    if not path or not os.path.exists(path) or vector_store.count():
+        return None
+    return import_snapshot(vector_store, path, model_name, replace=False, embedding=embedding)
+
+
+def main():
+    from modules.vector_store.store import load_vector_store
+
+    parser = argparse.ArgumentParser(description="Export or import a vector index snapshot.")
+    parser.add_argument("action", choices=["export", "import", "inspect"])
+    parser.add_argument("path", help="snapshot .npz file")
+    parser.add_argument("--backend", default=None, help="chroma or numpy (default: VECTOR_BACKEND)")
+    parser.add_argument("--persist-directory", default=None)
+    parser.add_argument("--append", action="store_true", help="import without clearing the current index")
+    parser.add_argument("--embedding", default=None,
+                        help="embedding variant of the vectors, e.g. onnx-int8 (default: EMBEDDING_BACKEND's)")
+    args = parser.parse_args()
+
+    if args.action == "inspect":
+        print(json.dumps(read_snapshot(args.path, model_name=None)["manifest"], indent=2))
+        return
+    kwargs = {"persist_directory": args.persist_directory} if args.persist_directory else {}
+    vector_store = load_vector_store(_NoEmbeddings(), backend=args.backend, **kwargs)
+    if args.action == "export":
+        manifest = export_snapshot(vector_store, args.path, embedding=args.embedding)
+    else:
+        manifest = import_snapshot(vector_store, args.path, replace=not args.append, embedding=args.embedding)
+    print(f"[INFO] {args.action}ed {manifest['count']} chunks ({manifest['model_name']}, "
+          f"{manifest.get('embedding', 'unknown variant')}, dim {manifest['dimension']})")
+
+
+if __name__ == "__main__":
+    main()
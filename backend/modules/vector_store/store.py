@@ -0,0 +1,69 @@
+import os
+from functools import partial
+
+from langchain.embeddings.base import Embeddings
+
+from modules.vector_store.chroma_store import ChromaVectorStore
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # "chroma", "numpy" or "remote" (the embedding server's store)
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "int8")  # "int8" or "float16"
+NUMPY_INDEX_RESCORE = os.getenv("NUMPY_INDEX_RESCORE", "true").lower() == "true"
+VECTOR_SHARD_KEY = os.getenv("VECTOR_SHARD_KEY", "")  # metadata key to shard by, e.g. "category"; empty keeps one index
+VECTOR_SHARD_WORKERS = int(os.getenv("VECTOR_SHARD_WORKERS", "8"))
+
+# HNSW settings for new Chroma collections; unset keeps Chroma's defaults (see tune_hnsw.py)
+CHROMA_HNSW = {
+    name: cast(os.getenv(env))
+    for name, env, cast in (
+        ("space", "CHROMA_HNSW_SPACE", str),
+        ("hnsw_m", "CHROMA_HNSW_M", int),
+        ("ef_construction", "CHROMA_HNSW_EF_CONSTRUCTION", int),
+        ("ef_search", "CHROMA_HNSW_EF_SEARCH", int),
+    )
+    if os.getenv(env)
+}
+
+DEFAULT_DIRECTORIES = {"chroma": "chroma_db", "numpy": "numpy_index"}
+
+
+def _load_shard(embedding_model: Embeddings, backend: str, persist_directory: str, shard: str, **kwargs):
+    """Chroma shards are collections in one directory; NumPy shards are subdirectories."""
+    from modules.vector_store.sharded_store import shard_collection_name
+    if backend == "chroma":
+        return ChromaVectorStore(embedding_model, persist_directory=persist_directory,
+                                 collection_name=shard_collection_name(shard), **kwargs)
+    return load_vector_store(embedding_model, backend=backend, shard_key="",
+                             persist_directory=os.path.join(persist_directory, shard_collection_name(shard)), **kwargs)
+
+
+def load_vector_store(embedding_model: Embeddings, backend: str = None, shard_key: str = None, **kwargs):
+    """
+    Returns the vector store selected by VECTOR_BACKEND, sharded by VECTOR_SHARD_KEY if set.
+    All stores expose create_index / add_texts / delete / load_index / retrieve / as_retriever.
+    """
+    backend = backend or VECTOR_BACKEND
+    if backend == "remote":
+        # Sharding and HNSW settings are the server's; it was started with its own backend
+        from modules.vector_store.embedding_server import RemoteVectorStore
+        return RemoteVectorStore(embedding_model, **kwargs)
+    shard_key = VECTOR_SHARD_KEY if shard_key is None else shard_key
+    if backend == "chroma":
+        for name, value in CHROMA_HNSW.items():
+            kwargs.setdefault(name, value)
+    if shard_key:
+        from modules.vector_store.sharded_store import ShardedVectorStore
+        if backend not in DEFAULT_DIRECTORIES:
+            raise ValueError(f"Unknown vector backend: {backend}")
+        persist_directory = kwargs.pop("persist_directory", DEFAULT_DIRECTORIES[backend])
+        max_workers = kwargs.pop("max_workers", VECTOR_SHARD_WORKERS)
+        return ShardedVectorStore(
+            embedding_model, partial(_load_shard, embedding_model, backend, persist_directory, **kwargs),
+            persist_directory, shard_key=shard_key, max_workers=max_workers)
+    if backend == "chroma":
+        return ChromaVectorStore(embedding_model, **kwargs)
+    if backend == "numpy":
+        from modules.vector_store.numpy_store import NumpyVectorStore
+        kwargs.setdefault("dtype", NUMPY_INDEX_DTYPE)
+        kwargs.setdefault("rescore", NUMPY_INDEX_RESCORE)
+        return NumpyVectorStore(embedding_model, **kwargs)
+    raise ValueError(f"Unknown vector backend: {backend}")
@@ -0,0 +1,194 @@
+#tune_hnsw.py
+# Sweeps Chroma HNSW settings on a copy of an index and recommends the cheapest one meeting a recall target.
+import argparse
+import itertools
+import json
+import tempfile
+import time
+import uuid
+from typing import List, Tuple
+
+import chromadb
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+from modules.vector_store.chroma_store import DEFAULT_COLLECTION, hnsw_params
+
+PAGE_SIZE = 5000
+
+
+def load_embeddings(persist_directory: str, collection_name: str, max_docs: int = 0) -> Tuple[np.ndarray, str]:
+    """Reads every stored embedding (or the first max_docs) and the collection's distance space."""
+    client = chromadb.PersistentClient(path=persist_directory)
+    collection = client.get_collection(collection_name)
+    total = collection.count() if not max_docs else min(max_docs, collection.count())
+    pages = []
+    for offset in range(0, total, PAGE_SIZE):
+        page = collection.get(include=["embeddings"], limit=min(PAGE_SIZE, total - offset), offset=offset)
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+    space = hnsw_params(collection).get("space", "l2")
+    return np.concatenate(pages) if pages else np.empty((0, 0), dtype=np.float32), space
+
+
+def synthetic_embeddings(count: int, dim: int, seed: int) -> np.ndarray:
+    """Clustered random vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, count // 200), dim))
+    return (centers[rng.integers(len(centers), size=count)] + rng.standard_normal((count, dim)) * 0.6).astype(np.float32)
+
+
+def exact_neighbors(corpus: np.ndarray, queries: np.ndarray, k: int, space: str, block_size: int = 256) -> List[set]:
+    """Brute-force top-k ids under the same distance Chroma uses."""
+    if space == "cosine":
+        corpus = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    squared_norms = (corpus ** 2).sum(axis=1)
+    truth = []
+    for start in range(0, len(queries), block_size):
+        block = queries[start:start + block_size]
+        if space == "l2":
+            distances = squared_norms[None, :] - 2 * block @ corpus.T
+        else:
+            distances = -(block @ corpus.T)
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        truth.extend(set(row.tolist()) for row in top)
+    return truth
+
+
+def build_collection(client, vectors: np.ndarray, space: str, hnsw_m: int, ef_construction: int, ef_search: int):
+    collection = client.create_collection(
+        f"tune-{uuid.uuid4().hex[:12]}",
+        metadata={"hnsw:space": space, "hnsw:M": hnsw_m,
+                  "hnsw:construction_ef": ef_construction, "hnsw:search_ef": ef_search},
+        embedding_function=None
+    )
+    batch_size = min(PAGE_SIZE, getattr(client, "get_max_batch_size", lambda: PAGE_SIZE)())
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        collection.add(ids=[str(i) for i in range(start, start + len(batch))], embeddings=batch.tolist())
+    return collection
+
+
+def set_ef_search(collection, ef_search: int) -> bool:
+    """Changes ef_search in place; returns False on Chroma versions that only accept it at creation."""
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+        return True
+    except TypeError:
+        return False
+
+
+def reopen(directory: str, name: str):
+    """A loaded HNSW index keeps its ef_search, so drop Chroma's cached clients and open the collection again."""
+    SharedSystemClient.clear_system_cache()
+    client = chromadb.PersistentClient(path=directory)
+    return client, client.get_collection(name)
+
+
+def measure(collection, queries: np.ndarray, truth: List[set], k: int) -> dict:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & {int(i) for i in result["ids"][0]})
+    return {
+        f"recall_at_{k}": round(hits / (k * len(queries)), 4),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def sweep(vectors: np.ndarray, space: str, k: int, sample: int, grid_m: List[int], grid_ef_construction: List[int],
+          grid_ef_search: List[int], seed: int = 0) -> List[dict]:
+    """
+    Holds out `sample` vectors as queries, indexes the rest once per (M, ef_construction)
+    and measures recall@k against exact search for every ef_search.
+    """
+    rng = np.random.default_rng(seed)
+    held_out = np.zeros(len(vectors), dtype=bool)
+    held_out[rng.choice(len(vectors), size=min(sample, len(vectors) // 10 or 1), replace=False)] = True
+    queries, corpus = vectors[held_out], vectors[~held_out]
+    truth = exact_neighbors(corpus, queries, k, space)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        client = chromadb.PersistentClient(path=directory)
+        for hnsw_m, ef_construction in itertools.product(grid_m, grid_ef_construction):
+            start = time.perf_counter()
+            collection = build_collection(client, corpus, space, hnsw_m, ef_construction, grid_ef_search[0])
+            build_seconds = time.perf_counter() - start
+            for ef_search in grid_ef_search:
+                if ef_search != grid_ef_search[0]:
+                    if set_ef_search(collection, ef_search):
+                        client, collection = reopen(directory, collection.name)
+                    else:
+                        client.delete_collection(collection.name)
+                        collection = build_collection(client, corpus, space, hnsw_m, ef_construction, ef_search)
+                row = {"hnsw_m": hnsw_m, "ef_construction": ef_construction, "ef_search": ef_search,
+                       "build_seconds": round(build_seconds, 3)}
+                row.update(measure(collection, queries, truth, k))
+                print(row)
+                results.append(row)
+            client.delete_collection(collection.name)
+    return results
+
+
+def recommend(results: List[dict], k: int, target_recall: float) -> Tuple[dict, bool]:
+    """Fastest setting meeting the target (smaller graphs win ties); the most accurate one if none does."""
+    recall_key = f"recall_at_{k}"
+    passing = [row for row in results if row[recall_key] >= target_recall]
+    if passing:
+        return min(passing, key=lambda row: (row["latency_ms_p95"], row["hnsw_m"], row["ef_construction"], row["ef_search"])), True
+    return max(results, key=lambda row: (row[recall_key], -row["latency_ms_p95"])), False
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recall@k vs latency for Chroma HNSW settings and recommend one.")
+    parser.add_argument("--persist-directory", default="chroma_db")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--synthetic", type=int, default=0, help="tune on N synthetic vectors instead of a stored collection")
+    parser.add_argument("--dim", type=int, default=384, help="dimension of synthetic vectors")
+    parser.add_argument("--space", default=None, help="l2, cosine or ip (default: the collection's)")
+    parser.add_argument("--max-docs", type=int, default=0, help="only read the first N stored embeddings")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--sample", type=int, default=200, help="held-out query vectors")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--m", default="8,16,32")
+    parser.add_argument("--ef-construction", default="100,200")
+    parser.add_argument("--ef-search", default="10,20,40,80,160")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="tune_hnsw.json")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors, space = synthetic_embeddings(args.synthetic, args.dim, args.seed), "l2"
+    else:
+        vectors, space = load_embeddings(args.persist_directory, args.collection, args.max_docs)
+    space = args.space or space
+    if len(vectors) <= args.k:
+        raise SystemExit(f"Need more than {args.k} vectors to tune, found {len(vectors)}")
+    print(f"[INFO] Tuning on {len(vectors)} vectors, space={space}, k={args.k}")
+
+    results = sweep(vectors, space, args.k, args.sample, _int_list(args.m),
+                    _int_list(args.ef_construction), _int_list(args.ef_search), args.seed)
+    best, meets_target = recommend(results, args.k, args.target_recall)
+    if meets_target:
+        print(f"[INFO] Cheapest setting with recall@{args.k} >= {args.target_recall}: {best}")
+    else:
+        print(f"[WARN] No setting reached recall@{args.k} >= {args.target_recall}; most accurate: {best}")
+    print(f"CHROMA_HNSW_SPACE={space}\nCHROMA_HNSW_M={best['hnsw_m']}\n"
+          f"CHROMA_HNSW_EF_CONSTRUCTION={best['ef_construction']}\nCHROMA_HNSW_EF_SEARCH={best['ef_search']}")
+
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "vectors": len(vectors), "space": space, "results": results,
+                   "recommended": best, "meets_target": meets_target}, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
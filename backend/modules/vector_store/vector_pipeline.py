@@ -1,39 +1,158 @@
 #vector.py
+import argparse
+import logging
 import os
-from typing import List
+from functools import lru_cache
+from importlib.metadata import version, PackageNotFoundError
+from typing import Iterator, Tuple
 
 from modules.vector_store.embedder import load_embedding_model
-from modules.vector_store.chunker import chunk_text
-from modules.vector_store.chroma_store import ChromaVectorStore
+from modules.vector_store.chunker import Chunker, get_chunker, batched
+from modules.vector_store.store import load_vector_store
+from shared.text_store import get_text_store, hash_file
+from shared.dedup import DEDUP_MODE, get_dedup_index, text_signature
 
 from markitdown import MarkItDown
 
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+VECTOR_INGEST_DIR = os.getenv("VECTOR_INGEST_DIR", "")  # PDFs indexed at startup when the index is empty
+logger = logging.getLogger(__name__)
+PAGE_BREAK = "\f"  # pdfminer (used by MarkItDown and pdfplumber) separates pages with form feeds
 
-def load_pdf_text_with_markitdown(file_path: str) -> List[str]:
-    """Extracts clean text blocks from a PDF using Markitdown."""
 
-    md = MarkItDown()
-    result = md.convert(file_path)
-    # print(result.text_content)
-    # result = pipeline_from_file(file_path)
-    text_blocks = result.text_content
-    return text_blocks
+def _markitdown_version() -> str:
+    try:
+        return f"markitdown-{version('markitdown')}"
+    except PackageNotFoundError:
+        return "markitdown-unknown"
 
 
-def process_and_store_documents(file_path: str, metadata: dict = None):
-    """Pipeline to process a PDF using Markitdown: load, chunk, embed, and store."""
-    text_blocks = load_pdf_text_with_markitdown(file_path)
+def load_pdf_text_with_markitdown(file_path: str) -> str:
+    """
+    Extracts the Markdown text of a PDF using Markitdown.
+    The result is kept in the extracted-text store, so an unchanged file is converted only once.
+    """
 
-    # basic PLACEHOLDER now....have to check the text_blocks structure
-    all_chunks = []
-    for block in text_blocks:
-        chunks = chunk_text(block)
-        all_chunks.extend(chunks)
-    #PLACEHOLDER FOR LOADING embedding model...have to write it in embedder.py
-    embedding_model = load_embedding_model()#have to strore in chromaDB now
-    vector_store = ChromaVectorStore(embedding_model)
+    def convert() -> str:
+        md = MarkItDown()
+        result = md.convert(file_path)
+        return result.text_content
 
-    vector_store.create_index(
-        texts=all_chunks,
-        metadatas=[metadata or {"source": os.path.basename(file_path)}] * len(all_chunks)
-    )
+    store = get_text_store()
+    if store is None:
+        return convert()
+    return store.get_or_extract(hash_file(file_path), _markitdown_version(), convert)
+
+
+def iter_chunk_records(text: str, source_id: str, source_name: str, category: str = None,
+                       chunker: Chunker = None) -> Iterator[Tuple[str, dict]]:
+    """
+    Yields (chunk, metadata) for a document. Every chunk carries the source file id and name,
+    its 1-based page number, the Drive category (when known), its index and its character
+    offset within the page.
+    """
+    chunker = chunker or get_chunker(mode="markdown")
+    base = {"source_id": source_id, "source": source_name}
+    if category:
+        base["category"] = category
+    chunk_index = 0
+    for page_number, page_text in enumerate(text.split(PAGE_BREAK), start=1):
+        for offset, chunk in chunker.iter_chunks_with_offsets(page_text):
+            yield chunk, dict(base, page=page_number, chunk_index=chunk_index, offset=offset)
+            chunk_index += 1
+
+
+@lru_cache(maxsize=None)
+def get_vector_store():
+    """Returns a process-wide vector store so the embedding model is loaded once."""
+    return load_vector_store(load_embedding_model())
+
+
+def index_text(text: str, source_id: str, source_name: str, category: str = None, metadata: dict = None,
+               batch_size: int = EMBED_BATCH_SIZE, vector_store=None, dedup_mode: str = None) -> int:
+    """
+    Chunks, embeds and stores text that has already been extracted, e.g. by the Drive organizer.
+    Chunks are streamed into fixed-size embedding batches. Returns the chunk count.
+    The source's earlier chunks are replaced, so indexing the same source_id again never duplicates it.
+    Unless dedup_mode (default DEDUP_MODE) is "off", text that is a near-duplicate of an
+    already indexed document is not embedded; "link" records it as a copy of that document.
+    """
+    if vector_store is None:
+        vector_store = get_vector_store()
+
+    dedup_mode = dedup_mode or DEDUP_MODE
+    dedup = get_dedup_index() if dedup_mode != "off" else None
+    if dedup is not None:
+        signature = text_signature(text)
+        duplicate = dedup.find("vector", "text", signature, exclude=source_id)
+        if duplicate is not None:
+            logger.info("Not indexing %s: near-duplicate of %s (similarity %s)",
+                        source_name, duplicate.name, duplicate.similarity)
+            if dedup_mode == "link":
+                dedup.add("vector", source_id, source_name, "text", signature, canonical_id=duplicate.doc_id)
+            return 0
+
+    replaced = vector_store.delete({"source_id": source_id})
+    if replaced:
+        logger.info("Replacing %d chunks previously indexed for %s", replaced, source_name)
+    records = iter_chunk_records(text, source_id, source_name, category)
+    total = 0
+    for batch in batched(records, batch_size):
+        texts = [chunk for chunk, _ in batch]
+        metadatas = [dict(chunk_metadata, **(metadata or {})) for _, chunk_metadata in batch]
+        vector_store.add_texts(texts=texts, metadatas=metadatas)
+        total += len(batch)
+    if dedup is not None:
+        dedup.add("vector", source_id, source_name, "text", signature, category=category)
+    return total
+
+
+def process_and_store_documents(file_path: str, metadata: dict = None, batch_size: int = EMBED_BATCH_SIZE,
+                                source_id: str = None, category: str = None, vector_store=None) -> int:
+    """
+    Pipeline to process a PDF using Markitdown: load, chunk, embed, and store.
+    Returns the chunk count.
+    """
+    markdown_text = load_pdf_text_with_markitdown(file_path)
+    return index_text(markdown_text, source_id or file_path, os.path.basename(file_path), category,
+                      metadata=metadata, batch_size=batch_size, vector_store=vector_store)
+
+
+def ingest_directory(directory: str, vector_store=None, batch_size: int = EMBED_BATCH_SIZE) -> int:
+    """
+    Indexes every PDF under directory, keyed by its path, and returns the chunk count.
+    Running it again replaces each file's chunks rather than adding a second copy.
+    """
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                file_path = os.path.join(root, name)
+                count = process_and_store_documents(file_path, batch_size=batch_size, vector_store=vector_store)
+                logger.info("Indexed %d chunks from %s", count, file_path)
+                total += count
+    return total
+
+
+def ingest_if_empty(vector_store, directory: str = VECTOR_INGEST_DIR) -> int:
+    """Indexes the PDFs under directory when the store has no chunks yet. Returns the chunk count it added."""
+    if not directory or not os.path.isdir(directory) or vector_store.count():
+        return 0
+    return ingest_directory(directory, vector_store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the PDFs under a directory into the vector store.")
+    parser.add_argument("directory", nargs="?", default=VECTOR_INGEST_DIR)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    args = parser.parse_args()
+    if not args.directory or not os.path.isdir(args.directory):
+        parser.error("pass a directory of PDFs or set VECTOR_INGEST_DIR")
+
+    logging.basicConfig(level=logging.INFO)
+    count = ingest_directory(args.directory, batch_size=args.batch_size)
+    print(f"[INFO] Indexed {count} chunks from {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
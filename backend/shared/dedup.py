@@ -0,0 +1,246 @@
+#dedup.py
+# Near-duplicate detection: MinHash/LSH over extracted text and perceptual hashes for images.
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from shared.metrics import record_items
+
+DEDUP_MODE = os.getenv("DEDUP_MODE", "off")  # "off", "skip" (drop duplicates) or "link" (reuse the original)
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "dedup.sqlite3")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))  # estimated Jaccard similarity of word 5-grams
+DEDUP_IMAGE_DISTANCE = int(os.getenv("DEDUP_IMAGE_DISTANCE", "6"))  # max differing bits of the 64-bit image hash
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+_PRIME = 4294967311  # smallest prime above 2**32, so (a * x + b) fits in uint64 for 32-bit a, x, b
+_MASK32 = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_SHINGLE_MULTIPLIERS = _rng.integers(1, 1 << 32, size=SHINGLE_SIZE, dtype=np.uint64) | np.uint64(1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    scope TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    name TEXT,
+    kind TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    canonical_id TEXT,
+    category TEXT,
+    added REAL NOT NULL,
+    PRIMARY KEY (scope, doc_id)
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    scope TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (scope, kind, band, bucket);
+CREATE INDEX IF NOT EXISTS buckets_doc ON buckets (scope, doc_id);
+CREATE INDEX IF NOT EXISTS signatures_canonical ON signatures (scope, canonical_id);
+"""
+
+
+class Duplicate(NamedTuple):
+    doc_id: str
+    name: str
+    similarity: float
+    category: Optional[str]
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    """32-bit hashes of the distinct word 5-grams, after lowercasing and dropping punctuation."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    vocabulary = {}
+    tokens = np.fromiter((vocabulary.setdefault(w, zlib.crc32(w.encode("utf-8"))) for w in words),
+                         dtype=np.uint64, count=len(words))
+    size = min(SHINGLE_SIZE, len(tokens))
+    shingles = np.zeros(len(tokens) - size + 1, dtype=np.uint64)
+    for offset in range(size):
+        shingles = (shingles + tokens[offset:len(tokens) - size + 1 + offset] * _SHINGLE_MULTIPLIERS[offset]) & _MASK32
+    return np.unique(shingles)
+
+
+def text_signature(text: str, block_size: int = 4096) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint64 values) of a text, or None if it has no words."""
+    shingles = _shingle_hashes(text or "")
+    if not len(shingles):
+        return None
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), block_size):
+        block = shingles[start:start + block_size, None]
+        signature = np.minimum(signature, ((block * _A + _B) % np.uint64(_PRIME)).min(axis=0))
+    return signature
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    k = np.arange(size)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def perceptual_hash(img) -> int:
+    """
+    64-bit DCT perceptual hash of a PIL image: the low 8x8 frequencies of a 32x32 grayscale
+    thumbnail, thresholded at their median. Re-encodes, resizes and small edits change only a few bits.
+    """
+    from PIL import Image
+    pixels = np.asarray(img.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT32 @ pixels @ _DCT32.T)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def image_hash(file_data) -> Optional[int]:
+    """Perceptual hash of an in-memory image file, or None if it cannot be decoded."""
+    from PIL import Image
+    try:
+        file_data.seek(0)
+        with Image.open(file_data) as img:
+            img.draft("L", (64, 64))  # JPEGs decode at reduced scale
+            return perceptual_hash(img)
+    except Exception:
+        return None
+    finally:
+        file_data.seek(0)
+
+
+def _rows_per_band(num_perm: int, threshold: float) -> int:
+    """
+    Rows per LSH band: the largest power of two whose candidate threshold, (1/bands)^(1/rows),
+    stays well below the similarity threshold, so true duplicates are rarely missed.
+    """
+    rows = 1
+    while num_perm % (rows * 2) == 0 and (1 / (num_perm // (rows * 2))) ** (1 / (rows * 2)) <= threshold * 0.85:
+        rows *= 2
+    return rows
+
+
+def _bucket(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True)
+
+
+class NearDuplicateIndex:
+    """
+    SQLite index of document signatures. Text uses MinHash with LSH banding; images use a
+    perceptual hash split into DEDUP_IMAGE_DISTANCE + 1 segments, one of which must match
+    exactly for any two hashes within that many bits. Only canonical documents are bucketed,
+    so a chain of small edits cannot drift a duplicate away from its original.
+    Scopes keep the organizer's and the vector index's views of "seen" apart.
+    """
+
+    def __init__(self, path: str = DEDUP_INDEX_PATH, threshold: float = DEDUP_THRESHOLD,
+                 image_distance: int = DEDUP_IMAGE_DISTANCE):
+        self.path = path
+        self.threshold = threshold
+        self.image_distance = image_distance
+        self.rows = _rows_per_band(NUM_PERM, threshold)
+        bounds = [int(b) for b in np.linspace(0, 64, image_distance + 2)]
+        self.segments = list(zip(bounds[:-1], bounds[1:]))
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def _keys(self, kind: str, signature) -> List[tuple]:
+        if kind == "image":
+            keys = [(band, (signature >> start) & ((1 << (end - start)) - 1))
+                    for band, (start, end) in enumerate(self.segments)]
+            # A single 64-bit segment is reinterpreted as signed to fit an SQLite integer
+            return [(band, bucket - (1 << 64) if bucket >= 1 << 63 else bucket) for band, bucket in keys]
+        return [(band, _bucket(signature[start:start + self.rows].tobytes()))
+                for band, start in enumerate(range(0, NUM_PERM, self.rows))]
+
+    def _similarity(self, kind: str, signature, stored: bytes) -> float:
+        if kind == "image":
+            return 1 - bin(signature ^ int.from_bytes(stored, "big")).count("1") / 64
+        return float(np.mean(signature == np.frombuffer(stored, dtype=np.uint64)))
+
+    def _matches(self, kind: str, similarity: float) -> bool:
+        if kind == "image":
+            return round((1 - similarity) * 64) <= self.image_distance
+        return similarity >= self.threshold
+
+    def find(self, scope: str, kind: str, signature, exclude: str = None) -> Optional[Duplicate]:
+        """Returns the most similar canonical document within the threshold, if any."""
+        if signature is None:
+            return None
+        keys = self._keys(kind, signature)
+        with self.lock:
+            candidates = {row[0] for band, bucket in keys for row in self.conn.execute(
+                "SELECT doc_id FROM buckets WHERE scope = ? AND kind = ? AND band = ? AND bucket = ?",
+                (scope, kind, band, bucket))}
+            candidates.discard(exclude)
+            rows = [self.conn.execute(
+                "SELECT doc_id, name, signature, category FROM signatures WHERE scope = ? AND doc_id = ?",
+                (scope, doc_id)).fetchone() for doc_id in candidates]
+        best = None
+        for doc_id, name, stored, category in filter(None, rows):
+            similarity = self._similarity(kind, signature, stored)
+            if self._matches(kind, similarity) and (best is None or similarity > best.similarity):
+                best = Duplicate(doc_id, name, round(similarity, 4), category)
+        record_items("dedup", "duplicates" if best else "unique")
+        return best
+
+    def add(self, scope: str, doc_id: str, name: str, kind: str, signature, canonical_id: str = None,
+            category: str = None) -> None:
+        """Records a document; canonical documents (no canonical_id) become findable."""
+        if signature is None:
+            return
+        blob = signature.to_bytes(8, "big") if kind == "image" else signature.tobytes()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM buckets WHERE scope = ? AND doc_id = ?", (scope, doc_id))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO signatures (scope, doc_id, name, kind, signature, canonical_id, category, added) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, doc_id, name, kind, blob, canonical_id, category, time.time()))
+            if canonical_id is None:
+                self.conn.executemany(
+                    "INSERT INTO buckets (scope, kind, band, bucket, doc_id) VALUES (?, ?, ?, ?, ?)",
+                    [(scope, kind, band, bucket, doc_id) for band, bucket in self._keys(kind, signature)])
+
+    def duplicates_of(self, scope: str, doc_id: str) -> List[str]:
+        """Ids of the documents linked to doc_id as its near-duplicates."""
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT doc_id FROM signatures WHERE scope = ? AND canonical_id = ? ORDER BY added", (scope, doc_id))]
+
+    def canonical_of(self, scope: str, doc_id: str) -> Optional[str]:
+        """The original a document was linked to, or None if it is canonical or unknown."""
+        with self.lock:
+            row = self.conn.execute("SELECT canonical_id FROM signatures WHERE scope = ? AND doc_id = ?",
+                                    (scope, doc_id)).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_dedup_index() -> Optional[NearDuplicateIndex]:
+    """Returns the process-wide index, or None when DEDUP_MODE is off."""
+    if DEDUP_MODE == "off":
+        return None
+    return NearDuplicateIndex()
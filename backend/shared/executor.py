@@ -0,0 +1,70 @@
+#executor.py
+# Bounded thread pools that keep CPU-bound work (embedding, vector search) off the event loop.
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from shared.metrics import EXECUTOR_PENDING, record_items
+
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", str(min(4, os.cpu_count() or 1))))
+RETRIEVAL_MAX_QUEUE = int(os.getenv("RETRIEVAL_MAX_QUEUE", "32"))  # tasks waiting for a worker before shedding
+
+
+class ExecutorSaturated(Exception):
+    """Raised instead of queueing when an executor already holds max_workers + max_queue tasks."""
+
+    def __init__(self, name: str, limit: int):
+        super().__init__(f"{name} executor is saturated ({limit} tasks queued or running)")
+        self.name = name
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a cap on outstanding work. A task beyond max_workers running plus
+    max_queue waiting is rejected with ExecutorSaturated rather than queued, so an overloaded
+    server sheds load immediately instead of building a backlog nobody waits for.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.limit = max_workers + max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.pending = 0
+        self.lock = threading.Lock()
+        EXECUTOR_PENDING.labels(name).set(0)
+
+    def _release(self, _future) -> None:
+        with self.lock:
+            self.pending -= 1
+            EXECUTOR_PENDING.labels(self.name).set(self.pending)
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on a worker thread and awaits it; the caller's trace context goes along."""
+        with self.lock:
+            if self.pending >= self.limit:
+                record_items("executor", f"{self.name}_rejected")
+                raise ExecutorSaturated(self.name, self.limit)
+            self.pending += 1
+            EXECUTOR_PENDING.labels(self.name).set(self.pending)
+        context = contextvars.copy_context()
+        try:
+            future = self.executor.submit(context.run, fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        # Runs when the task finishes or is cancelled while still queued
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache(maxsize=None)
+def get_retrieval_executor() -> BoundedExecutor:
+    """Returns the process-wide executor for query embedding and vector search."""
+    return BoundedExecutor("retrieval", RETRIEVAL_WORKERS, RETRIEVAL_MAX_QUEUE)
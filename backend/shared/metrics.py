@@ -0,0 +1,106 @@
+#metrics.py
+# Process-wide Prometheus metrics and optional per-request trace spans.
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_LATENCY = Histogram(
+    "hsf_stage_latency_seconds", "Latency of a pipeline stage",
+    ["component", "stage"], buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter("hsf_stage_errors_total", "Stages that raised", ["component", "stage"])
+BYTES = Counter("hsf_bytes_total", "Bytes downloaded or extracted", ["component", "stage"])
+TOKENS = Counter("hsf_tokens_total", "Model tokens consumed", ["component", "stage", "kind"])
+ITEMS = Counter("hsf_items_total", "Items processed (files, chunks, results)", ["component", "stage"])
+CACHE_REQUESTS = Counter("hsf_cache_requests_total", "Cache lookups", ["cache", "result"])
+API_CALLS = Counter("hsf_api_calls_total", "Calls to external APIs", ["api", "method", "outcome"])
+RATE_LIMIT = Gauge("hsf_rate_limit_requests_per_second", "Current adaptive rate limit", ["limiter"])
+EXECUTOR_PENDING = Gauge("hsf_executor_pending_tasks", "Tasks queued or running in a bounded executor", ["executor"])
+HTTP_LATENCY = Histogram(
+    "hsf_http_request_latency_seconds", "Latency of API requests",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+
+_current_trace: ContextVar[Optional[List[dict]]] = ContextVar("hsf_trace", default=None)
+
+
+def observe(component: str, stage: str, start: float, error: bool = False) -> None:
+    """Records a stage that began at time.perf_counter() value start and ends now."""
+    elapsed = time.perf_counter() - start
+    STAGE_LATENCY.labels(component, stage).observe(elapsed)
+    if error:
+        STAGE_ERRORS.labels(component, stage).inc()
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.append({"name": f"{component}.{stage}", "start": start, "duration_ms": elapsed * 1000})
+
+
+@contextmanager
+def timed(component: str, stage: str):
+    """Observes the block's latency, counts it as an error if it raises and adds a trace span."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        observe(component, stage, start, error=True)
+        raise
+    observe(component, stage, start)
+
+
+def track(component: str, stage: str):
+    """Decorator form of timed()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(component, stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_bytes(component: str, stage: str, count: int) -> None:
+    BYTES.labels(component, stage).inc(count)
+
+
+def record_items(component: str, stage: str, count: int = 1) -> None:
+    ITEMS.labels(component, stage).inc(count)
+
+
+def record_tokens(component: str, stage: str, kind: str, count: int) -> None:
+    if count:
+        TOKENS.labels(component, stage, kind).inc(count)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_api_call(api: str, method: str, outcome: str = "ok") -> None:
+    API_CALLS.labels(api, method, outcome).inc()
+
+
+def start_trace():
+    """Starts collecting spans for the current context. Returns a token for end_trace()."""
+    return _current_trace.set([])
+
+
+def end_trace(token) -> List[dict]:
+    spans = _current_trace.get() or []
+    _current_trace.reset(token)
+    return spans
+
+
+def server_timing_header(spans: List[dict]) -> str:
+    """Formats spans for the Server-Timing response header."""
+    return ", ".join(f"{s['name'].replace('.', '_')};dur={s['duration_ms']:.1f}" for s in spans)
+
+
+def metrics_payload():
+    """Returns (body, content_type) in the Prometheus text exposition format."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,196 @@
+#rate_limiter.py
+# Process-wide adaptive rate limiting and retry for Gemini calls.
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+from shared.metrics import RATE_LIMIT, record_api_call
+
+# Set GEMINI_MAX_RPS to the project's quota (default: 2000 RPM, the paid-tier Flash limit). The limiter
+# starts there and relies on multiplicative decrease when 429s show the real limit is lower.
+GEMINI_MAX_RPS = float(os.getenv("GEMINI_MAX_RPS", str(2000 / 60)))
+GEMINI_RPS = float(os.getenv("GEMINI_RPS", str(GEMINI_MAX_RPS)))  # starting rate, adapted at runtime
+GEMINI_MIN_RPS = float(os.getenv("GEMINI_MIN_RPS", "0.05"))
+GEMINI_MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "6"))
+
+RETRY_DELAY_PATTERNS = [
+    re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s"),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)"),
+    re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+]
+
+
+class RetriesExhaustedError(Exception):
+    """Raised when a call still fails after every retry; the caller must not treat it as a result."""
+
+    def __init__(self, name: str, attempts: int, last_error: Exception):
+        super().__init__(f"{name} failed after {attempts} attempts: {last_error}")
+        self.last_error = last_error
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by every thread in the process. The refill rate adapts AIMD-style:
+    each success adds roughly `increase` requests/s per second of traffic, each throttle
+    multiplies the rate by `decrease` (at most once per cooldown) and honours any retry-after.
+    """
+
+    def __init__(self, name: str, rate: float, min_rate: float, max_rate: float,
+                 burst: float = 1.0, increase: float = 0.5, decrease: float = 0.5):
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+        RATE_LIMIT.labels(name).set(rate)
+
+    def _reserve(self) -> float:
+        """Takes a token (possibly going into debt) and returns how long the caller must wait."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0))
+            RATE_LIMIT.labels(self.name).set(self.rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self.lock:
+            now = time.monotonic()
+            # Concurrent callers hitting the same wall should only halve the rate once
+            if now - self.last_decrease > max(1.0, 1.0 / self.rate):
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.last_decrease = now
+                RATE_LIMIT.labels(self.name).set(self.rate)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str = "gemini") -> AdaptiveRateLimiter:
+    """Returns the process-wide limiter for an API, creating it on first use."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveRateLimiter(name, GEMINI_RPS, GEMINI_MIN_RPS, GEMINI_MAX_RPS)
+        return _limiters[name]
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """Returns "throttle" for quota errors, "transient" for 5xx/timeouts, None if not retryable."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        code = None
+    text = str(error)
+    if code == 429 or "RESOURCE_EXHAUSTED" in text or "ResourceExhausted" in type(error).__name__:
+        return "throttle"
+    if (code is not None and 500 <= code < 600) or isinstance(error, (TimeoutError, ConnectionError)) \
+            or type(error).__name__ in ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "ServerError"):
+        return "transient"
+    return None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Extracts a server retry hint (RetryInfo or Retry-After header) if the error carries one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers and headers.get("Retry-After"):
+        try:
+            return float(headers["Retry-After"])
+        except ValueError:
+            pass
+    text = f"{getattr(error, 'details', '')} {error}"
+    for pattern in RETRY_DELAY_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _next_delay(limiter: AdaptiveRateLimiter, error: Exception, attempt: int) -> float:
+    kind = classify_error(error)
+    hint = retry_after_seconds(error)
+    if kind == "throttle":
+        limiter.on_throttle(hint)
+    return max(hint or 0.0, backoff_delay(attempt))
+
+
+def call_with_retry(fn, *args, api: str = "gemini", method: str = "call",
+                    max_attempts: int = GEMINI_MAX_ATTEMPTS, **kwargs):
+    """
+    Calls fn through the shared limiter, retrying throttles and transient errors.
+    Non-retryable errors propagate unchanged; exhausted retries raise RetriesExhaustedError.
+    """
+    limiter = get_limiter(api)
+    for attempt in range(max_attempts):
+        limiter.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            kind = classify_error(e)
+            if kind is None:
+                raise
+            record_api_call(api, method, "quota" if kind == "throttle" else "error")
+            if attempt == max_attempts - 1:
+                raise RetriesExhaustedError(method, max_attempts, e) from e
+            time.sleep(_next_delay(limiter, e, attempt))
+        else:
+            limiter.on_success()
+            return result
+
+
+async def acall_with_retry(fn, *args, api: str = "gemini", method: str = "call",
+                           max_attempts: int = GEMINI_MAX_ATTEMPTS, **kwargs):
+    """Async variant of call_with_retry for coroutine functions."""
+    limiter = get_limiter(api)
+    for attempt in range(max_attempts):
+        await limiter.aacquire()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            kind = classify_error(e)
+            if kind is None:
+                raise
+            record_api_call(api, method, "quota" if kind == "throttle" else "error")
+            if attempt == max_attempts - 1:
+                raise RetriesExhaustedError(method, max_attempts, e) from e
+            await asyncio.sleep(_next_delay(limiter, e, attempt))
+        else:
+            limiter.on_success()
+            return result
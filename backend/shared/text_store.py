@@ -0,0 +1,139 @@
+#text_store.py
+# Persistent cache of extracted text, keyed by content hash and extractor version.
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from shared.metrics import record_cache, record_items
+
+TEXT_STORE_PATH = os.getenv("TEXT_STORE_PATH", "extracted_text.sqlite3")
+TEXT_STORE_MAX_MB = float(os.getenv("TEXT_STORE_MAX_MB", "512"))  # 0 disables the store
+PAGE_BREAK = "\f"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    content_hash TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (content_hash, extractor)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    content_hash TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (content_hash, extractor, page)
+);
+CREATE INDEX IF NOT EXISTS documents_last_used ON documents (last_used);
+"""
+
+
+def hash_bytes(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractedTextStore:
+    """
+    SQLite store of per-page extracted text. Entries are keyed by the sha256 of the
+    source bytes and an extractor version string, so upgrading an extractor simply
+    misses instead of serving stale text. Once the stored text exceeds max_bytes the
+    least recently used documents are evicted.
+    """
+
+    def __init__(self, path: str = TEXT_STORE_PATH, max_bytes: int = int(TEXT_STORE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Several workers may share the file, so wait for locks rather than failing
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def get(self, content_hash: str, extractor: str, first_page: int = None,
+            last_page: int = None) -> Optional[List[str]]:
+        """Returns the stored pages (1-based, inclusive range) or None if the document is not stored."""
+        with self.lock:
+            found = self.conn.execute(
+                "SELECT page_count FROM documents WHERE content_hash = ? AND extractor = ?",
+                (content_hash, extractor)).fetchone()
+            if found is None:
+                record_cache("extracted_text", False)
+                return None
+            rows = self.conn.execute(
+                "SELECT text FROM pages WHERE content_hash = ? AND extractor = ? AND page BETWEEN ? AND ? ORDER BY page",
+                (content_hash, extractor, first_page or 1, last_page or found[0])).fetchall()
+            with self.conn:
+                self.conn.execute("UPDATE documents SET last_used = ? WHERE content_hash = ? AND extractor = ?",
+                                  (time.time(), content_hash, extractor))
+        record_cache("extracted_text", True)
+        return [row[0] for row in rows]
+
+    def put(self, content_hash: str, extractor: str, pages: List[str]) -> None:
+        """Stores (or replaces) a document's pages, then evicts old documents if over budget."""
+        size = sum(len(page.encode("utf-8")) for page in pages)
+        if size > self.max_bytes:
+            return
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pages WHERE content_hash = ? AND extractor = ?", (content_hash, extractor))
+            self.conn.executemany(
+                "INSERT INTO pages (content_hash, extractor, page, text) VALUES (?, ?, ?, ?)",
+                [(content_hash, extractor, number, text) for number, text in enumerate(pages, start=1)])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (content_hash, extractor, page_count, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (content_hash, extractor, len(pages), size, time.time()))
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for content_hash, extractor, size in self.conn.execute(
+                "SELECT content_hash, extractor, size FROM documents ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM pages WHERE content_hash = ? AND extractor = ?", (content_hash, extractor))
+            self.conn.execute("DELETE FROM documents WHERE content_hash = ? AND extractor = ?", (content_hash, extractor))
+            total -= size
+            evicted += 1
+        record_items("text_store", "evicted", evicted)
+
+    def get_or_extract(self, content_hash: str, extractor: str, extract: Callable[[], str]) -> str:
+        """Returns the stored text joined with page breaks, running extract() and storing its result on a miss."""
+        pages = self.get(content_hash, extractor)
+        if pages is not None:
+            return PAGE_BREAK.join(pages)
+        text = extract()
+        # Empty output usually means the extractor failed (e.g. no Tesseract), so try again next time
+        if text and text.strip():
+            self.put(content_hash, extractor, text.split(PAGE_BREAK))
+        return text
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_text_store() -> Optional[ExtractedTextStore]:
+    """Returns the process-wide store, or None when TEXT_STORE_MAX_MB is 0."""
+    if TEXT_STORE_MAX_MB <= 0:
+        return None
+    return ExtractedTextStore()
@@ -0,0 +1,111 @@
+import os
+import random
+
+import docx
+
+WORDS = (
+    "heritage square phoenix rosson house restoration curation interview mayor volunteer archive "
+    "museum porch victorian brick garden donor gala exhibit collection photograph letter ledger "
+    "family history preservation city downtown carriage stable parlor furniture quilt textile "
+    "education program tour docent research survey foundation record deed map architect"
+).split()
+
+TOPICS = ["Restoration", "Curation", "Interviews", "Research", "Employee Resources"]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text: str, width: int = 90) -> list:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    if line:
+        lines.append(line)
+    return lines
+
+
+def pdf_bytes(pages: list) -> bytes:
+    """Builds a minimal text-only PDF, one list of lines per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def write_pdf(path: str, pages: list) -> None:
+    with open(path, "wb") as f:
+        f.write(pdf_bytes(pages))
+
+
+def random_pages(rng: random.Random, num_pages: int, topic: str = None) -> list:
+    pages = []
+    for _ in range(num_pages):
+        lines = [(topic or rng.choice(TOPICS)).upper()]
+        while len(lines) < 55:
+            lines.extend(_wrap(_paragraph(rng)) + [""])
+        pages.append(lines[:55])
+    return pages
+
+
+def write_docx(path, rng: random.Random, sections: int, topic: str = None) -> None:
+    """Writes a DOCX to a path or file-like object."""
+    document = docx.Document()
+    for _ in range(sections):
+        document.add_heading(topic or rng.choice(TOPICS), level=2)
+        for _ in range(rng.randint(2, 4)):
+            document.add_paragraph(_paragraph(rng))
+    document.save(path)
+
+
+def generate_corpus(output_dir: str, num_pdfs: int = 20, num_docx: int = 20,
+                    pages_per_pdf: int = 5, seed: int = 7) -> dict:
+    """
+    Generates a reproducible corpus of PDF and DOCX files.
+    Returns {"pdf": [paths], "docx": [paths], "pages": total_pdf_pages}.
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    corpus = {"pdf": [], "docx": [], "pages": 0}
+    for i in range(num_pdfs):
+        path = os.path.join(output_dir, f"synthetic_{i:04d}.pdf")
+        write_pdf(path, random_pages(rng, pages_per_pdf))
+        corpus["pdf"].append(path)
+        corpus["pages"] += pages_per_pdf
+    for i in range(num_docx):
+        path = os.path.join(output_dir, f"synthetic_{i:04d}.docx")
+        write_docx(path, rng, sections=pages_per_pdf * 2)
+        corpus["docx"].append(path)
+    return corpus
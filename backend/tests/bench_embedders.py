@@ -0,0 +1,63 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.chunker import Chunker
+
+SAMPLE_PARAGRAPH = (
+    "Heritage Square is a city block of historic houses in downtown Phoenix. "
+    "The Rosson House was completed in 1895 and restored in the 1970s. "
+    "Oral history interviews with former residents describe daily life, trades and the growth of the city. "
+)
+
+
+def make_chunks(count: int) -> list:
+    chunker = Chunker(chunk_size=200, chunk_overlap=0, mode="markdown")
+    chunks = []
+    while len(chunks) < count:
+        chunks.extend(chunker.chunk_text(f"## Section {len(chunks)}\n" + SAMPLE_PARAGRAPH * 8))
+    return chunks[:count]
+
+
+def measure(backend: str, chunks: list, threads: int = None) -> dict:
+    if backend == "onnx":
+        from modules.vector_store.onnx_embedder import OnnxMiniLMEmbeddings
+        model = OnnxMiniLMEmbeddings(intra_op_threads=threads or 0)
+    else:
+        from modules.vector_store.embedder import load_embedding_model
+        model = load_embedding_model(backend).embedding_model
+    model.embed_documents(chunks[:8])  # warm up
+    start = time.perf_counter()
+    model.embed_documents(chunks)
+    seconds = time.perf_counter() - start
+    return {"backend": backend, "threads": threads, "chunks": len(chunks),
+            "seconds": round(seconds, 3), "chunks_per_second": round(len(chunks) / seconds, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunks/s of the torch and ONNX embedders.")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--threads", type=int, nargs="*", default=[1, 2, 4])
+    parser.add_argument("--output", default="bench_embedders.json")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    runs = [measure("torch", chunks)]
+    print(runs[-1])
+    for threads in args.threads:
+        runs.append(measure("onnx", chunks, threads))
+        print(runs[-1])
+
+    with open(args.output, "w") as f:
+        json.dump({"runs": runs}, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
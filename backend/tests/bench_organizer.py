@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from shared.dedup import NearDuplicateIndex
+from sim_drive import CallStats, FaultInjector, FakeDriveService, FakeGenaiClient, build_synthetic_drive, install
+
+
+def run_phase(name: str, fn, stats: CallStats, verbose: bool) -> dict:
+    calls_before = sum(stats.calls.values())
+    start = time.perf_counter()
+    error = None
+    try:
+        with contextlib.redirect_stdout(sys.stdout if verbose else open(os.devnull, "w")):
+            fn()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    result = {"phase": name, "seconds": round(seconds, 3), "api_calls": sum(stats.calls.values()) - calls_before}
+    if error:
+        result["aborted"] = error
+    print(result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Drive organizer against simulated Drive and Gemini APIs.")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=1000, help="max files per Drive list page")
+    parser.add_argument("--drive-latency", type=float, default=0.02, help="seconds per Drive call")
+    parser.add_argument("--genai-latency", type=float, default=0.3, help="seconds per Gemini call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform latency in seconds")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="fraction of Gemini calls failing with RESOURCE_EXHAUSTED")
+    parser.add_argument("--quota-rps", type=float, default=None, help="Gemini calls allowed per second before RESOURCE_EXHAUSTED")
+    parser.add_argument("--retry-delay", type=int, default=1, help="retryDelay hint sent with RESOURCE_EXHAUSTED, in seconds")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="fraction of Drive and Gemini calls failing with 5xx")
+    parser.add_argument("--real-extraction", action="store_true",
+                        help="serve real PDF/DOCX bytes and run pdfplumber/python-docx (CPU bound)")
+    parser.add_argument("--dedup", choices=["off", "skip", "link"], default="off",
+                        help="near-duplicate handling, with a fresh index for the run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="keep the organizer's per-file output")
+    parser.add_argument("--output", default="bench_organizer.json")
+    args = parser.parse_args()
+
+    stats = CallStats()
+    drive = FakeDriveService(
+        faults=FaultInjector(args.drive_latency, args.jitter, args.server_error_rate, 0.0, seed=args.seed),
+        stats=stats, max_page_size=args.page_size, render_documents=args.real_extraction)
+    client = FakeGenaiClient(
+        faults=FaultInjector(args.genai_latency, args.jitter, args.server_error_rate, args.quota_error_rate, seed=args.seed + 1),
+        stats=stats, retry_delay_s=args.retry_delay, quota_rps=args.quota_rps)
+    build_synthetic_drive(drive, args.files, seed=args.seed)
+    modules = install(drive, client)
+    folder_utils = modules["folder_utils"]
+    if args.dedup != "off":
+        dedup_index = NearDuplicateIndex(os.path.join(tempfile.mkdtemp(), "dedup.sqlite3"))
+        modules["categorization"].DEDUP_MODE = args.dedup
+        modules["categorization"].get_dedup_index = lambda: dedup_index
+
+    phases = [run_phase("process_all_drive_files", modules["categorizer"].process_all_drive_files, stats, args.verbose)]
+    # Count before merging, which may fold the Uncategorized folder into a similarly named one
+    uncategorized_ids = {f["id"] for f in drive.records.values() if f["name"] == "Uncategorized"}
+    uncategorized = sum(1 for f in drive.records.values() if uncategorized_ids & set(f["parents"]))
+    phases += [
+        run_phase("merge_and_cleanup_folders",
+                  lambda: folder_utils.merge_and_cleanup_folders(folder_utils.get_existing_folders(), cutoff=0.4),
+                  stats, args.verbose),
+        run_phase("remove_empty_folders", folder_utils.remove_empty_folders, stats, args.verbose),
+    ]
+
+    categorize = phases[0]
+    still_in_root = sum(1 for f in drive.records.values()
+                        if "root" in f["parents"] and f["mimeType"] != "application/vnd.google-apps.folder")
+    total_calls = sum(stats.calls.values())
+    report = {
+        "config": vars(args),
+        "phases": phases,
+        "files_per_second": round(args.files / categorize["seconds"], 2) if categorize["seconds"] else None,
+        "api_calls_per_file": round(total_calls / args.files, 3),
+        "files_left_in_root": still_in_root,
+        "files_uncategorized": uncategorized,
+        "calls": dict(stats.calls),
+        "errors": dict(stats.errors),
+    }
+    print(f"files/s={report['files_per_second']} api_calls/file={report['api_calls_per_file']} "
+          f"left_in_root={still_in_root} uncategorized={uncategorized}")
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
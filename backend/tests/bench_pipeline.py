@@ -0,0 +1,190 @@
+import os
+import io
+import sys
+import json
+import time
+import zlib
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from bench_corpus import generate_corpus, WORDS
+from modules.organizer.extractors import extract_pdf_text, extract_docx_text
+from modules.vector_store.chunker import Chunker, batched
+from modules.vector_store.store import load_vector_store
+from modules.vector_store.query_retriever import QueryRetriever
+
+DIM = 384
+
+
+class HashingEmbeddings:
+    """Feature-hashing embedder so the suite can run with no model download."""
+
+    def _vector(self, text: str) -> list:
+        vector = np.zeros(DIM, dtype=np.float32)
+        for token in text.lower().split():
+            vector[zlib.crc32(token.encode()) % DIM] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class HashingEmbedder:
+    def __init__(self):
+        self.embedding_model = HashingEmbeddings()
+
+    def generate(self, texts):
+        return self.embedding_model.embed_documents(texts)
+
+
+def load_embedder(name: str):
+    if name == "hashing":
+        return HashingEmbedder()
+    from modules.vector_store.embedder import load_embedding_model
+    return load_embedding_model(name)
+
+
+def percentiles(latencies_ms: list) -> dict:
+    return {f"p{p}_ms": round(float(np.percentile(latencies_ms, p)), 3) for p in (50, 95, 99)}
+
+
+def bench_extraction(corpus: dict) -> tuple:
+    texts = []
+    start = time.perf_counter()
+    for path in corpus["pdf"]:
+        with open(path, "rb") as f:
+            texts.append(extract_pdf_text(io.BytesIO(f.read())))
+    pdf_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path in corpus["docx"]:
+        with open(path, "rb") as f:
+            texts.append(extract_docx_text(io.BytesIO(f.read())))
+    docx_seconds = time.perf_counter() - start
+
+    result = {
+        "pdf_pages": corpus["pages"],
+        "pdf_pages_per_second": round(corpus["pages"] / pdf_seconds, 2) if pdf_seconds else None,
+        "docx_files": len(corpus["docx"]),
+        "docx_files_per_second": round(len(corpus["docx"]) / docx_seconds, 2) if docx_seconds else None,
+    }
+    try:
+        from markitdown import MarkItDown
+        md = MarkItDown()
+        start = time.perf_counter()
+        for path in corpus["pdf"]:
+            md.convert(path)
+        result["markitdown_pdf_pages_per_second"] = round(corpus["pages"] / (time.perf_counter() - start), 2)
+    except ImportError:
+        result["markitdown_pdf_pages_per_second"] = None
+    return result, texts
+
+
+def bench_chunking(texts: list, chunk_size: int) -> tuple:
+    chunker = Chunker(chunk_size=chunk_size, chunk_overlap=0, mode="markdown")
+    start = time.perf_counter()
+    chunks = list(chunker.iter_documents(texts))
+    seconds = time.perf_counter() - start
+    megabytes = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    return {
+        "chunks": len(chunks),
+        "chunks_per_second": round(len(chunks) / seconds, 1),
+        "megabytes_per_second": round(megabytes / seconds, 3),
+    }, chunks
+
+
+def bench_embedding(embedder, chunks: list, batch_size: int) -> dict:
+    start = time.perf_counter()
+    for batch in batched(chunks, batch_size):
+        embedder.generate(batch)
+    seconds = time.perf_counter() - start
+    return {"chunks_per_second": round(len(chunks) / seconds, 1), "seconds": round(seconds, 3)}
+
+
+def bench_index_and_retrieval(embedder, backend: str, chunks: list, queries: list, k: int,
+                              batch_size: int, workdir: str) -> dict:
+    persist_directory = os.path.join(workdir, f"{backend}_index")
+    store = load_vector_store(embedder, backend=backend, persist_directory=persist_directory)
+    start = time.perf_counter()
+    for offset, batch in enumerate(batched(chunks, batch_size)):
+        store.add_texts(batch, [{"batch": offset} for _ in batch])
+    build_seconds = time.perf_counter() - start
+
+    store_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.retrieve(query, k=k)
+        store_latencies.append((time.perf_counter() - start) * 1000)
+
+    retriever = QueryRetriever(embedding_model=embedder, backend=backend, persist_directory=persist_directory)
+    retriever_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        retriever.retrieve_relevant_chunks(query, top_k=k)
+        retriever_latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "index_build_seconds": round(build_seconds, 3),
+        "vector_store_retrieve": percentiles(store_latencies),
+        "query_retriever": percentiles(retriever_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for ingestion, embedding and retrieval.")
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--docx", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5, help="pages per PDF")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=300, help="tokens per chunk")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--embedder", default="hashing", choices=["hashing", "torch", "onnx"])
+    parser.add_argument("--backend", default="chroma", choices=["chroma", "numpy"])
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    queries = [" ".join(rng.choice(WORDS, size=6)) for _ in range(args.queries)]
+    embedder = load_embedder(args.embedder)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus = generate_corpus(os.path.join(workdir, "corpus"), args.pdfs, args.docx, args.pages)
+        extraction, texts = bench_extraction(corpus)
+        print(f"[extraction] {extraction}")
+        chunking, chunks = bench_chunking(texts, args.chunk_size)
+        print(f"[chunking] {chunking}")
+        embedding = bench_embedding(embedder, chunks, args.batch_size)
+        print(f"[embedding] {embedding}")
+        retrieval = bench_index_and_retrieval(embedder, args.backend, chunks, queries, args.k, args.batch_size, workdir)
+        print(f"[retrieval] {retrieval}")
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "extraction": extraction,
+        "chunking": chunking,
+        "embedding": embedding,
+        "retrieval": retrieval,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+import numpy as np
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from bench_corpus import _sentence
+from bench_workers import seed_index
+from modules.vector_store.embedder import load_embedding_model
+from modules.vector_store.query_retriever import QueryRetriever
+from modules.vector_store.store import DEFAULT_DIRECTORIES
+from shared.executor import BoundedExecutor, ExecutorSaturated
+
+
+async def probe_loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.01) -> None:
+    """How late a 10 ms sleep wakes up: the time the loop spent unable to serve anything else."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def drive(retriever: QueryRetriever, inline: bool, questions: list, args) -> dict:
+    latencies, lags, shed = [], [], 0
+    stop = asyncio.Event()
+    deadline = time.perf_counter() + args.seconds
+
+    async def user(index: int):
+        nonlocal shed
+        while time.perf_counter() < deadline:
+            question = questions[index % len(questions)]
+            start = time.perf_counter()
+            try:
+                if inline:
+                    # What an async handler calling the synchronous API did: the loop waits for each search
+                    retriever.retrieve_relevant_chunks(question, top_k=5)
+                    await asyncio.sleep(0)
+                else:
+                    await retriever.aretrieve_relevant_chunks(question, top_k=5)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except ExecutorSaturated:
+                # The route answers 503; a well-behaved client waits Retry-After before trying again
+                shed += 1
+                await asyncio.sleep(args.retry_after)
+            index += args.concurrency
+
+    probe = asyncio.ensure_future(probe_loop_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    return {
+        "requests": len(latencies),
+        "shed": shed,
+        "queries_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+        "loop_lag_ms_p99": round(float(np.percentile(lags, 99)), 1) if lags else None,
+    }
+
+
+def run(label: str, embedding_model, workers: int, max_queue: int, inline: bool, workdir: str,
+        questions: list, args) -> dict:
+    executor = BoundedExecutor(f"bench_{label}", max(workers, 1), max_queue)
+    try:
+        retriever = QueryRetriever(embedding_model, executor=executor, backend=args.vector_backend, shard_key="",
+                                   persist_directory=os.path.join(workdir, DEFAULT_DIRECTORIES[args.vector_backend]))
+        retriever.retrieve_relevant_chunks("warm up", top_k=1)
+        result = {"run": label, "workers": workers if not inline else 0, "max_queue": max_queue}
+        result.update(asyncio.run(drive(retriever, inline, questions, args)))
+        return result
+    finally:
+        executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query throughput and event-loop lag of retrieval run inline on the loop "
+                    "vs on the bounded retrieval executor at several sizes, plus an overload run that sheds.")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--max-queue", type=int, default=64, help="queue limit for the scaling runs (no shedding)")
+    parser.add_argument("--overload-queue", type=int, default=2, help="queue limit for the overload run; 0 skips it")
+    parser.add_argument("--embedding-backend", default="torch")
+    parser.add_argument("--vector-backend", default="chroma")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--retry-after", type=float, default=0.05, help="client wait after a shed request, seconds")
+    parser.add_argument("--output", default="bench_retrieval_concurrency.json")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    questions = [_sentence(rng) for _ in range(args.questions)]
+    report = []
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_index(workdir, args.embedding_backend, args.vector_backend, args.docs)
+        embedding_model = load_embedding_model(args.embedding_backend)
+        report.append(run("inline", embedding_model, 1, args.max_queue, True, workdir, questions, args))
+        print(report[-1])
+        for workers in args.workers:
+            report.append(run(f"executor_{workers}", embedding_model, workers, args.max_queue, False,
+                              workdir, questions, args))
+            print(report[-1])
+        if args.overload_queue:
+            workers = max(args.workers)
+            report.append(run("overload", embedding_model, workers, args.overload_queue, False,
+                              workdir, questions, args))
+            print(report[-1])
+
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "runs": report}, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import numpy as np
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.ai_agent.model_router import ModelRouter, ModelTier
+
+
+class StandInLLM(Runnable):
+    """
+    Local stand-in for a Gemini tier: answers after a lognormal delay around median_s.
+    It is a Runnable, so it can also replace the tiers of a RAGAgent (RAGAgent(router=...)).
+    """
+
+    def __init__(self, name: str, median_s: float, sigma: float, seed: int):
+        self.name = name
+        self.median_s = median_s
+        self.sigma = sigma
+        self.rng = random.Random(seed)
+
+    def invoke(self, prompt, config=None, **kwargs):
+        time.sleep(self.median_s * self.rng.lognormvariate(0, self.sigma))
+        return AIMessage(content=f"{self.name} answer")
+
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        await asyncio.sleep(self.median_s * self.rng.lognormvariate(0, self.sigma))
+        return AIMessage(content=f"{self.name} answer")
+
+
+def make_workload(count: int, seed: int) -> list:
+    """Questions of mixed length with retrieval scores whose top-2 margin ranges from clear to ambiguous."""
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(count):
+        words = int(rng.lognormvariate(2.4, 0.5))
+        top = rng.uniform(0.4, 0.9)
+        margin = rng.expovariate(1 / 0.08)
+        scores = [top, top - margin] + [top - margin - rng.uniform(0, 0.1) for _ in range(2)]
+        workload.append((" ".join(["word"] * max(words, 2)), scores))
+    return workload
+
+
+def make_router(policy: str, args) -> ModelRouter:
+    fast = ModelTier("fast", StandInLLM("fast", args.fast_median, args.sigma, args.seed), args.fast_median, rate_limited=False)
+    large = ModelTier("large", StandInLLM("large", args.large_median, args.sigma, args.seed + 1), args.large_median,
+                      rate_limited=False)
+    if policy == "fast":
+        return ModelRouter(fast, fast)
+    if policy == "large":
+        return ModelRouter(large, large)
+    return ModelRouter(fast, large, min_margin=args.min_margin, long_question=args.long_question)
+
+
+async def run_policy(policy: str, budget_s, workload: list, args) -> dict:
+    router = make_router(policy, args)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, tiers, reasons = [], [], []
+
+    async def answer(question, scores):
+        async with semaphore:
+            start = time.perf_counter()
+            route = router.route(question, scores, budget_s)
+            _, tier = await router.generate("prompt", route, budget_s)
+            latencies.append(time.perf_counter() - start)
+            tiers.append(tier.name)
+            reasons.append(route.reason)
+
+    await asyncio.gather(*(answer(question, scores) for question, scores in workload))
+    latencies = np.asarray(latencies)
+    result = {
+        "policy": policy,
+        "budget_s": budget_s,
+        "latency_s_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_s_p95": round(float(np.percentile(latencies, 95)), 3),
+        "latency_s_p99": round(float(np.percentile(latencies, 99)), 3),
+        "large_share": round(tiers.count("large") / len(tiers), 3),
+        "routes": {reason: reasons.count(reason) for reason in sorted(set(reasons))},
+        "deadline_fallbacks": sum(1 for reason, tier in zip(reasons, tiers) if tier == "fast" and reason in ("long_question", "low_margin")),
+    }
+    if budget_s:
+        result["over_budget"] = int((latencies > budget_s).sum())
+    return result
+
+
+def routing_overhead_us(workload: list, args, repeats: int = 20) -> float:
+    router = make_router("routed", args)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for question, scores in workload:
+            router.route(question, scores, 1.0)
+    return (time.perf_counter() - start) / (repeats * len(workload)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the RAG model router with local stand-in tiers.")
+    parser.add_argument("--questions", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--fast-median", type=float, default=0.15, help="seconds; scale both medians down for quick runs")
+    parser.add_argument("--large-median", type=float, default=0.8)
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal spread of stand-in latency")
+    parser.add_argument("--min-margin", type=float, default=0.05)
+    parser.add_argument("--long-question", type=int, default=25)
+    parser.add_argument("--budgets", type=float, nargs="*", default=[0.6, 1.2], help="latency budgets in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_router.json")
+    args = parser.parse_args()
+
+    workload = make_workload(args.questions, args.seed)
+    runs = []
+    for policy, budget_s in [("fast", None), ("large", None), ("routed", None)] + [("routed", b) for b in args.budgets]:
+        runs.append(asyncio.run(run_policy(policy, budget_s, workload, args)))
+        print(runs[-1])
+    overhead = routing_overhead_us(workload, args)
+    print(f"[INFO] route() overhead: {overhead:.2f} us per question")
+
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "route_overhead_us": round(overhead, 3), "runs": runs}, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.store import load_vector_store
+
+DIM = 384  # all-MiniLM-L6-v2 output size
+
+
+class SyntheticEmbeddings:
+    """
+    Deterministic stand-in for the MiniLM embedder so the benchmark runs offline.
+    "doc-<i>" maps to a fixed random vector; "query-<j>" is a noisy copy of one document.
+    """
+
+    def __init__(self, num_docs: int):
+        self.num_docs = num_docs
+
+    def _vector(self, text: str) -> list:
+        kind, index = text.split("-")
+        index = int(index)
+        if kind == "doc":
+            return np.random.default_rng(index).standard_normal(DIM).astype(np.float32).tolist()
+        target = np.random.default_rng(10_000_000 + index).integers(self.num_docs)
+        base = np.random.default_rng(int(target)).standard_normal(DIM)
+        noise = np.random.default_rng(20_000_000 + index).standard_normal(DIM) * 0.8
+        return (base + noise).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class SyntheticEmbedder:
+    def __init__(self, num_docs: int):
+        self.embedding_model = SyntheticEmbeddings(num_docs)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def exact_top_k(num_docs: int, queries: list, k: int) -> list:
+    embeddings = SyntheticEmbeddings(num_docs)
+    matrix = np.asarray(embeddings.embed_documents([f"doc-{i}" for i in range(num_docs)]), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    truth = []
+    for query in queries:
+        q = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        truth.append(set(np.argsort(-(matrix @ q))[:k].tolist()))
+    return truth
+
+
+def run_backend(backend: str, options: dict, num_docs: int, queries: list, k: int, workdir: str, out):
+    embedder = SyntheticEmbedder(num_docs)
+    persist_directory = os.path.join(workdir, backend + "_" + "_".join(str(v) for v in options.values()))
+    store = load_vector_store(embedder, backend=backend, persist_directory=persist_directory, **options)
+    texts = [f"doc-{i}" for i in range(num_docs)]
+    start = time.perf_counter()
+    for offset in range(0, num_docs, 5000):
+        batch = texts[offset:offset + 5000]
+        store.add_texts(batch, [{"row": offset + i} for i in range(len(batch))])
+    build_seconds = time.perf_counter() - start
+    del store
+
+    baseline_rss = rss_mb()
+    start = time.perf_counter()
+    store = load_vector_store(embedder, backend=backend, persist_directory=persist_directory, **options)
+    store.load_index()
+    store.retrieve(queries[0], k=k)
+    startup_seconds = time.perf_counter() - start
+
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store.retrieve(query, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([metadata["row"] for _, metadata in hits])
+    out.put({
+        "backend": backend,
+        "options": options,
+        "build_seconds": round(build_seconds, 3),
+        "startup_seconds": round(startup_seconds, 3),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+        "rss_mb_after_load": round(rss_mb(), 1),
+        "rss_mb_delta": round(rss_mb() - baseline_rss, 1),
+        "results": results,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Chroma and NumPy vector backends on synthetic data.")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", default="bench_vector_backends.json")
+    args = parser.parse_args()
+
+    queries = [f"query-{j}" for j in range(args.queries)]
+    truth = exact_top_k(args.docs, queries, args.k)
+    configs = [
+        ("chroma", {}),
+        ("numpy", {"dtype": "int8", "rescore": False}),
+        ("numpy", {"dtype": "int8", "rescore": True}),
+        ("numpy", {"dtype": "float16", "rescore": False}),
+    ]
+
+    report = []
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend, options in configs:
+            out = ctx.Queue()
+            # Each backend runs in its own process so resident memory is not shared between them
+            process = ctx.Process(target=run_backend, args=(backend, options, args.docs, queries, args.k, workdir, out))
+            process.start()
+            result = out.get()
+            process.join()
+            hits = sum(len(truth[i] & set(rows)) for i, rows in enumerate(result.pop("results")))
+            result[f"recall_at_{args.k}"] = round(hits / (args.k * len(queries)), 4)
+            print(result)
+            report.append(result)
+
+    with open(args.output, "w") as f:
+        json.dump({"docs": args.docs, "queries": args.queries, "k": args.k, "runs": report}, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from contextlib import asynccontextmanager
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from bench_corpus import _paragraph, _sentence
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_state = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Each worker loads its retriever (or connects to the server) before it reports ready
+    from modules.vector_store.query_retriever import QueryRetriever
+    _state["retriever"] = QueryRetriever()
+    _state["retriever"].retrieve_relevant_chunks("warm up", top_k=1)
+    open(os.path.join(os.environ["BENCH_READY_DIR"], str(os.getpid())), "w").close()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.post("/retrieve")
+def retrieve(body: dict):
+    return {"chunks": _state["retriever"].retrieve_relevant_chunks(body["question"], top_k=5)}
+
+
+def _memory_kb(pid: int) -> tuple:
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            pss = next((int(line.split()[1]) for line in f if line.startswith("Pss:")), 0)
+    except OSError:
+        pass
+    return rss, pss
+
+
+def tree_memory_mb(root_pids: list) -> dict:
+    """RSS and PSS summed over the given processes and all their descendants (PSS splits shared pages)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    rss = pss = 0
+    stack = list(root_pids)
+    while stack:
+        pid = stack.pop()
+        process_rss, process_pss = _memory_kb(pid)
+        rss, pss = rss + process_rss, pss + process_pss
+        stack.extend(children.get(pid, []))
+    return {"rss_mb": round(rss / 1024, 1), "pss_mb": round(pss / 1024, 1)}
+
+
+def seed_index(workdir: str, embedding_backend: str, vector_backend: str, docs: int) -> None:
+    from modules.vector_store.embedder import load_embedding_model
+    from modules.vector_store.store import DEFAULT_DIRECTORIES, load_vector_store
+    rng = random.Random(0)
+    store = load_vector_store(load_embedding_model(embedding_backend), backend=vector_backend, shard_key="",
+                              persist_directory=os.path.join(workdir, DEFAULT_DIRECTORIES[vector_backend]))
+    texts = [_paragraph(rng) for _ in range(docs)]
+    for offset in range(0, docs, 500):
+        store.add_texts(texts[offset:offset + 500], [{"row": offset + i} for i in range(len(texts[offset:offset + 500]))])
+
+
+def _wait_for(check, process, timeout: float, what: str) -> None:
+    deadline = time.monotonic() + timeout
+    while not check():
+        if process.poll() is not None:
+            raise RuntimeError(f"{what} exited with code {process.returncode}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Timed out waiting for {what}")
+        time.sleep(0.2)
+
+
+def _can_connect(socket_path: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+async def drive(port: int, questions: list, concurrency: int, seconds: float) -> dict:
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def user(index: int):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/retrieve", json={"question": questions[index % len(questions)]})
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except httpx.HTTPError:
+                    errors += 1
+                index += concurrency
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+    }
+
+
+def run(mode: str, workers: int, args, workdir: str, questions: list) -> dict:
+    python_path = [BACKEND_DIR, TESTS_DIR] + [p for p in [os.environ.get("PYTHONPATH")] if p]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(python_path), VECTOR_SHARD_KEY="",
+               EMBEDDING_BACKEND=args.embedding_backend, VECTOR_BACKEND=args.vector_backend)
+    processes = []
+    try:
+        if mode == "shared":
+            socket_path = os.path.join(workdir, "embedding.sock")
+            server = subprocess.Popen([sys.executable, "-m", "modules.vector_store.embedding_server", "--socket", socket_path],
+                                      cwd=workdir, env=env)
+            processes.append(server)
+            _wait_for(lambda: _can_connect(socket_path), server, 300, "the embedding server")
+            env.update(EMBEDDING_BACKEND="remote", VECTOR_BACKEND="remote", EMBEDDING_SERVER_SOCKET=socket_path)
+
+        ready_dir = tempfile.mkdtemp(dir=workdir)
+        env["BENCH_READY_DIR"] = ready_dir
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "bench_workers:app", "--app-dir", TESTS_DIR, "--port", str(args.port),
+             "--workers", str(workers), "--log-level", "warning"], cwd=workdir, env=env))
+        _wait_for(lambda: len(os.listdir(ready_dir)) >= workers, processes[-1], 600, f"{workers} workers")
+
+        asyncio.run(drive(args.port, questions, args.concurrency, args.warmup))
+        result = {"mode": mode, "workers": workers}
+        result.update(asyncio.run(drive(args.port, questions, args.concurrency, args.seconds)))
+        result.update(tree_memory_mb([process.pid for process in processes]))
+        return result
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Requests/s and memory of /retrieve at several uvicorn worker counts, "
+                    "with per-worker models (local) vs the shared embedding server (shared).")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 4, 8])
+    parser.add_argument("--modes", nargs="*", default=["local", "shared"])
+    parser.add_argument("--embedding-backend", default="torch")
+    parser.add_argument("--vector-backend", default="chroma")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default="bench_workers.json")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    questions = [_sentence(rng) for _ in range(args.questions)]
+    report = []
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_index(workdir, args.embedding_backend, args.vector_backend, args.docs)
+        for workers in args.workers:
+            for mode in args.modes:
+                report.append(run(mode, workers, args, workdir, questions))
+                print(report[-1])
+
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "runs": report}, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
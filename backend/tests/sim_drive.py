@@ -0,0 +1,422 @@
+# sim_drive.py
+# In-process stand-ins for the Drive v3 files()/changes() surface and genai.Client.models.generate_content,
+# with configurable latency, page sizes and injected errors. Used by bench_organizer.py.
+import io
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from functools import lru_cache
+
+import httplib2
+from google.genai import errors as genai_errors
+from googleapiclient.errors import HttpError
+
+from bench_corpus import TOPICS, pdf_bytes, random_pages, write_docx
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class CallStats:
+    """Thread-safe counters shared by the Drive and Gemini stand-ins."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.errors = Counter()
+
+    def record(self, name: str, error: str = None):
+        with self.lock:
+            self.calls[name] += 1
+            if error:
+                self.errors[f"{name}:{error}"] += 1
+
+
+class FaultInjector:
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0, server_error_rate: float = 0.0,
+                 quota_error_rate: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.server_error_rate = server_error_rate
+        self.quota_error_rate = quota_error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def roll(self) -> str:
+        """Sleeps for the simulated latency and returns "quota", "server" or None."""
+        with self.lock:
+            delay = self.latency_s + self.rng.uniform(0, self.jitter_s)
+            draw = self.rng.random()
+        if delay:
+            time.sleep(delay)
+        if draw < self.quota_error_rate:
+            return "quota"
+        if draw < self.quota_error_rate + self.server_error_rate:
+            return "server"
+        return None
+
+
+QUERY_TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<paren>[()])
+  | (?P<op>and|or)\b
+  | mimeType\s*=\s*'(?P<mime>[^']*)'
+  | '(?P<parent>[^']*)'\s+in\s+parents\b
+  | trashed\s*=\s*(?P<trashed>true|false)\b
+)""", re.VERBOSE)
+
+
+def _tokenize_query(q: str) -> list:
+    tokens, position = [], 0
+    while q[position:].strip():
+        match = QUERY_TOKEN_RE.match(q, position)
+        if not match:
+            raise ValueError(f"Unsupported Drive query at {position}: {q!r}")
+        if match.group("paren") or match.group("op"):
+            tokens.append(match.group("paren") or match.group("op"))
+        elif match.group("mime") is not None:
+            tokens.append(lambda f, mime=match.group("mime"): f["mimeType"] == mime)
+        elif match.group("parent") is not None:
+            tokens.append(lambda f, parent=match.group("parent"): parent in f["parents"])
+        else:
+            tokens.append(lambda f, trashed=match.group("trashed") == "true": f["trashed"] == trashed)
+        position = match.end()
+    return tokens
+
+
+@lru_cache(maxsize=None)
+def _compile_query(q: str):
+    """
+    Parses the subset of Drive query syntax the organizer sends (mimeType='...', '<id>' in parents
+    and trashed=true|false, joined by and/or with parentheses) into a predicate on file records.
+    """
+    tokens = _tokenize_query(q)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        token = peek()
+        position += 1
+        return token
+
+    def atom():
+        token = take()
+        if token == "(":
+            inner = disjunction()
+            if take() != ")":
+                raise ValueError(f"Unbalanced parentheses in Drive query: {q!r}")
+            return inner
+        if not callable(token):
+            raise ValueError(f"Expected a condition in Drive query: {q!r}")
+        return token
+
+    def conjunction():
+        terms = [atom()]
+        while peek() == "and":
+            take()
+            terms.append(atom())
+        return terms[0] if len(terms) == 1 else (lambda f: all(term(f) for term in terms))
+
+    def disjunction():
+        terms = [conjunction()]
+        while peek() == "or":
+            take()
+            terms.append(conjunction())
+        return terms[0] if len(terms) == 1 else (lambda f: any(term(f) for term in terms))
+
+    predicate = disjunction()
+    if peek() is not None:
+        raise ValueError(f"Unexpected {'condition' if callable(peek()) else repr(peek())} in Drive query: {q!r}")
+    return predicate
+
+
+class _Request:
+    def __init__(self, drive, name, action):
+        self.drive = drive
+        self.name = name
+        self.action = action
+
+    def execute(self, num_retries=0):
+        fault = self.drive.faults.roll()
+        if fault:
+            self.drive.stats.record(f"drive.{self.name}", fault)
+            status = 429 if fault == "quota" else 503
+            resp = httplib2.Response({"status": status, "reason": "Simulated"})
+            raise HttpError(resp, b'{"error": {"message": "simulated"}}')
+        self.drive.stats.record(f"drive.{self.name}")
+        with self.drive.lock:
+            return self.action()
+
+
+class _Files:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q="", fields=None, pageSize=100, pageToken=None, **kwargs):
+        def action():
+            predicate = _compile_query(q) if q else (lambda f: True)
+            matches = [f for f in self.drive.records.values() if predicate(f)]
+            page_size = min(pageSize or 100, self.drive.max_page_size)
+            start = int(pageToken or 0)
+            result = {"files": [dict(f) for f in matches[start:start + page_size]]}
+            if start + page_size < len(matches):
+                result["nextPageToken"] = str(start + page_size)
+            return result
+        return _Request(self.drive, "files.list", action)
+
+    def get(self, fileId, fields=None, **kwargs):
+        return _Request(self.drive, "files.get", lambda: dict(self.drive.records[fileId]))
+
+    def get_media(self, fileId, **kwargs):
+        request = _Request(self.drive, "files.get_media", lambda: self.drive.content(fileId))
+        request.file_id = fileId
+        return request
+
+    def create(self, body=None, fields=None, media_body=None, **kwargs):
+        def action():
+            file_id = self.drive.new_id()
+            self.drive.records[file_id] = {"id": file_id, "name": body["name"], "mimeType": body.get("mimeType", PDF_MIME),
+                                         "parents": list(body.get("parents") or ["root"]), "trashed": False}
+            self.drive.log_change(file_id)
+            return dict(self.drive.records[file_id])
+        return _Request(self.drive, "files.create", action)
+
+    def update(self, fileId, addParents=None, removeParents=None, fields=None, body=None, **kwargs):
+        def action():
+            f = self.drive.records[fileId]
+            removed = set((removeParents or "").split(","))
+            f["parents"] = [p for p in f["parents"] if p not in removed]
+            if addParents:
+                f["parents"].extend(addParents.split(","))
+            if body and "trashed" in body:
+                f["trashed"] = body["trashed"]
+            self.drive.log_change(fileId)
+            return dict(f)
+        return _Request(self.drive, "files.update", action)
+
+    def delete(self, fileId, **kwargs):
+        def action():
+            del self.drive.records[fileId]
+            self.drive.log_change(fileId, removed=True)
+            return ""
+        return _Request(self.drive, "files.delete", action)
+
+
+class _Changes:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return _Request(self.drive, "changes.getStartPageToken", lambda: {"startPageToken": str(len(self.drive.change_log))})
+
+    def list(self, pageToken, pageSize=100, fields=None, **kwargs):
+        def action():
+            start = int(pageToken)
+            page_size = min(pageSize or 100, self.drive.max_page_size)
+            page = self.drive.change_log[start:start + page_size]
+            result = {"changes": [dict(c) for c in page]}
+            if start + page_size < len(self.drive.change_log):
+                result["nextPageToken"] = str(start + page_size)
+            else:
+                result["newStartPageToken"] = str(len(self.drive.change_log))
+            return result
+        return _Request(self.drive, "changes.list", action)
+
+
+class FakeDriveService:
+    """Drive v3 service stand-in holding a synthetic file tree in memory."""
+
+    def __init__(self, faults: FaultInjector = None, stats: CallStats = None, max_page_size: int = 1000,
+                 render_documents: bool = True):
+        self.faults = faults or FaultInjector()
+        self.render_documents = render_documents
+        self.stats = stats or CallStats()
+        self.max_page_size = max_page_size
+        self.records = {}
+        self.change_log = []
+        self.blobs = {}
+        self.lock = threading.RLock()
+        self._next_id = 0
+
+    def files(self):
+        return _Files(self)
+
+    def changes(self):
+        return _Changes(self)
+
+    def new_id(self) -> str:
+        self._next_id += 1
+        return f"sim{self._next_id:07d}"
+
+    def log_change(self, file_id, removed=False):
+        change = {"fileId": file_id, "removed": removed, "time": time.time()}
+        if not removed:
+            change["file"] = dict(self.records[file_id])
+        self.change_log.append(change)
+
+    def add_file(self, name, mime_type, parents=("root",), blob_key=None) -> str:
+        file_id = self.new_id()
+        self.records[file_id] = {"id": file_id, "name": name, "mimeType": mime_type,
+                                 "parents": list(parents), "trashed": False}
+        self.blobs[file_id] = blob_key
+        return file_id
+
+    def content(self, file_id) -> bytes:
+        mime_type, topic, variant = self.blobs[file_id]
+        if not self.render_documents and not mime_type.startswith("image/"):
+            return f"{topic}\nSynthetic document {variant} about {topic.lower()}.".encode("utf-8")
+        return _blob(mime_type, topic, variant)
+
+
+@lru_cache(maxsize=None)
+def _blob(mime_type: str, topic: str, variant: int) -> bytes:
+    """Renders (and caches) a small document whose text leads with its topic."""
+    rng = random.Random(f"{mime_type}-{topic}-{variant}")
+    if mime_type == PDF_MIME:
+        return pdf_bytes(random_pages(rng, 2, topic))
+    if mime_type == DOCX_MIME:
+        buffer = io.BytesIO()
+        write_docx(buffer, rng, sections=2, topic=topic)
+        return buffer.getvalue()
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color=(rng.randint(0, 255), 90, 90)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeMediaDownload:
+    """Replaces MediaIoBaseDownload: fetches the whole blob through the fake request in one chunk."""
+
+    def __init__(self, fd, request, chunksize=None):
+        self.fd = fd
+        self.request = request
+
+    def next_chunk(self, num_retries=0):
+        self.fd.write(self.request.execute())
+        return None, True
+
+
+class _Models:
+    def __init__(self, client):
+        self.client = client
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        fault = self.client.faults.roll()
+        if fault is None and self.client.over_quota():
+            fault = "quota"
+        if fault == "quota":
+            self.client.stats.record(f"genai.{model}", fault)
+            raise genai_errors.ClientError(429, {"error": {
+                "code": 429, "message": "Simulated quota exhaustion", "status": "RESOURCE_EXHAUSTED",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                             "retryDelay": f"{self.client.retry_delay_s}s"}]}})
+        if fault == "server":
+            self.client.stats.record(f"genai.{model}", fault)
+            raise genai_errors.ServerError(503, {"error": {
+                "code": 503, "message": "Simulated overload", "status": "UNAVAILABLE"}})
+        self.client.stats.record(f"genai.{model}")
+        return _FakeResponse(f"**Category:** {self.client.classify(contents)}")
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenaiClient:
+    """genai.Client stand-in: classifies by the topic heading the synthetic documents lead with."""
+
+    def __init__(self, faults: FaultInjector = None, stats: CallStats = None, retry_delay_s: int = 1,
+                 quota_rps: float = None, seed: int = 0):
+        self.faults = faults or FaultInjector()
+        self.stats = stats or CallStats()
+        self.retry_delay_s = retry_delay_s
+        self.quota_rps = quota_rps
+        self.window = deque()
+        self.window_lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.models = _Models(self)
+
+    def over_quota(self) -> bool:
+        """Sliding one-second window quota, like a requests-per-minute limit scaled down."""
+        if not self.quota_rps:
+            return False
+        with self.window_lock:
+            now = time.monotonic()
+            while self.window and now - self.window[0] > 1.0:
+                self.window.popleft()
+            if len(self.window) >= self.quota_rps:
+                return True
+            self.window.append(now)
+            return False
+
+    def classify(self, contents) -> str:
+        text = contents[0] if isinstance(contents[0], str) else ""
+        body = text.split("Text:\n", 1)[-1].lower() if text else ""
+        for topic in TOPICS:
+            if topic.lower() in body:
+                return topic
+        return "Images" if not body else self.rng.choice(TOPICS)
+
+
+def build_synthetic_drive(drive: FakeDriveService, num_files: int, image_ratio: float = 0.1,
+                          docx_ratio: float = 0.3, variants: int = 16, seed: int = 0) -> None:
+    """
+    Fills the fake drive with root-level files plus a few near-duplicate and empty folders,
+    the shapes merge_and_cleanup_folders and remove_empty_folders act on.
+    """
+    rng = random.Random(seed)
+    for name in ["Curation", "curation ", "Curations", "Research", "Reserch", "Old Stuff", "Empty 1", "Empty 2"]:
+        folder_id = drive.add_file(name, FOLDER_MIME)
+        if name in ("curation ", "Reserch"):
+            for i in range(5):
+                drive.add_file(f"{name.strip()}_{i}.pdf", PDF_MIME, parents=[folder_id],
+                               blob_key=(PDF_MIME, rng.choice(TOPICS), rng.randrange(variants)))
+    for i in range(num_files):
+        draw = rng.random()
+        if draw < image_ratio:
+            mime_type, ext = "image/png", "png"
+        elif draw < image_ratio + docx_ratio:
+            mime_type, ext = DOCX_MIME, "docx"
+        else:
+            mime_type, ext = PDF_MIME, "pdf"
+        topic = rng.choice(TOPICS)
+        drive.add_file(f"file_{i:06d}.{ext}", mime_type, blob_key=(mime_type, topic, rng.randrange(variants)))
+
+
+def _plain_text_extract(file_data, mime_type):
+    if mime_type.startswith("image/"):
+        return ""
+    return file_data.getvalue().decode("utf-8")
+
+
+def install(drive: FakeDriveService, client: FakeGenaiClient) -> dict:
+    """
+    Points the organizer modules at the stand-ins. The factories are replaced before the modules
+    are imported (they authenticate at import time) and the module globals are overwritten after.
+    When the drive does not render real documents, text extraction is replaced as well.
+    Returns the patched organizer modules by name.
+    """
+    from modules.organizer import drive_auth as drive_auth_module
+    from modules.organizer import genai_client as genai_client_module
+    drive_auth_module.drive_auth = lambda: drive
+    genai_client_module.genai_client = lambda: client
+
+    from modules.organizer import categorization, categorizer, file_utils, folder_utils
+    for module in (categorizer, file_utils, folder_utils):
+        module.drive_service = drive
+    categorization.client = client
+    file_utils.MediaIoBaseDownload = FakeMediaDownload
+    # Every run must pay for extraction; a persisted text store would turn reruns into cache hits
+    file_utils.get_text_store = lambda: None
+    categorization.get_dedup_index = lambda: None
+    categorization.get_vision_cache = lambda: None
+    if not drive.render_documents:
+        file_utils.extract_text = _plain_text_extract
+    return {"categorization": categorization, "categorizer": categorizer,
+            "file_utils": file_utils, "folder_utils": folder_utils}
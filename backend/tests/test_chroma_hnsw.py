@@ -0,0 +1,88 @@
+import os
+import sys
+import logging
+import tempfile
+from types import SimpleNamespace
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from chromadb.errors import InvalidArgumentError
+
+from modules.vector_store import chroma_store
+from modules.vector_store.chroma_store import ChromaVectorStore
+from test_sharded_store import HashEmbedder
+
+TEXTS = [f"Heritage Square record {i}" for i in range(50)]
+
+
+class Warnings(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def open_store(directory: str, **hnsw) -> ChromaVectorStore:
+    store = ChromaVectorStore(HashEmbedder(), persist_directory=directory, collection_name="hnsw_test", **hnsw)
+    store.load_index()
+    return store
+
+
+def capture_warnings() -> Warnings:
+    handler = Warnings()
+    chroma_store.logger.addHandler(handler)
+    return handler
+
+
+def test_hnsw_settings_are_persisted_and_reapplied():
+    with tempfile.TemporaryDirectory() as directory:
+        built = {"space": "cosine", "hnsw_m": 24, "ef_construction": 120, "ef_search": 40}
+        store = ChromaVectorStore(HashEmbedder(), persist_directory=directory, collection_name="hnsw_test", **built)
+        store.create_index(TEXTS, [{"row": i} for i in range(len(TEXTS))])
+        assert store.get_hnsw_params() == built
+
+        # Reopening without settings keeps what the collection was built with
+        assert open_store(directory).get_hnsw_params() == built
+
+        # ef_search can change on an existing collection, and the change is persisted
+        assert open_store(directory, ef_search=90).get_hnsw_params()["ef_search"] == 90
+        assert open_store(directory).get_hnsw_params() == dict(built, ef_search=90)
+        assert open_store(directory).retrieve(TEXTS[7], k=1)[0][0] == TEXTS[7]
+
+        # Build-time settings cannot change without a rebuild: they are kept, with a warning
+        handler = capture_warnings()
+        try:
+            store = open_store(directory, space="l2", hnsw_m=8)
+        finally:
+            chroma_store.logger.removeHandler(handler)
+        assert store.get_hnsw_params() == dict(built, ef_search=90)
+        assert any("space=cosine" in message for message in handler.messages)
+        assert any("hnsw_m=24" in message for message in handler.messages)
+
+
+def test_unchangeable_ef_search_is_reported_not_raised():
+    for error in (TypeError("unexpected keyword argument 'configuration'"),
+                  InvalidArgumentError("unknown field `ef_search`"),
+                  ValueError("Trying to update HNSW config but schema has SPANN")):
+        def modify(**kwargs):
+            raise error
+
+        collection = SimpleNamespace(configuration={"hnsw": {"ef_search": 10}}, metadata={}, modify=modify)
+        store = ChromaVectorStore(HashEmbedder(), collection_name="hnsw_test", ef_search=50)
+        store.vectorstore = SimpleNamespace(_collection=collection)
+        handler = capture_warnings()
+        try:
+            store._apply_hnsw()
+        finally:
+            chroma_store.logger.removeHandler(handler)
+        assert len(handler.messages) == 1 and "keeps 10" in handler.messages[0]
+
+
+if __name__ == "__main__":
+    test_hnsw_settings_are_persisted_and_reapplied()
+    test_unchangeable_ef_search_is_reported_not_raised()
+    print("Chroma keeps its HNSW settings across reloads, applies a new ef_search and warns about the rest.")
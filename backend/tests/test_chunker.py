@@ -0,0 +1,84 @@
+import os
+import sys
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.chunker import Chunker, batched
+
+TABLE_HEADER = ["| Item | Date | Donor |", "| --- | --- | --- |"]
+TABLE_ROWS = [f"| Quilt {i} | 19{i % 100:02d} | Smith family {i} |" for i in range(120)]
+
+
+def test_headings_stay_with_their_paragraph():
+    text = ("# Rosson House\n\nBuilt in 1895 for Dr. Roland Rosson.\n\n"
+            "## Restoration\n\nThe porch balusters were replaced with hand-turned redwood.\n\n"
+            "## Docents\nTours run hourly from the carriage house.")
+    chunks = Chunker(chunk_size=40, chunk_overlap=0, mode="markdown").chunk_text(text)
+    assert chunks[0].startswith("# Rosson House\nBuilt in 1895")
+    assert any(chunk.startswith("## Restoration\nThe porch balusters") for chunk in chunks)
+    assert any(chunk.startswith("## Docents\nTours run hourly") for chunk in chunks)
+    # A heading never ends up alone in a chunk when text follows it
+    assert not any(chunk.startswith("#") and "\n" not in chunk for chunk in chunks)
+
+
+def test_large_table_repeats_its_header():
+    text = "## Donations\n" + "\n".join(TABLE_HEADER + TABLE_ROWS)
+    chunker = Chunker(chunk_size=80, chunk_overlap=0, mode="markdown")
+    chunks = chunker.chunk_text(text)
+    assert len(chunks) > 1
+    rows = []
+    for chunk in chunks:
+        lines = chunk.splitlines()
+        assert lines[:3] == ["## Donations"] + TABLE_HEADER
+        rows.extend(lines[3:])
+    assert rows == TABLE_ROWS
+
+
+def test_chunks_respect_the_token_limit():
+    long_paragraph = " ".join(f"Sentence {i} about the Heritage Square gardens." for i in range(200))
+    text = "\n\n".join(["# Grounds", long_paragraph, "\n".join(TABLE_HEADER + TABLE_ROWS[:40]), "Closing note."])
+    chunker = Chunker(chunk_size=60, chunk_overlap=10, mode="markdown")
+    chunks = chunker.chunk_text(text)
+    assert all(chunker.token_count(chunk) <= 60 for chunk in chunks)
+    assert "Closing note." in chunks[-1]
+
+    # The default recursive mode sizes by characters and needs no tokenizer
+    recursive = Chunker(chunk_size=200, chunk_overlap=20)
+    assert all(len(chunk) <= 200 for chunk in recursive.chunk_text(long_paragraph))
+
+
+def test_offsets_point_at_each_chunk():
+    section = "## Notes\nSee the table below.\n\n" + "\n".join(TABLE_HEADER + TABLE_ROWS[:60]) + "\n\n"
+    # The same heading, sentence and table header repeat, so searching for them would find the first copy
+    text = "  # Inventory\r\n\r\n" + section * 3 + "\fClosing note."
+    chunker = Chunker(chunk_size=80, chunk_overlap=0, mode="markdown")
+    spans = list(chunker.iter_chunks_with_offsets(text))
+    assert [chunk for _, chunk in spans] == chunker.chunk_text(text)
+    offsets = [offset for offset, _ in spans]
+    assert offsets == sorted(offsets) and len(set(offsets)) == len(offsets) and offsets[0] == 2
+    for offset, chunk in spans:
+        lines = chunk.splitlines()
+        # A table chunk after the first repeats the header, so it starts at its first new row
+        continued = lines[:2] == TABLE_HEADER and not text.startswith(lines[0], offset)
+        assert text.startswith(lines[2] if continued else lines[0], offset), (offset, chunk[:40])
+
+    # Recursive chunks are exact slices of the text
+    recursive = Chunker(chunk_size=120, chunk_overlap=30)
+    for offset, chunk in recursive.iter_chunks_with_offsets(section * 3):
+        assert (section * 3)[offset:offset + len(chunk)] == chunk
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+if __name__ == "__main__":
+    test_headings_stay_with_their_paragraph()
+    test_large_table_repeats_its_header()
+    test_chunks_respect_the_token_limit()
+    test_offsets_point_at_each_chunk()
+    test_batched()
+    print("Chunker keeps headings with their text, repeats table headers, stays within the token limit "
+          "and reports where each chunk starts.")
@@ -0,0 +1,93 @@
+import io
+import os
+import sys
+import random
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from shared.dedup import NearDuplicateIndex, image_hash, text_signature
+
+WORDS = "heritage square phoenix rosson house restoration curation interview docent porch archive ledger".split()
+
+
+def _text(seed: int, words: int = 2000) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _image(seed: int, size=(400, 300), fmt="PNG", **save_kwargs) -> io.BytesIO:
+    pixels = (np.random.default_rng(seed).random((30, 40, 3)) * 255).astype("uint8")
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).resize((400, 300)).resize(size).save(buffer, format=fmt, **save_kwargs)
+    buffer.seek(0)
+    return buffer
+
+
+def test_text_near_duplicates():
+    with tempfile.TemporaryDirectory() as directory:
+        index = NearDuplicateIndex(os.path.join(directory, "dedup.sqlite3"), threshold=0.8)
+        original = _text(0)
+        words = original.split()
+        edited = " ".join("Docent," if i % 200 == 0 else word for i, word in enumerate(words))
+
+        assert text_signature("") is None
+        index.add("organizer", "A", "transcript.pdf", "text", text_signature(original), category="Interviews")
+        duplicate = index.find("organizer", "text", text_signature(edited))
+        assert duplicate is not None and duplicate.doc_id == "A" and duplicate.category == "Interviews"
+        assert index.find("organizer", "text", text_signature(_text(1))) is None
+        # A document is never its own duplicate, and scopes are independent
+        assert index.find("organizer", "text", text_signature(original), exclude="A") is None
+        assert index.find("vector", "text", text_signature(original)) is None
+
+        index.add("organizer", "B", "transcript (1).pdf", "text", text_signature(edited), canonical_id="A")
+        assert index.duplicates_of("organizer", "A") == ["B"]
+        assert index.canonical_of("organizer", "B") == "A"
+        index.close()
+
+
+def test_image_near_duplicates():
+    with tempfile.TemporaryDirectory() as directory:
+        index = NearDuplicateIndex(os.path.join(directory, "dedup.sqlite3"), image_distance=6)
+        index.add("organizer", "scan", "scan.png", "image", image_hash(_image(0)), category="Restoration")
+        resized = index.find("organizer", "image", image_hash(_image(0, size=(200, 150), fmt="JPEG", quality=60)))
+        assert resized is not None and resized.doc_id == "scan"
+        assert index.find("organizer", "image", image_hash(_image(1))) is None
+        assert image_hash(io.BytesIO(b"not an image")) is None
+        index.close()
+
+
+def test_uncategorized_files_are_not_linked():
+    from sim_drive import FakeDriveService, FakeGenaiClient, install
+
+    os.environ.setdefault("GENAI_API_KEY", "test")
+    categorization = install(FakeDriveService(), FakeGenaiClient())["categorization"]
+    replies = iter(["Uncategorized", "Interviews", "Research"])
+    originals = {name: getattr(categorization, name)
+                 for name in ("get_dedup_index", "download_for_classification", "classify_content")}
+    with tempfile.TemporaryDirectory() as directory:
+        index = NearDuplicateIndex(os.path.join(directory, "dedup.sqlite3"))
+        categorization.get_dedup_index = lambda: index
+        categorization.download_for_classification = lambda file_id, mime_type: (_text(0), None)
+        categorization.classify_content = lambda content, file_data=None: next(replies)
+        try:
+            files = [{"id": name, "name": f"{name}.pdf", "mimeType": "application/pdf"} for name in "ABC"]
+            category_to_files, _ = categorization.batch_categorize_files(files, index=False, dedup_mode="link")
+        finally:
+            for name, original in originals.items():
+                setattr(categorization, name, original)
+            index.close()
+    # A failed classification is not copied to duplicates: B is classified itself, and C follows B
+    assert category_to_files == {"Uncategorized": ["A"], "Interviews": ["B", "C"]}
+
+
+if __name__ == "__main__":
+    test_text_near_duplicates()
+    test_image_near_duplicates()
+    test_uncategorized_files_are_not_linked()
+    print("Near-duplicate text and images are found; distinct documents are not; Uncategorized files are not linked.")
@@ -0,0 +1,204 @@
+import os
+import sys
+import socket
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.embedding_server import (BatchedEmbeddings, EmbeddingBatcher, EmbeddingRequestHandler,
+                                                   EmbeddingServer, EmbeddingServerClient, EmbeddingServerError,
+                                                   RemoteVectorStore, _ServerEmbedder)
+from modules.vector_store.numpy_store import NumpyVectorStore
+from test_sharded_store import HashEmbedder, HashEmbeddings
+
+
+class CountingEmbeddings(HashEmbeddings):
+    """Stub model that records the size of every batch it is given."""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return super().embed_documents(texts)
+
+
+class SlowStore:
+    """Stub store whose calls outlast the client's timeout the first time each is made."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _call(self, method):
+        self.calls.append(method)
+        if self.calls.count(method) == 1:
+            time.sleep(0.5)
+        return len(self.calls)
+
+    def count(self):
+        return self._call("count")
+
+    def add_texts(self, texts, metadatas=None):
+        return self._call("add_texts")
+
+
+class TrackedHandler(EmbeddingRequestHandler):
+    """Remembers each connection so stopping the server can close it, as exiting the process would."""
+
+    def setup(self):
+        self.server.connections.append(self.request)
+
+
+def start_server(socket_path: str, vector_store=None, model=None, max_wait: float = 0.005) -> EmbeddingServer:
+    batcher = EmbeddingBatcher(model or CountingEmbeddings(), max_batch=64, max_wait=max_wait)
+    if vector_store == "numpy":
+        vector_store = NumpyVectorStore(_ServerEmbedder(BatchedEmbeddings(batcher)),
+                                        persist_directory=os.path.join(os.path.dirname(socket_path), "index"))
+    server = EmbeddingServer(socket_path, batcher, vector_store, embedding="torch-fp32")
+    server.RequestHandlerClass = TrackedHandler
+    server.connections = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stop_server(server: EmbeddingServer) -> None:
+    server.shutdown()
+    server.server_close()
+    for connection in server.connections:
+        try:
+            connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def test_concurrent_requests_share_model_batches():
+    with tempfile.TemporaryDirectory() as directory:
+        model = CountingEmbeddings()
+        server = start_server(os.path.join(directory, "embed.sock"), model=model, max_wait=0.2)
+        client = EmbeddingServerClient(server.server_address)
+        results = {}
+        barrier = threading.Barrier(8)
+
+        def embed(i):
+            barrier.wait()
+            results[i] = client.embed([f"text {i}", f"more text {i}"])
+
+        threads = [threading.Thread(target=embed, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        try:
+            assert sum(model.batches) == 16 and len(model.batches) < 8
+            for i in range(8):
+                expected = HashEmbeddings().embed_documents([f"text {i}", f"more text {i}"])
+                assert np.array_equal(results[i], np.asarray(expected, dtype=np.float32))
+            assert client.ping()["embedding"] == "torch-fp32"
+        finally:
+            stop_server(server)
+
+
+def test_store_calls_go_to_the_server_store():
+    with tempfile.TemporaryDirectory() as directory:
+        server = start_server(os.path.join(directory, "embed.sock"), vector_store="numpy")
+        try:
+            store = RemoteVectorStore(socket_path=server.server_address)
+            store.add_texts([f"Heritage Square note {i}" for i in range(20)], [{"row": i} for i in range(20)])
+            assert store.count() == 20 == server.vector_store.count()
+            assert store.retrieve("Heritage Square note 7", k=1) == [("Heritage Square note 7", {"row": 7})]
+            hits = store.search_batch([HashEmbeddings().embed_query("Heritage Square note 3")], k=2,
+                                      filter={"row": [3, 4]})
+            assert [metadata["row"] for _, metadata, _ in hits[0]] == [3, 4]
+            try:
+                store.client.call_store("reset")
+                raise AssertionError("expected reset to be refused")
+            except EmbeddingServerError:
+                pass
+            assert store.count() == 20
+            assert store.delete({"row": [18, 19]}) == 2 and server.vector_store.count() == 18
+        finally:
+            stop_server(server)
+
+
+def test_concurrent_writers_are_serialized():
+    with tempfile.TemporaryDirectory() as directory:
+        server = start_server(os.path.join(directory, "embed.sock"), vector_store="numpy")
+        store = RemoteVectorStore(socket_path=server.server_address)
+        errors = []
+
+        def write(worker):
+            try:
+                for batch in range(20):
+                    rows = range(batch * 16, batch * 16 + 16)
+                    store.add_texts([f"Worker {worker} note {i}" for i in rows], [{"worker": worker, "row": i} for i in rows])
+            except Exception as e:
+                errors.append(e)
+
+        def search():
+            try:
+                for _ in range(40):
+                    store.search_batch([HashEmbeddings().embed_query("Worker 1 note 3")], k=3)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+        threads.append(threading.Thread(target=search))
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert not errors, errors
+            assert store.count() == 4 * 20 * 16
+            assert store.retrieve("Worker 2 note 77", k=1) == [("Worker 2 note 77", {"worker": 2, "row": 77})]
+        finally:
+            stop_server(server)
+        reopened = NumpyVectorStore(HashEmbedder(), persist_directory=os.path.join(directory, "index"))
+        assert reopened.count() == 4 * 20 * 16
+
+
+def test_only_idempotent_calls_are_resent():
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, "embed.sock")
+        server = start_server(socket_path, vector_store=SlowStore())
+        try:
+            client = EmbeddingServerClient(socket_path, timeout=0.25)
+            # A read that times out is resent on a new connection
+            assert client.call_store("count") == 2
+            time.sleep(0.5)
+            # A write that times out may have been applied, so it is reported rather than repeated
+            try:
+                client.call_store("add_texts", texts=["a"])
+                raise AssertionError("expected the timeout to be raised")
+            except socket.timeout:
+                pass
+            time.sleep(0.5)
+            assert server.vector_store.calls == ["count", "count", "add_texts"]
+        finally:
+            stop_server(server)
+
+        # After a server restart the dead connection is replaced before a write is sent on it
+        client = EmbeddingServerClient(socket_path)
+        server = start_server(socket_path, vector_store="numpy")
+        try:
+            client.call_store("add_texts", texts=["before restart"])
+            stop_server(server)
+            server = start_server(socket_path, vector_store="numpy")
+            client.call_store("add_texts", texts=["after restart"])
+            assert client.call_store("count") == 2
+        finally:
+            stop_server(server)
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_model_batches()
+    test_store_calls_go_to_the_server_store()
+    test_concurrent_writers_are_serialized()
+    test_only_idempotent_calls_are_resent()
+    print("Embedding server batches concurrent requests, serializes store writes and resends only idempotent calls.")
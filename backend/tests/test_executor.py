@@ -0,0 +1,63 @@
+import os
+import sys
+import asyncio
+import threading
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from shared.executor import BoundedExecutor, ExecutorSaturated
+from shared.metrics import end_trace, start_trace, timed
+
+
+async def _saturate_and_drain():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    running = asyncio.ensure_future(executor.run(release.wait))
+    queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+    await asyncio.sleep(0.05)
+
+    # One running and one waiting fill the executor; the next call is shed, not queued
+    try:
+        await executor.run(lambda: "shed")
+        raise AssertionError("expected ExecutorSaturated")
+    except ExecutorSaturated:
+        pass
+
+    # Cancelling a task that is still waiting gives its slot back
+    queued.cancel()
+    await asyncio.sleep(0.05)
+    assert executor.pending == 1
+    requeued = asyncio.ensure_future(executor.run(lambda: "requeued"))
+
+    release.set()
+    assert await running is True
+    assert await requeued == "requeued"
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+async def _keeps_trace():
+    executor = BoundedExecutor("test_trace", max_workers=2, max_queue=0)
+
+    def search():
+        with timed("test", "search"):
+            return threading.current_thread().name
+
+    token = start_trace()
+    thread_name = await executor.run(search)
+    spans = end_trace(token)
+    assert thread_name.startswith("test_trace")
+    assert [span["name"] for span in spans] == ["test.search"]
+    executor.shutdown()
+
+
+def test_executor():
+    asyncio.run(_saturate_and_drain())
+    asyncio.run(_keeps_trace())
+
+
+if __name__ == "__main__":
+    test_executor()
+    print("Bounded executor sheds work past its queue limit, frees cancelled slots and keeps trace spans.")
@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.chroma_store import ChromaVectorStore, to_chroma_where
+from modules.vector_store.numpy_store import NumpyVectorStore
+from test_sharded_store import HashEmbedder, HashEmbeddings
+
+CATEGORIES = ["Curation", "Interviews", "Research"]
+TEXTS = [f"{CATEGORIES[i % 3]} document {i}" for i in range(90)]
+METADATAS = [{"category": CATEGORIES[i % 3], "source": f"file{i % 5}.pdf", "row": i} for i in range(90)]
+FILTERS = [
+    {"category": "Interviews"},
+    {"category": ["Curation", "Research"]},
+    {"category": "Research", "source": ["file0.pdf", "file2.pdf"]},
+    {"row": (4, 7, 10)},
+    {"category": "Missing"},
+]
+
+
+def test_to_chroma_where():
+    assert to_chroma_where(None) is None
+    assert to_chroma_where({}) is None
+    assert to_chroma_where({"category": "Interviews"}) == {"category": {"$eq": "Interviews"}}
+    assert to_chroma_where({"row": (4, 7)}) == {"row": {"$in": [4, 7]}}
+    assert to_chroma_where({"category": "Research", "source": ["a.pdf"]}) == {
+        "$and": [{"category": {"$eq": "Research"}}, {"source": {"$in": ["a.pdf"]}}]
+    }
+
+
+def test_backends_agree_on_filtered_rows():
+    with tempfile.TemporaryDirectory() as directory:
+        chroma = ChromaVectorStore(HashEmbedder(), persist_directory=os.path.join(directory, "chroma"))
+        chroma.create_index(TEXTS, METADATAS)
+        numpy_store = NumpyVectorStore(HashEmbedder(), persist_directory=os.path.join(directory, "numpy"))
+        numpy_store.add_texts(TEXTS, METADATAS)
+
+        query_vector = HashEmbeddings().embed_query("question 1")
+        for filters in FILTERS:
+            expected = {m["row"] for m in METADATAS if all(
+                m[key] in value if isinstance(value, (list, tuple)) else m[key] == value
+                for key, value in filters.items())}
+            # k covers every row, so each backend must return exactly the matching ones
+            for store in (chroma, numpy_store):
+                hits = store.search_with_scores(query_vector, k=len(TEXTS), filter=filters)
+                assert {m["row"] for _, m, _ in hits} == expected, (type(store).__name__, filters)
+                assert [m["row"] for _, m in store.retrieve("question 1", k=3, filter=filters)] == \
+                       [m["row"] for _, m, _ in hits[:3]]
+
+
+if __name__ == "__main__":
+    test_to_chroma_where()
+    test_backends_agree_on_filtered_rows()
+    print("Metadata filters translate to Chroma where clauses and select the same rows on every backend.")
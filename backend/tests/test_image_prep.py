@@ -0,0 +1,63 @@
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.organizer.image_prep import prepare_image
+
+
+def _encode(img: Image.Image, fmt: str, **save_kwargs) -> io.BytesIO:
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **save_kwargs)
+    buffer.seek(0)
+    return buffer
+
+
+def _scan(size) -> Image.Image:
+    pixels = (np.random.default_rng(0).random((size[1] // 8, size[0] // 8, 3)) * 255).astype("uint8")
+    return Image.fromarray(pixels).resize(size)
+
+
+def test_prepare_image():
+    # A large TIFF scan is shrunk to the vision resolution and sent as JPEG
+    tiff = _encode(_scan((3000, 2000)), "TIFF")
+    prepared = prepare_image(tiff, max_side=768)
+    assert prepared.mime_type == "image/jpeg" and prepared.data[:2] == b"\xff\xd8"
+    assert max(Image.open(io.BytesIO(prepared.data)).size) == 768
+    assert len(prepared.data) < prepared.original_bytes / 10
+    assert tiff.tell() == 0
+
+    # A 16-bit grayscale scan keeps its tones instead of clipping to white
+    gradient = np.tile(np.linspace(0, 65535, 1600).astype(np.uint16), (1000, 1))
+    prepared = prepare_image(_encode(Image.fromarray(gradient), "TIFF"), max_side=768)
+    assert prepared.image.mode == "L"
+    pixels = np.asarray(Image.open(io.BytesIO(prepared.data)), dtype=np.float32)
+    assert pixels[:, :20].mean() < 10 and pixels[:, -20:].mean() > 245 and 100 < pixels.mean() < 155
+
+    # Transparency is flattened for JPEG and kept for WebP
+    logo = Image.new("RGBA", (1200, 600), (200, 30, 30, 0))
+    assert prepare_image(_encode(logo, "PNG"), max_side=768).image.mode == "RGB"
+    webp = prepare_image(_encode(logo, "PNG"), max_side=768, fmt="WEBP")
+    assert webp.mime_type == "image/webp" and webp.image.mode == "RGBA"
+
+    # A small JPEG is already optimal and is sent untouched with its real type
+    small = _encode(_scan((400, 300)), "JPEG", quality=50)
+    prepared = prepare_image(small, max_side=768)
+    assert prepared.data == small.getvalue() and prepared.mime_type == "image/jpeg"
+
+    try:
+        prepare_image(io.BytesIO(b"not an image"))
+        raise AssertionError("undecodable image was accepted")
+    except Exception as e:
+        assert not isinstance(e, AssertionError)
+
+
+if __name__ == "__main__":
+    test_prepare_image()
+    print("Images are downsized and re-encoded with the right MIME type; small JPEGs pass through.")
@@ -0,0 +1,135 @@
+import os
+import sys
+import tempfile
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store import vector_pipeline
+from modules.vector_store.numpy_store import NumpyVectorStore
+from modules.vector_store.store import load_vector_store
+from modules.vector_store.vector_pipeline import PAGE_BREAK, index_text, ingest_directory, ingest_if_empty
+from shared.dedup import NearDuplicateIndex
+from test_sharded_store import HashEmbedder
+
+PAGES = [
+    "# Rosson House\n\nBuilt in 1895 for Dr. Roland Rosson.\n\n## Restoration\n\nThe porch balusters were replaced.",
+    "## Docents\n\nTours run hourly from the carriage house.\n\n" + "\n\n".join(
+        f"Docent note {i}: the parlor clock was wound and the visitor log was signed by the shift lead." for i in range(30)),
+]
+TEXT = PAGE_BREAK.join(PAGES)
+
+
+class RecordingStore(NumpyVectorStore):
+    """Keeps the size of every add_texts call."""
+
+    def __init__(self, directory: str):
+        super().__init__(HashEmbedder(), persist_directory=directory)
+        self.batches = []
+
+    def add_texts(self, texts, metadatas=None):
+        self.batches.append(len(texts))
+        super().add_texts(texts, metadatas)
+
+
+def test_index_text_streams_tagged_chunks():
+    with tempfile.TemporaryDirectory() as directory:
+        store = RecordingStore(directory)
+        count = index_text(TEXT, "drive-1", "rosson.pdf", category="Research", metadata={"ingest": "organizer"},
+                           batch_size=3, vector_store=store, dedup_mode="off")
+        assert count == store.count() > 3
+        # Fixed-size batches, the last one holding the remainder
+        assert store.batches == [3] * (count // 3) + ([count % 3] if count % 3 else [])
+
+        metadatas = store.metadatas
+        assert [m["chunk_index"] for m in metadatas] == list(range(count))
+        assert {m["page"] for m in metadatas} == {1, 2}
+        for text, metadata in zip(store.texts, metadatas):
+            assert {key: metadata[key] for key in ("source_id", "source", "category", "ingest")} == {
+                "source_id": "drive-1", "source": "rosson.pdf", "category": "Research", "ingest": "organizer"}
+            page = PAGES[metadata["page"] - 1]
+            assert page.startswith(text.splitlines()[0], metadata["offset"])
+
+        hits = store.search_with_scores(HashEmbedder().embedding_model.embed_query("x"), k=count,
+                                        filter={"source_id": "drive-1", "page": 1})
+        assert hits and all(m["page"] == 1 for _, m, _ in hits)
+
+
+def test_index_text_skips_near_duplicates():
+    with tempfile.TemporaryDirectory() as directory:
+        dedup = NearDuplicateIndex(os.path.join(directory, "dedup.sqlite3"), threshold=0.8)
+        real_get_dedup_index = vector_pipeline.get_dedup_index
+        vector_pipeline.get_dedup_index = lambda: dedup
+        try:
+            store = NumpyVectorStore(HashEmbedder(), persist_directory=os.path.join(directory, "index"))
+            first = index_text(TEXT, "drive-1", "rosson.pdf", vector_store=store, dedup_mode="link")
+            assert first == store.count() > 0
+
+            # A copy is not embedded again; "link" records it against the original
+            assert index_text(TEXT, "drive-2", "rosson (1).pdf", vector_store=store, dedup_mode="link") == 0
+            assert dedup.canonical_of("vector", "drive-2") == "drive-1"
+            assert index_text(TEXT, "drive-3", "rosson (2).pdf", vector_store=store, dedup_mode="skip") == 0
+            assert dedup.canonical_of("vector", "drive-3") is None
+            assert store.count() == first
+
+            # Re-indexing the original itself is not treated as a duplicate, and replaces its chunks
+            assert index_text(TEXT, "drive-1", "rosson.pdf", vector_store=store, dedup_mode="link") == first
+            assert store.count() == first
+        finally:
+            vector_pipeline.get_dedup_index = real_get_dedup_index
+            dedup.close()
+
+
+def test_reindexing_replaces_a_source():
+    other = "# Carriage House\n\nThe carriage house now holds the gift shop."
+    with tempfile.TemporaryDirectory() as directory:
+        for backend, shard_key in (("numpy", ""), ("chroma", ""), ("numpy", "category")):
+            store = load_vector_store(HashEmbedder(), backend=backend, shard_key=shard_key,
+                                      persist_directory=os.path.join(directory, f"{backend}_{shard_key}"))
+            first = index_text(TEXT, "drive-1", "rosson.pdf", category="Research", batch_size=3,
+                               vector_store=store, dedup_mode="off")
+            kept = index_text(other, "drive-2", "carriage.pdf", category="Curation", vector_store=store, dedup_mode="off")
+            # An interrupted run indexes the same file again on the next one
+            assert index_text(TEXT, "drive-1", "rosson.pdf", category="Research", batch_size=3,
+                              vector_store=store, dedup_mode="off") == first
+            assert store.count() == first + kept, backend
+            hits = store.retrieve(PAGES[0].split("\n\n")[1], k=3)
+            assert len({text for text, _ in hits}) == len(hits), (backend, hits)
+
+            # A shorter new version leaves none of the old chunks behind
+            shorter = index_text(PAGES[0], "drive-1", "rosson.pdf", category="Research",
+                                 vector_store=store, dedup_mode="off")
+            assert 0 < shorter < first and store.count() == shorter + kept
+            assert store.delete({"source_id": "drive-9"}) == 0
+
+
+def test_ingest_if_empty_fills_a_new_index_once():
+    with tempfile.TemporaryDirectory() as directory:
+        pdfs = os.path.join(directory, "pdfs")
+        os.makedirs(os.path.join(pdfs, "interviews"))
+        for path in ("rosson.pdf", os.path.join("interviews", "driggs.PDF"), "notes.txt"):
+            with open(os.path.join(pdfs, path), "wb") as f:
+                f.write(b"%PDF-1.4")
+        real_extract = vector_pipeline.load_pdf_text_with_markitdown
+        vector_pipeline.load_pdf_text_with_markitdown = lambda file_path: f"# {os.path.basename(file_path)}\n\n{TEXT}"
+        try:
+            store = NumpyVectorStore(HashEmbedder(), persist_directory=os.path.join(directory, "index"))
+            assert ingest_if_empty(store, "") == ingest_if_empty(store, os.path.join(directory, "missing")) == 0
+            added = ingest_if_empty(store, pdfs)
+            assert added == store.count() > 0
+            assert {m["source"] for m in store.metadatas} == {"rosson.pdf", "driggs.PDF"}
+
+            # A populated index is left alone, and an explicit re-run replaces rather than duplicates
+            assert ingest_if_empty(store, pdfs) == 0
+            assert ingest_directory(pdfs, store) == added and store.count() == added
+        finally:
+            vector_pipeline.load_pdf_text_with_markitdown = real_extract
+
+
+if __name__ == "__main__":
+    test_index_text_streams_tagged_chunks()
+    test_index_text_skips_near_duplicates()
+    test_reindexing_replaces_a_source()
+    test_ingest_if_empty_fills_a_new_index_once()
+    print("index_text streams tagged chunks in fixed-size batches, replaces re-indexed sources and skips near-duplicates.")
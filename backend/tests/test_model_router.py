@@ -0,0 +1,110 @@
+import os
+import sys
+import asyncio
+import tempfile
+
+import numpy as np
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.ai_agent.model_router import ModelRouter, ModelTier, Route
+from modules.vector_store.chroma_store import ChromaVectorStore
+from modules.vector_store.numpy_store import NumpyVectorStore
+from test_sharded_store import HashEmbeddings
+
+LONG_QUESTION = " ".join(["word"] * 30)
+
+
+class StubLLM:
+    def __init__(self, name: str, delay: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self.cancelled = False
+
+    async def ainvoke(self, prompt, config=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return f"{self.name}: {prompt}"
+
+
+class UnitHashEmbeddings(HashEmbeddings):
+    """Unit-length vectors, like both embedding backends produce."""
+
+    def _vector(self, text: str) -> list:
+        vector = np.asarray(super()._vector(text))
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+class UnitHashEmbedder:
+    def __init__(self):
+        self.embedding_model = UnitHashEmbeddings()
+
+
+def make_router(fast_delay: float = 0.0, large_delay: float = 0.0, fast_latency_s: float = 2,
+                large_latency_s: float = 10) -> ModelRouter:
+    fast = ModelTier("fast", StubLLM("fast", fast_delay), fast_latency_s, rate_limited=False)
+    large = ModelTier("large", StubLLM("large", large_delay), large_latency_s, rate_limited=False)
+    return ModelRouter(fast, large, min_margin=0.05, long_question=25)
+
+
+def test_route():
+    router = make_router()
+    assert router.route("Who built Rosson House?", [0.9, 0.5]) == Route(router.fast, "simple")
+    assert router.route("Who built Rosson House?", [0.9]) == Route(router.fast, "simple")
+    assert router.route(LONG_QUESTION, [0.9, 0.5]) == Route(router.large, "long_question")
+    assert router.route("Who built Rosson House?", [0.80, 0.78]) == Route(router.large, "low_margin")
+    # fast.high() is 2 + 4 * 1 = 6s, so the large tier's 10s only fits a budget of more than 16s
+    assert router.route(LONG_QUESTION, [0.9, 0.5], budget_s=15) == Route(router.fast, "budget")
+    assert router.route(LONG_QUESTION, [0.9, 0.5], budget_s=30) == Route(router.large, "long_question")
+    tier = router.large
+    assert ModelRouter(tier, tier).route("Who built Rosson House?", [0.9, 0.5]) == Route(tier, "fixed")
+
+
+def test_slow_large_call_falls_back_to_fast():
+    router = make_router(large_delay=1.0, fast_latency_s=0.01, large_latency_s=0.05)
+    route = router.route(LONG_QUESTION, [0.9, 0.5], budget_s=0.3)
+    assert route.tier is router.large
+    response, tier = asyncio.run(router.generate("prompt", route, budget_s=0.3))
+    assert tier is router.fast and response == "fast: prompt"
+    assert router.large.llm.cancelled
+    # The abandoned call still raised the large tier's estimate
+    assert router.large.latency.mean > 0.05
+
+    router = make_router(large_delay=0.01, fast_latency_s=0.01, large_latency_s=0.05)
+    response, tier = asyncio.run(router.generate("prompt", Route(router.large, "low_margin"), budget_s=0.3))
+    assert tier is router.large and response == "large: prompt"
+    response, tier = asyncio.run(router.generate("prompt", Route(router.large, "low_margin")))
+    assert tier is router.large
+
+
+def test_margins_agree_across_backends():
+    texts = [f"Heritage Square note {i}" for i in range(200)]
+    queries = [UnitHashEmbeddings().embed_query(f"question {i}") for i in range(10)]
+    with tempfile.TemporaryDirectory() as directory:
+        stores = [NumpyVectorStore(UnitHashEmbedder(), persist_directory=os.path.join(directory, "numpy"))]
+        for space in ("l2", "cosine", "ip"):
+            stores.append(ChromaVectorStore(UnitHashEmbedder(), persist_directory=os.path.join(directory, space),
+                                            space=space))
+        for store in stores:
+            store.add_texts(texts)
+
+        reference = [[score for _, _, score in hits] for hits in stores[0].search_batch(queries, k=2)]
+        for store in stores[1:]:
+            for query, expected in zip(queries, reference):
+                scores = [score for _, _, score in store.search_with_scores(query, k=2)]
+                assert np.allclose(scores, expected, atol=1e-4), (store.space, scores, expected)
+            for hits, expected in zip(store.search_batch(queries, k=2), reference):
+                assert np.allclose([score for _, _, score in hits], expected, atol=1e-4)
+
+
+if __name__ == "__main__":
+    test_route()
+    test_slow_large_call_falls_back_to_fast()
+    test_margins_agree_across_backends()
+    print("Router escalates on long or ambiguous questions within budget, falls back on deadline, "
+          "and sees the same scores from every backend.")
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import tempfile
+
+import numpy as np
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.numpy_store import NumpyVectorStore, _normalize, _quantize
+from test_sharded_store import HashEmbedder, HashEmbeddings
+
+CATEGORIES = ["Curation", "Interviews", "Research"]
+TEXTS = [f"{CATEGORIES[i % 3]} document {i}" for i in range(1200)]
+METADATAS = [{"category": CATEGORIES[i % 3], "row": i} for i in range(1200)]
+QUERIES = [f"question {i}" for i in range(40)]
+
+
+def build(directory: str, rescore: bool = True, batch_size: int = 100) -> NumpyVectorStore:
+    store = NumpyVectorStore(HashEmbedder(), persist_directory=directory, rescore=rescore)
+    for start in range(0, len(TEXTS), batch_size):
+        store.add_texts(TEXTS[start:start + batch_size], METADATAS[start:start + batch_size])
+    return store
+
+
+def exact_top_k(query: str, k: int, rows=None) -> list:
+    """Rows ranked by float32 cosine, the reference the quantized search must agree with."""
+    rows = np.arange(len(TEXTS)) if rows is None else np.asarray(rows)
+    vectors = _normalize(np.asarray(HashEmbeddings().embed_documents([TEXTS[r] for r in rows]), dtype=np.float32))
+    query_vector = _normalize(np.asarray([HashEmbeddings().embed_query(query)], dtype=np.float32))[0]
+    return [int(rows[i]) for i in np.argsort(-(vectors @ query_vector))[:k]]
+
+
+def test_int8_round_trip():
+    vectors = _normalize(np.random.default_rng(0).standard_normal((500, 384)).astype(np.float32))
+    quantized, scales = _quantize(vectors, "int8")
+    assert quantized.dtype == np.int8
+    restored = quantized.astype(np.float32) * scales[:, None]
+    assert np.all(np.abs(restored - vectors) <= scales[:, None] / 2 + 1e-7)
+    assert (_normalize(restored) * vectors).sum(axis=1).min() > 0.999
+
+
+def test_rescoring_matches_exact_search():
+    with tempfile.TemporaryDirectory() as directory:
+        store = build(directory, rescore=True)
+        for query in QUERIES:
+            hits = store.search_by_vector(HashEmbeddings().embed_query(query), k=10)
+            assert [row for row, _ in hits] == exact_top_k(query, 10)
+            assert all(a >= b for (_, a), (_, b) in zip(hits, hits[1:]))
+
+
+def test_int8_only_search_agrees_with_exact_search():
+    with tempfile.TemporaryDirectory() as directory:
+        store = build(directory, rescore=False)
+        assert store.full is None
+        recall = np.mean([len({row for row, _ in store.search_by_vector(HashEmbeddings().embed_query(q), k=10)}
+                              & set(exact_top_k(q, 10))) / 10 for q in QUERIES])
+        assert recall >= 0.9, recall
+
+
+def test_metadata_filters():
+    with tempfile.TemporaryDirectory() as directory:
+        store = build(directory)
+        query_vector = HashEmbeddings().embed_query("question 1")
+        hits = store.search_with_scores(query_vector, k=5, filter={"category": "Interviews"})
+        interviews = [i for i, m in enumerate(METADATAS) if m["category"] == "Interviews"]
+        assert [m["row"] for _, m, _ in hits] == exact_top_k("question 1", 5, interviews)
+
+        hits = store.search_with_scores(query_vector, k=20, filter={"category": ["Curation", "Research"]})
+        assert {m["category"] for _, m, _ in hits} <= {"Curation", "Research"}
+
+        hits = store.search_with_scores(query_vector, k=5, filter={"category": "Research", "row": [2, 5, 8]})
+        assert sorted(m["row"] for _, m, _ in hits) == [2, 5, 8]
+        assert store.search_with_scores(query_vector, k=5, filter={"category": "Missing"}) == []
+
+
+def test_reload_and_crash_safety():
+    with tempfile.TemporaryDirectory() as directory:
+        store = build(directory, batch_size=25)
+        # 48 appends are merged down to one segment per set bit of 48
+        assert [segment["rows"] for segment in store.segments] == [800, 400]
+        expected = store.retrieve("question 3", k=5)
+
+        reopened = NumpyVectorStore(HashEmbedder(), persist_directory=directory)
+        reopened.load_index()
+        assert reopened.count() == len(TEXTS)
+        assert reopened.retrieve("question 3", k=5) == expected
+
+        # Files from a write that never reached the manifest are ignored and later replaced
+        os.makedirs(os.path.join(directory, "segments", f"{reopened.next_segment:06d}"))
+        reopened.load_index()
+        assert reopened.count() == len(TEXTS)
+        reopened.add_texts(["Late addition"], [{"category": "Research", "row": -1}])
+        assert reopened.count() == len(TEXTS) + 1
+        assert reopened.retrieve("Late addition", k=1)[0][0] == "Late addition"
+
+        # A segment whose files disagree with the manifest is reported, not served
+        segment = reopened.segments[-1]
+        with open(os.path.join(directory, segment["path"], "documents.json"), "w") as f:
+            json.dump({"texts": [], "metadatas": []}, f)
+        try:
+            NumpyVectorStore(HashEmbedder(), persist_directory=directory).load_index()
+            raise AssertionError("expected a corrupt index to be rejected")
+        except ValueError:
+            pass
+
+
+def test_appends_do_not_reread_the_index():
+    with tempfile.TemporaryDirectory() as directory:
+        store = build(directory, batch_size=100)
+
+        def reread(*args, **kwargs):
+            raise AssertionError("an append re-read the existing index")
+
+        store.load_index = store._read_segment = reread
+        for start in range(0, 200, 10):
+            store.add_texts([f"Appended note {i}" for i in range(start, start + 10)],
+                            [{"category": "Research", "row": 1200 + i} for i in range(start, start + 10)])
+        assert store.count() == len(TEXTS) + 200
+        assert store.retrieve("Appended note 57", k=1)[0][0] == "Appended note 57"
+        assert store.search_with_scores(HashEmbeddings().embed_query("x"), k=1, filter={"row": 1250})[0][1]["row"] == 1250
+
+        reopened = NumpyVectorStore(HashEmbedder(), persist_directory=directory)
+        reopened.load_index()
+        assert reopened.texts == store.texts and reopened.metadatas == store.metadatas
+        assert [segment["path"] for segment in reopened.segments] == [segment["path"] for segment in store.segments]
+        assert reopened.retrieve("Appended note 57", k=3) == store.retrieve("Appended note 57", k=3)
+
+
+def test_reads_single_file_index():
+    with tempfile.TemporaryDirectory() as directory:
+        vectors = _normalize(np.asarray(HashEmbeddings().embed_documents(TEXTS[:30]), dtype=np.float32))
+        quantized, scales = _quantize(vectors, "int8")
+        np.save(os.path.join(directory, "embeddings.npy"), quantized)
+        np.save(os.path.join(directory, "scales.npy"), scales)
+        with open(os.path.join(directory, "documents.json"), "w") as f:
+            json.dump({"dtype": "int8", "texts": TEXTS[:30], "metadatas": METADATAS[:30]}, f)
+
+        store = NumpyVectorStore(HashEmbedder(), persist_directory=directory)
+        assert store.retrieve(TEXTS[4], k=1)[0][0] == TEXTS[4]
+        store.add_texts(TEXTS[30:60], METADATAS[30:60])
+        assert store.count() == 60 and not os.path.exists(os.path.join(directory, "embeddings.npy"))
+        assert store.retrieve(TEXTS[4], k=1)[0][0] == TEXTS[4]
+
+
+if __name__ == "__main__":
+    test_int8_round_trip()
+    test_rescoring_matches_exact_search()
+    test_int8_only_search_agrees_with_exact_search()
+    test_metadata_filters()
+    test_reload_and_crash_safety()
+    test_appends_do_not_reread_the_index()
+    test_reads_single_file_index()
+    print("NumPy store matches exact search, filters, reloads and rejects inconsistent segments.")
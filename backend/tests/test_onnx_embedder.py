@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.embedder import load_embedding_model
+
+# The comparison needs both backends: torch for the reference, onnxruntime and an exported model for the int8 side
+pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+from modules.vector_store.onnx_embedder import INT8_FILE, ONNX_MODEL_DIR
+
+if not os.path.exists(os.path.join(ONNX_MODEL_DIR, INT8_FILE)):
+    pytest.skip(f"no exported ONNX model in {ONNX_MODEL_DIR}; run python -m modules.vector_store.onnx_embedder",
+                allow_module_level=True)
+
+COSINE_TOLERANCE = 0.02  # quantized embeddings must keep cosine >= 0.98 with the torch output
+
+SAMPLE_TEXTS = [
+    "Heritage Square Foundation preserves the Rosson House, built in 1895.",
+    "Interview transcript with Mayor John Driggs about his childhood in Phoenix.",
+    "Restoration notes: the porch balusters were replaced with hand-turned redwood.",
+    "| Item | Date | Donor |\n| --- | --- | --- |\n| Quilt | 1902 | Smith family |",
+    "Employee handbook section 4: volunteer scheduling and badge pickup.",
+    "short",
+]
+
+
+def test_onnx_matches_torch():
+    torch_embeddings = np.asarray(load_embedding_model("torch").generate(SAMPLE_TEXTS))
+    onnx_embedder = load_embedding_model("onnx")
+    onnx_embeddings = np.asarray(onnx_embedder.generate(SAMPLE_TEXTS))
+
+    torch_embeddings /= np.linalg.norm(torch_embeddings, axis=1, keepdims=True)
+    onnx_embeddings /= np.linalg.norm(onnx_embeddings, axis=1, keepdims=True)
+    cosines = (torch_embeddings * onnx_embeddings).sum(axis=1)
+    print(f"Cosine similarity torch vs onnx: min={cosines.min():.4f} mean={cosines.mean():.4f}")
+    assert cosines.min() >= 1 - COSINE_TOLERANCE
+
+    query = np.asarray(onnx_embedder.generate_single(SAMPLE_TEXTS[0]))
+    assert np.allclose(query, onnx_embeddings[0] * np.linalg.norm(query), atol=1e-4)
+
+
+if __name__ == "__main__":
+    test_onnx_matches_torch()
+    print("ONNX embeddings are within tolerance of torch.")
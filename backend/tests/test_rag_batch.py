@@ -0,0 +1,180 @@
+import os
+import re
+import sys
+import json
+import asyncio
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.ai_agent import agentv2
+from modules.ai_agent.agentv2 import RAGAgent
+from modules.ai_agent.model_router import ModelRouter, ModelTier
+from shared.executor import BoundedExecutor
+
+# Seconds each question's answer takes; later questions finish first
+DELAYS = [0.08, 0.06, 0.04, 0.02, 0.0]
+QUESTIONS = [f"question {i}" for i in range(len(DELAYS))]
+
+
+class StubEmbedder:
+    def generate(self, texts):
+        return [[float(text.split()[-1])] for text in texts]
+
+    def generate_single(self, text):
+        return self.generate([text])[0]
+
+
+class StubStore:
+    """Returns one passage per query naming the question it was retrieved for, with a clear score margin."""
+
+    def __init__(self):
+        self.filters = []
+
+    def search_with_scores(self, query_vector, k=5, filter=None):
+        return self.search_batch([query_vector], k, filter)[0]
+
+    def search_batch(self, query_vectors, k=5, filter=None):
+        self.filters.append(filter)
+        return [[(f"passage {int(vector[0])}", {"row": int(vector[0])}, 1.0),
+                 ("unrelated", {"row": -1}, 0.0)] for vector in query_vectors]
+
+
+class StubLLM:
+    """Answers after the question's delay; questions containing "fail" raise instead."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, prompt, config=None):
+        question = re.search(r"Question: (.*)", prompt).group(1)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(DELAYS[int(question.split()[-1])])
+            if "fail" in question:
+                raise RuntimeError(f"model refused {question}")
+            return type("Message", (), {"content": f"answer to {question}"})()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+
+def make_agent():
+    llm = StubLLM()
+    tier = ModelTier("stub", llm, initial_latency_s=0.1, rate_limited=False)
+    executor = BoundedExecutor("test_batch", max_workers=1, max_queue=4)
+    agent = RAGAgent(router=ModelRouter(tier, tier), executor=executor, embedder=StubEmbedder(), vector_store=StubStore())
+    return agent, llm
+
+
+async def collect(agent, questions, **kwargs):
+    return [item async for item in agent.answer_questions(questions, **kwargs)]
+
+
+def test_ordered_and_unordered_streaming():
+    agent, llm = make_agent()
+    results = asyncio.run(collect(agent, QUESTIONS, filters={"category": "Research"}, concurrency=5))
+    assert [index for index, _ in results] == list(range(len(QUESTIONS)))
+    for index, result in results:
+        assert result["answer"] == f"answer to question {index}"
+        assert result["source_documents"][0] == {"content": f"passage {index}", "metadata": {"row": index}}
+    assert agent.vector_store.filters == [{"category": "Research"}]
+
+    # Unordered streaming yields each answer as it finishes: the shortest delay first
+    results = asyncio.run(collect(agent, QUESTIONS, ordered=False, concurrency=5))
+    assert [index for index, _ in results] == sorted(range(len(QUESTIONS)), key=lambda i: DELAYS[i])
+
+    assert llm.max_in_flight == 5
+    llm.max_in_flight = 0
+    asyncio.run(collect(agent, QUESTIONS, concurrency=2))
+    assert llm.max_in_flight == 2
+
+
+def test_failed_question_does_not_stop_the_batch():
+    agent, _ = make_agent()
+    questions = list(QUESTIONS)
+    questions[2] = "please fail 2"
+    results = dict(asyncio.run(collect(agent, questions, ordered=False)))
+    assert results[2] == {"error": "model refused please fail 2"}
+    assert all(results[i]["answer"] == f"answer to question {i}" for i in (0, 1, 3, 4))
+
+
+def test_closing_the_stream_cancels_outstanding_answers():
+    agent, llm = make_agent()
+
+    async def first_then_close():
+        stream = agent.answer_questions(QUESTIONS, ordered=False, concurrency=5)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.1)
+        return first
+
+    assert asyncio.run(first_then_close())[0] == 4
+    assert llm.cancelled == 4 and llm.in_flight == 0
+
+
+def api_client(agent):
+    """A test client for the API routes, serving from agent."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sim_drive import FakeDriveService, FakeGenaiClient, install
+
+    # The organizer modules authenticate at import time, and routes builds its agent on import
+    os.environ.setdefault("GENAI_API_KEY", "test")
+    install(FakeDriveService(), FakeGenaiClient())
+    real_agent_class, agentv2.RAGAgent = agentv2.RAGAgent, lambda: agent
+    try:
+        from api import routes
+    finally:
+        agentv2.RAGAgent = real_agent_class
+    routes.agent = agent
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_query_endpoint_answers_from_the_shared_agent():
+    agent, llm = make_agent()
+    client = api_client(agent)
+    response = client.post("/api/query", json={"question": "question 3", "category": "Research"})
+    assert response.status_code == 200
+    assert response.json() == {"status": "success", "message": "answer to question 3"}
+    assert agent.vector_store.filters == [{"category": "Research"}]
+    assert llm.max_in_flight == 1
+
+
+def test_batch_endpoint_streams_ndjson():
+    agent, _ = make_agent()
+    client = api_client(agent)
+
+    questions = list(QUESTIONS)
+    questions[1] = "please fail 1"
+    response = client.post("/api/query/batch", json={"questions": questions, "ordered": False,
+                                                     "category": ["Interviews"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == list(range(len(questions)))
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[1]["status"] == "error" and by_index[1]["message"] == "model refused please fail 1"
+    assert by_index[3] == {"index": 3, "question": "question 3", "status": "success",
+                           "answer": "answer to question 3", "model": "stub", "sources": [{"row": 3}, {"row": -1}]}
+    assert agent.vector_store.filters == [{"category": ["Interviews"]}]
+
+    assert client.post("/api/query/batch", json={"questions": []}).status_code == 400
+    assert client.post("/api/query/batch", json={"questions": ["q 0"], "concurrency": 0}).status_code == 400
+
+
+if __name__ == "__main__":
+    test_ordered_and_unordered_streaming()
+    test_failed_question_does_not_stop_the_batch()
+    test_closing_the_stream_cancels_outstanding_answers()
+    test_query_endpoint_answers_from_the_shared_agent()
+    test_batch_endpoint_streams_ndjson()
+    print("Batch answers stream in or out of order, isolate failures, cancel on close and reach the endpoints.")
@@ -0,0 +1,152 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from shared import rate_limiter
+from shared.rate_limiter import (AdaptiveRateLimiter, RetriesExhaustedError, call_with_retry, classify_error,
+                                 retry_after_seconds)
+
+
+class FakeClock:
+    """Stands in for the time module inside rate_limiter: sleeping only advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class ApiError(Exception):
+    def __init__(self, message="", code=None, headers=None):
+        super().__init__(message)
+        self.code = code
+        self.response = SimpleNamespace(headers=headers) if headers else None
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+def with_fake_clock(test):
+    def run():
+        real_time, clock = rate_limiter.time, FakeClock()
+        rate_limiter.time = clock
+        try:
+            test(clock)
+        finally:
+            rate_limiter.time = real_time
+    return run
+
+
+@with_fake_clock
+def test_token_bucket_paces_calls(clock):
+    limiter = AdaptiveRateLimiter("test_pace", rate=4.0, min_rate=0.1, max_rate=10.0)
+    assert limiter._reserve() == 0.0          # the burst token
+    assert limiter._reserve() == 0.25         # then one call every 1/rate seconds
+    assert limiter._reserve() == 0.5
+    clock.now += 10
+    assert limiter._reserve() == 0.0          # idle time refills at most `burst` tokens
+    assert limiter._reserve() == 0.25
+
+
+@with_fake_clock
+def test_additive_increase_multiplicative_decrease(clock):
+    limiter = AdaptiveRateLimiter("test_aimd", rate=2.0, min_rate=0.5, max_rate=3.0, increase=0.5, decrease=0.5)
+    limiter.on_success()
+    assert limiter.rate == 2.25               # + increase / rate
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 3.0                # capped at max_rate
+
+    limiter.on_throttle()
+    assert limiter.rate == 1.5
+    limiter.on_throttle()
+    assert limiter.rate == 1.5                # concurrent throttles within the cooldown halve once
+    clock.now += 1.1
+    limiter.on_throttle()
+    assert limiter.rate == 0.75
+    clock.now += 2
+    limiter.on_throttle()
+    assert limiter.rate == 0.5                # floored at min_rate
+
+
+@with_fake_clock
+def test_retry_after_blocks_the_bucket(clock):
+    limiter = AdaptiveRateLimiter("test_block", rate=10.0, min_rate=0.1, max_rate=10.0)
+    limiter.on_throttle(retry_after=7)
+    assert limiter._reserve() == 7.0
+    clock.now += 7
+    assert limiter._reserve() < 1.0
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds(ApiError("429", headers={"Retry-After": "12"})) == 12.0
+    assert retry_after_seconds(ApiError("{'retryDelay': '7s'}")) == 7.0
+    assert retry_after_seconds(ApiError('"retryDelay": "2.5s"')) == 2.5
+    assert retry_after_seconds(ApiError("retry_delay {\n  seconds: 31\n}")) == 31.0
+    assert retry_after_seconds(ApiError("Quota exceeded. Please retry in 4.2s.")) == 4.2
+    assert retry_after_seconds(ApiError("429 Too Many Requests")) is None
+
+
+def test_classify_error():
+    assert classify_error(ApiError(code=429)) == "throttle"
+    assert classify_error(ApiError("429 RESOURCE_EXHAUSTED")) == "throttle"
+    assert classify_error(ApiError(code="503")) == "transient"
+    assert classify_error(TimeoutError()) == "transient"
+    assert classify_error(ServiceUnavailable("down")) == "transient"
+    assert classify_error(ApiError(code=400)) is None
+    assert classify_error(ValueError("bad prompt")) is None
+
+
+@with_fake_clock
+def test_call_with_retry(clock):
+    outcomes = [ApiError("RESOURCE_EXHAUSTED", code=429, headers={"Retry-After": "5"}), ApiError(code=503), "ok"]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert call_with_retry(flaky, api="test_retry", max_attempts=3) == "ok"
+    assert clock.slept[0] >= 5                # the server's hint is honoured
+
+    try:
+        call_with_retry(lambda: (_ for _ in ()).throw(ValueError("bad prompt")), api="test_retry")
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass                                  # not retryable: propagates unchanged
+
+    calls = []
+
+    def always_throttled():
+        calls.append(1)
+        raise ApiError("RESOURCE_EXHAUSTED", code=429)
+
+    try:
+        call_with_retry(always_throttled, api="test_retry", method="classify", max_attempts=4)
+        raise AssertionError("expected RetriesExhaustedError")
+    except RetriesExhaustedError as e:
+        assert len(calls) == 4
+        assert isinstance(e.last_error, ApiError)
+        assert "classify failed after 4 attempts" in str(e)
+
+
+if __name__ == "__main__":
+    test_token_bucket_paces_calls()
+    test_additive_increase_multiplicative_decrease()
+    test_retry_after_blocks_the_bucket()
+    test_retry_after_parsing()
+    test_classify_error()
+    test_call_with_retry()
+    print("Rate limiter paces, adapts AIMD-style, honours retry hints and gives up with RetriesExhaustedError.")
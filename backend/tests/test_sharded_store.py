@@ -0,0 +1,105 @@
+import os
+import sys
+import hashlib
+import threading
+import tempfile
+
+import numpy as np
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.store import load_vector_store
+
+CATEGORIES = ["Curation", "Employee Resources", "Interviews", "Research"]
+DOCS_PER_CATEGORY = 50
+
+
+class HashEmbeddings:
+    """Deterministic offline embeddings: each text maps to a fixed random vector. calls counts embed_documents."""
+    calls = 0
+
+    def _vector(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(64).tolist()
+
+    def embed_documents(self, texts):
+        HashEmbeddings.calls += 1
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class HashEmbedder:
+    def __init__(self):
+        self.embedding_model = HashEmbeddings()
+
+
+def build(directory: str):
+    store = load_vector_store(HashEmbedder(), backend="numpy", shard_key="category",
+                              persist_directory=directory, rescore=False)
+    texts, metadatas = [], []
+    for category in CATEGORIES:
+        for i in range(DOCS_PER_CATEGORY):
+            texts.append(f"{category} document {i}")
+            metadatas.append({"category": category, "row": i})
+    store.add_texts(texts, metadatas)
+    return store
+
+
+def test_sharded_store():
+    with tempfile.TemporaryDirectory() as directory:
+        store = build(directory)
+        assert store.shard_names() == sorted(CATEGORIES)
+
+        # A query equal to a stored text must come back first, whichever shard holds it
+        hits = store.retrieve("Interviews document 7", k=3)
+        assert hits[0] == ("Interviews document 7", {"category": "Interviews", "row": 7})
+
+        # Fan-out merge equals searching every shard on its own and taking the best k
+        query_vector = HashEmbeddings().embed_query("Research document 3")
+        merged = store.search_with_scores(query_vector, k=5)
+        everything = sorted((hit for name in CATEGORIES
+                             for hit in store.shard(name).search_with_scores(query_vector, k=5)),
+                            key=lambda hit: -hit[2])[:5]
+        assert [hit[0] for hit in merged] == [hit[0] for hit in everything]
+
+        # A batched search gives the same answer as searching each query alone
+        queries = [HashEmbeddings().embed_query(f"Curation document {i}") for i in range(3)]
+        for batched, single in zip(store.search_batch(queries, k=5), [store.search_with_scores(q, k=5) for q in queries]):
+            assert [hit[0] for hit in batched] == [hit[0] for hit in single]
+            assert np.allclose([hit[2] for hit in batched], [hit[2] for hit in single], atol=1e-5)
+
+        # Routing by filter or explicit shards only returns those shards
+        assert store.route({"category": "Curation"}) == ["Curation"]
+        routed = store.retrieve("Interviews document 7", k=10, shards=["Curation", "Research"])
+        assert {metadata["category"] for _, metadata in routed} <= {"Curation", "Research"}
+        assert store.retrieve("anything", filter={"category": "Missing"}) == []
+
+        # Rebuilding one shard leaves the others as they were
+        research_before = store.shard("Research").search_with_scores(query_vector, k=5)
+        store.rebuild_shard("Interviews", ["Interviews replacement"], [{"row": 0}])
+        assert len(store.shard("Interviews").texts) == 1
+        assert store.shard("Research").search_with_scores(query_vector, k=5) == research_before
+
+        # The manifest lets a fresh process find every shard again
+        reopened = load_vector_store(HashEmbedder(), backend="numpy", shard_key="category",
+                                     persist_directory=directory, rescore=False)
+        assert reopened.shard_names() == sorted(CATEGORIES)
+        assert reopened.retrieve("Interviews replacement", k=1)[0][1] == {"category": "Interviews", "row": 0}
+
+        # close() and reset() stop the fan-out threads; a later search starts new ones
+        reopened.close()
+        assert store.executor is not None and reopened.executor is None
+        assert reopened.retrieve("Interviews replacement", k=1)[0][0] == "Interviews replacement"
+        reopened.close()
+        store.reset()
+        assert store.executor is None and store.count() == 0
+        assert not [thread for thread in threading.enumerate() if thread.name.startswith("shard-search")]
+
+
+if __name__ == "__main__":
+    test_sharded_store()
+    print("Sharded store routes, merges and rebuilds shards independently.")
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import tempfile
+
+import numpy as np
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from modules.vector_store.embedder import embedding_variant
+from modules.vector_store.store import load_vector_store
+from modules.vector_store.snapshot import SnapshotError, export_snapshot, import_snapshot, read_snapshot, restore_if_empty
+from test_sharded_store import HashEmbedder, HashEmbeddings
+
+
+def test_snapshot_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        source = load_vector_store(HashEmbedder(), backend="numpy", shard_key="",
+                                   persist_directory=os.path.join(directory, "source"), rescore=True)
+        texts = [f"Heritage Square note {i}" for i in range(300)]
+        source.add_texts(texts, [{"category": ["Curation", "Research"][i % 2], "row": i} for i in range(300)])
+
+        path = os.path.join(directory, "index.npz")
+        manifest = export_snapshot(source, path)
+        assert manifest["count"] == 300 and manifest["dimension"] == 64
+        assert manifest["embedding"] == embedding_variant()
+        assert not os.path.exists(path + ".tmp")
+
+        calls_before = HashEmbeddings.calls
+        for backend, shard_key in (("numpy", ""), ("numpy", "category"), ("chroma", "")):
+            target = load_vector_store(HashEmbedder(), backend=backend, shard_key=shard_key,
+                                       persist_directory=os.path.join(directory, f"{backend}_{shard_key}"))
+            assert restore_if_empty(target, path)["count"] == 300
+            assert restore_if_empty(target, path) is None  # already populated
+            assert target.count() == 300
+            hit = target.retrieve("Heritage Square note 42", k=1)[0]
+            assert hit == ("Heritage Square note 42", {"category": "Curation", "row": 42}), (backend, shard_key, hit)
+        assert HashEmbeddings.calls == calls_before  # importing never re-embeds
+
+        # Re-importing with replace keeps one copy of each chunk
+        import_snapshot(target, path)
+        assert target.count() == 300
+
+        try:
+            read_snapshot(path, model_name="some-other-model")
+            raise AssertionError("model mismatch was not detected")
+        except SnapshotError:
+            pass
+
+        # Vectors from another backend or quantization of the same model are rejected too
+        other = "onnx-int8" if embedding_variant() != "onnx-int8" else "torch-fp32"
+        try:
+            import_snapshot(target, path, embedding=other)
+            raise AssertionError("embedding variant mismatch was not detected")
+        except SnapshotError:
+            pass
+        assert target.count() == 300
+        assert read_snapshot(path, model_name=None, embedding=other)["manifest"]["count"] == 300
+
+        # Format 1 snapshots did not record the variant; they still load
+        with np.load(path) as data:
+            arrays = dict(data)
+        manifest = json.loads(arrays["manifest"].tobytes().decode("utf-8"))
+        del manifest["embedding"]
+        manifest["format_version"] = 1
+        arrays["manifest"] = np.frombuffer(json.dumps(manifest).encode("utf-8"), dtype=np.uint8)
+        legacy_path = os.path.join(directory, "legacy.npz")
+        np.savez(legacy_path, **arrays)
+        assert read_snapshot(legacy_path, embedding=other)["manifest"]["count"] == 300
+
+        with open(path, "r+b") as f:
+            f.seek(-200, os.SEEK_END)
+            f.write(b"\0" * 8)
+        try:
+            read_snapshot(path)
+            raise AssertionError("corruption was not detected")
+        except SnapshotError:
+            pass
+
+
+if __name__ == "__main__":
+    test_snapshot_round_trip()
+    print("Snapshots round-trip across backends without re-embedding and reject bad files or other embeddings.")
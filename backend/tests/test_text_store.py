@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+
+# Adjust path to your backend root
+scriptpath = "../"
+sys.path.append(os.path.abspath(scriptpath))
+
+from shared.text_store import ExtractedTextStore, PAGE_BREAK, hash_bytes
+
+PAGES = ["Rosson House was built in 1895.", "The porch was restored in 1974.", "Docent notes, page three."]
+
+
+def test_text_store():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "text.sqlite3")
+        store = ExtractedTextStore(path, max_bytes=10_000)
+        content_hash = hash_bytes(b"%PDF fake bytes")
+
+        calls = []
+        extract = lambda: calls.append(1) or PAGE_BREAK.join(PAGES)
+        assert store.get_or_extract(content_hash, "pdfplumber-0.11-r1", extract) == PAGE_BREAK.join(PAGES)
+        assert store.get_or_extract(content_hash, "pdfplumber-0.11-r1", extract) == PAGE_BREAK.join(PAGES)
+        assert len(calls) == 1
+
+        # Page ranges are 1-based and inclusive
+        assert store.get(content_hash, "pdfplumber-0.11-r1", first_page=2, last_page=3) == PAGES[1:]
+        assert store.get(content_hash, "pdfplumber-0.11-r1", first_page=3) == PAGES[2:]
+
+        # A new extractor version is a different entry
+        assert store.get(content_hash, "pdfplumber-0.12-r1") is None
+
+        # Empty output is not stored, so a failed extraction is retried
+        store.get_or_extract(hash_bytes(b"blank"), "tesseract-5-r1", lambda: "")
+        assert store.get(hash_bytes(b"blank"), "tesseract-5-r1") is None
+
+        # Entries survive reopening
+        store.close()
+        store = ExtractedTextStore(path, max_bytes=250)
+        assert store.get(content_hash, "pdfplumber-0.11-r1") == PAGES
+
+        # Over budget, the least recently used documents go first
+        store.put(hash_bytes(b"a"), "docx-1", ["a" * 100])
+        store.put(hash_bytes(b"b"), "docx-1", ["b" * 100])
+        store.get(hash_bytes(b"a"), "docx-1")
+        store.put(hash_bytes(b"c"), "docx-1", ["c" * 100])
+        assert store.get(content_hash, "pdfplumber-0.11-r1") is None
+        assert store.get(hash_bytes(b"b"), "docx-1") is None
+        assert store.get(hash_bytes(b"a"), "docx-1") == ["a" * 100]
+        assert store.get(hash_bytes(b"c"), "docx-1") == ["c" * 100]
+        store.close()
+
+
+if __name__ == "__main__":
+    test_text_store()
+    print("Extracted-text store caches pages, honours versions and evicts least recently used entries.")